@@ -0,0 +1,300 @@
+# =============================================================================
+# MEDICIÓN DE RENDIMIENTO
+# =============================================================================
+# Genera libros de pedidos sintéticos y mide por separado:
+#   - lectura:   etiquetas.leer_registros (pd.read_excel + normalización)
+#   - generación: renderizado.Renderizador.generar por registro (ZPL en bytes)
+#   - envío:     transportes.enviar_etiquetas a mem://, a un puerto TCP local o,
+#                en Linux, a un puerto serie simulado con un pseudo-terminal;
+#                con --impresoras N, a N servidores TCP locales (un hilo por
+#                impresora, o despacho con asyncio si se indica --asincrono)
+# Ejemplo:
+#   python benchmark.py --filas 100,1000,10000 --transporte tcp --salida resultados.json
+#
+# Los resultados se agregan como una línea JSON por corrida al archivo de
+# salida, para comparar etiquetas/segundo y memoria máxima entre versiones.
+import argparse
+import json
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import despacho
+import etiquetas
+import renderizado
+import transportes
+
+MENUS = [
+    "Milanesa de pollo con puré de calabaza",
+    "Ensalada César",
+    "Ravioles de ricota y verdura con salsa fileto y queso rallado",
+    "Tarta de jamón y queso",
+    "Pechuga grillada con vegetales salteados al wok",
+]
+NOMBRES = ["Juan Pérez", "María Gómez", "GARCÍA, ANA", "Carlos Alberto Díaz", "Lucía", "Pedro Fernández López"]
+LUGARES = ["Planta 1", "Planta 2", "Oficinas"]
+
+
+def generar_libro(ruta, filas):
+    """Crea un .xlsx con el formato esperado (título, encabezados y `filas` pedidos)."""
+    from openpyxl import Workbook
+
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append(["Pedidos de viandas"])
+    hoja.append(list(etiquetas.COLUMNAS_EXCEL))
+    for i in range(filas):
+        hoja.append([str(100000 + i % 5000), NOMBRES[i % len(NOMBRES)],
+                     MENUS[i % len(MENUS)], LUGARES[i % len(LUGARES)]])
+    libro.save(ruta)
+
+
+class ServidorDescarte:
+    """Servidor TCP local que lee y descarta todo lo que recibe (impresora simulada)."""
+
+    def __init__(self):
+        self.servidor = socket.create_server(("127.0.0.1", 0))
+        self.puerto = self.servidor.getsockname()[1]
+        self.bytes_recibidos = 0
+        threading.Thread(target=self._atender, name="ServidorDescarte", daemon=True).start()
+
+    def _atender(self):
+        while True:
+            try:
+                conexion, _ = self.servidor.accept()
+            except OSError:
+                return
+            with conexion:
+                while datos := conexion.recv(65536):
+                    self.bytes_recibidos += len(datos)
+
+    def cerrar(self):
+        self.servidor.close()
+
+
+class PuertoSerieSimulado:
+    """Par de pseudo-terminales (solo POSIX): el transporte serie escribe en uno y aquí se descarta lo recibido."""
+
+    def __init__(self):
+        self.maestro, self.esclavo = os.openpty()
+        self.nombre = os.ttyname(self.esclavo)
+        self.bytes_recibidos = 0
+        threading.Thread(target=self._atender, name="PuertoSerieSimulado", daemon=True).start()
+
+    def _atender(self):
+        while True:
+            try:
+                datos = os.read(self.maestro, 65536)
+            except OSError:
+                return
+            if not datos:
+                return
+            self.bytes_recibidos += len(datos)
+
+    def cerrar(self):
+        os.close(self.esclavo)
+        os.close(self.maestro)
+
+
+def medir(funcion, memoria=True, repetible=True):
+    """Ejecuta funcion() y devuelve (resultado, segundos, memoria máxima en bytes).
+
+    tracemalloc hace mucho más lento el código que mide, así que el tiempo se
+    toma en una ejecución sin trazar y la memoria en una segunda ejecución.
+    Antes de cada una se vacían las cachés de renderizado, para que la segunda
+    no encuentre ya formateados los nombres y menús de la primera.
+    Con repetible=False (el envío, que no debe llegar dos veces a la impresora
+    simulada) se ejecuta una sola vez y, si se mide la memoria, el tiempo
+    incluye el costo de tracemalloc. Con memoria=False la memoria es None.
+    """
+    renderizado.limpiar_caches()
+    if memoria and not repetible:
+        tracemalloc.start()
+        try:
+            inicio = time.perf_counter()
+            resultado = funcion()
+            segundos = time.perf_counter() - inicio
+            _, pico = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return resultado, segundos, pico
+
+    inicio = time.perf_counter()
+    resultado = funcion()
+    segundos = time.perf_counter() - inicio
+    if not memoria:
+        return resultado, segundos, None
+
+    renderizado.limpiar_caches()
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return resultado, segundos, pico
+
+
+def por_segundo(cantidad, segundos):
+    return round(cantidad / segundos, 1) if segundos > 0 else None
+
+
+def enviar_a_todas(lista, destinos, max_etiquetas, max_bytes, asincrono=False):
+    """Reparte las etiquetas alternadas entre los destinos y devuelve las enviadas."""
+    if len(destinos) == 1:
+        return transportes.enviar_etiquetas(lista, destinos[0], max_etiquetas, max_bytes)
+    partes = [lista[i::len(destinos)] for i in range(len(destinos))]
+    if asincrono:
+        envios = [despacho.Envio(destino, parte) for destino, parte in zip(destinos, partes)]
+        return sum(despacho.despachar(envios, max_etiquetas, max_bytes))
+    with ThreadPoolExecutor(max_workers=len(destinos)) as ejecutor:
+        return sum(ejecutor.map(lambda destino, parte: transportes.enviar_etiquetas(parte, destino, max_etiquetas,
+                                                                                    max_bytes),
+                                destinos, partes))
+
+
+def medir_tamano(filas, carpeta, destinos, max_etiquetas, max_bytes, memoria=True, ejecutor=None, procesos=1,
+                 asincrono=False):
+    """Mide lectura, generación y envío para un libro de `filas` pedidos.
+
+    Con un ejecutor de procesos (renderizado.crear_ejecutor) la generación se
+    reparte entre `procesos` procesos. Con varios destinos las etiquetas se
+    reparten entre ellos (ver enviar_a_todas).
+    """
+    ruta = os.path.join(carpeta, f"pedidos_{filas}.xlsx")
+    generar_libro(ruta, filas)
+
+    registros, segundos_lectura, pico_lectura = medir(lambda: etiquetas.leer_registros(ruta), memoria)
+
+    fecha_elaboracion = datetime.now()
+    renderizador = renderizado.Renderizador(fecha_elaboracion, fecha_elaboracion + timedelta(days=3))
+    if ejecutor is not None:
+        lista, segundos_generacion, pico_generacion = medir(lambda: [
+            (registro.nombre_empleado, zpl, 1)
+            for registro, zpl in renderizado.generar_en_procesos(registros, renderizador, ejecutor, procesos)],
+            memoria)
+    else:
+        lista, segundos_generacion, pico_generacion = medir(lambda: [
+            (registro.nombre_empleado, renderizador.generar(registro), 1)
+            for registro in registros], memoria)
+
+    enviadas, segundos_envio, pico_envio = medir(
+        lambda: enviar_a_todas(lista, destinos, max_etiquetas, max_bytes, asincrono), memoria, repetible=False)
+
+    return {
+        "filas": filas,
+        "etiquetas": len(lista),
+        "bytes_zpl": sum(len(zpl) for _, zpl, _ in lista),
+        "lectura": {"segundos": round(segundos_lectura, 4),
+                    "filas_por_segundo": por_segundo(filas, segundos_lectura),
+                    "memoria_maxima": pico_lectura},
+        "generacion": {"segundos": round(segundos_generacion, 4),
+                       "etiquetas_por_segundo": por_segundo(len(lista), segundos_generacion),
+                       "memoria_maxima": pico_generacion},
+        "envio": {"segundos": round(segundos_envio, 4),
+                  "etiquetas_por_segundo": por_segundo(enviadas, segundos_envio),
+                  "memoria_maxima": pico_envio},
+    }
+
+
+def version_codigo():
+    """Devuelve el commit actual de git, o None si no se puede obtener."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"],
+                                       cwd=os.path.dirname(os.path.abspath(__file__)),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return None
+
+
+def crear_parser():
+    parser = argparse.ArgumentParser(
+        prog="benchmark", description="Mide lectura del Excel, generación de ZPL y envío con libros sintéticos.")
+    parser.add_argument("--filas", default="100,1000,10000",
+                        help="Tamaños de libro separados por coma (por defecto 100,1000,10000)")
+    parser.add_argument("--transporte", choices=["memoria", "tcp", "serie"], default="memoria",
+                        help="Enviar a un sumidero en memoria, a un servidor TCP local o a un puerto serie "
+                             "simulado con un pseudo-terminal, solo en Linux (por defecto memoria)")
+    parser.add_argument("--baudios", type=int, default=115200,
+                        help="Velocidad del puerto serie simulado (por defecto 115200)")
+    parser.add_argument("--flujo", choices=list(transportes.FLUJOS_SERIE), default=transportes.FLUJO_NINGUNO,
+                        help="Control de flujo del puerto serie simulado")
+    parser.add_argument("--impresoras", type=int, default=1,
+                        help="Servidores TCP locales entre los que se reparte el envío (solo con --transporte tcp)")
+    parser.add_argument("--asincrono", action="store_true",
+                        help="Con varias impresoras, enviar con asyncio en lugar de un hilo por impresora")
+    parser.add_argument("--lote-etiquetas", type=int, default=50)
+    parser.add_argument("--lote-bytes", type=int, default=65536)
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Procesos para generar el ZPL (por defecto 1: en el proceso principal)")
+    parser.add_argument("--sin-memoria", action="store_true",
+                        help="No medir la memoria máxima (cada etapa se ejecuta una sola vez)")
+    parser.add_argument("--salida", default="benchmark_resultados.json",
+                        help="Archivo donde se agrega una línea JSON por corrida")
+    return parser
+
+
+def main(argv=None):
+    args = crear_parser().parse_args(argv)
+    tamanos = [int(valor) for valor in args.filas.split(",") if valor.strip()]
+
+    servidores = []
+    if args.transporte == "tcp":
+        servidores = [ServidorDescarte() for _ in range(max(args.impresoras, 1))]
+        destinos = [f"{transportes.PREFIJO_TCP}127.0.0.1:{servidor.puerto}" for servidor in servidores]
+    elif args.transporte == "serie":
+        servidores = [PuertoSerieSimulado()]
+        destinos = [transportes.destino_serie(servidores[0].nombre, args.baudios, args.flujo)]
+    else:
+        # Sin guardar los trabajos, para que la memoria medida sea la del envío y no la del sumidero
+        transportes.obtener_sumidero("benchmark", guardar=False)
+        destinos = [f"{transportes.PREFIJO_MEMORIA}benchmark"]
+
+    ejecutor = renderizado.crear_ejecutor(args.procesos) if args.procesos > 1 else None
+    resultados = []
+    try:
+        with tempfile.TemporaryDirectory() as carpeta:
+            for filas in tamanos:
+                resultado = medir_tamano(filas, carpeta, destinos, args.lote_etiquetas, args.lote_bytes,
+                                         memoria=not args.sin_memoria, ejecutor=ejecutor, procesos=args.procesos,
+                                         asincrono=args.asincrono)
+                resultados.append(resultado)
+                print(f"{filas:>7} filas | lectura {resultado['lectura']['segundos']:.3f}s"
+                      f" | generación {resultado['generacion']['etiquetas_por_segundo']} et/s"
+                      f" | envío {resultado['envio']['etiquetas_por_segundo']} et/s", file=sys.stderr)
+    finally:
+        for servidor in servidores:
+            servidor.cerrar()
+        if ejecutor is not None:
+            ejecutor.shutdown()
+
+    corrida = {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "version": version_codigo(),
+        "python": platform.python_version(),
+        "plataforma": platform.platform(),
+        "transporte": args.transporte,
+        **({"baudios": args.baudios, "flujo": args.flujo} if args.transporte == "serie" else {}),
+        **({"impresoras": len(destinos), "asincrono": args.asincrono} if args.transporte == "tcp" else {}),
+        "lote_etiquetas": args.lote_etiquetas,
+        "lote_bytes": args.lote_bytes,
+        "procesos": args.procesos,
+        "nucleos": os.cpu_count(),
+        "resultados": resultados,
+    }
+    with open(args.salida, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(corrida, ensure_ascii=False) + "\n")
+    print(json.dumps(corrida, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
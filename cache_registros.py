@@ -0,0 +1,138 @@
+# =============================================================================
+# CACHÉ DE REGISTROS DEL EXCEL
+# =============================================================================
+# Guarda los registros ya normalizados de cada libro para no volver a parsear
+# el .xlsx en cada reimpresión o vista previa. Hay dos niveles:
+#   - memoria: LRU por (ruta, mtime, tamaño), sin tocar el archivo
+#   - disco:   ~/.etiquetador/cache/<hash del contenido>.json, sobrevive al cierre
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+
+import etiquetas
+
+logger = logging.getLogger(__name__)
+
+CARPETA_CACHE = os.path.join(os.path.expanduser("~"), ".etiquetador", "cache")
+MAX_LIBROS = 8      # Libros que se mantienen en memoria y en disco
+VERSION_CACHE = 3   # Cambiar si cambia la forma de los registros para invalidar la caché
+
+_memoria = OrderedDict()  # (ruta, mtime, tamaño) -> (lista de registros, hash del contenido)
+_bloqueo = threading.Lock()
+
+
+def hash_contenido(excel_path):
+    """Calcula el SHA-256 del contenido del archivo."""
+    sha = hashlib.sha256()
+    with open(excel_path, 'rb') as f:
+        for bloque in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(bloque)
+    return sha.hexdigest()
+
+
+def _ruta_disco(hash_archivo):
+    return os.path.join(CARPETA_CACHE, f"{hash_archivo}.json")
+
+
+def _leer_disco(hash_archivo):
+    """Devuelve los registros guardados en disco para el hash, o None si no hay."""
+    ruta = _ruta_disco(hash_archivo)
+    if not os.path.exists(ruta):
+        return None
+    try:
+        with open(ruta, 'r', encoding='utf-8') as f:
+            datos = json.load(f)
+        if datos.get("version") != VERSION_CACHE:
+            return None
+        # Marcar el archivo como usado recientemente para la limpieza LRU
+        os.utime(ruta)
+        return [etiquetas.Registro._make(fila) for fila in datos["registros"]]
+    except Exception as e:
+        logger.warning("Error al leer la caché de registros: %s", e)
+        return None
+
+
+def _guardar_disco(hash_archivo, excel_path, registros):
+    """Guarda los registros en disco y elimina las entradas más antiguas."""
+    try:
+        os.makedirs(CARPETA_CACHE, exist_ok=True)
+        ruta = _ruta_disco(hash_archivo)
+        temporal = ruta + ".tmp"
+        with open(temporal, 'w', encoding='utf-8') as f:
+            json.dump({"version": VERSION_CACHE, "excel": excel_path,
+                       "registros": [list(registro) for registro in registros]}, f, ensure_ascii=False)
+        os.replace(temporal, ruta)
+
+        # Mantener solo los MAX_LIBROS usados más recientemente
+        archivos = [os.path.join(CARPETA_CACHE, nombre) for nombre in os.listdir(CARPETA_CACHE)
+                    if nombre.endswith(".json")]
+        archivos.sort(key=os.path.getmtime, reverse=True)
+        for viejo in archivos[MAX_LIBROS:]:
+            os.remove(viejo)
+    except Exception as e:
+        logger.warning("Error al guardar la caché de registros: %s", e)
+
+
+def _guardar_memoria(clave, entrada):
+    with _bloqueo:
+        _memoria[clave] = entrada
+        _memoria.move_to_end(clave)
+        while len(_memoria) > MAX_LIBROS:
+            _memoria.popitem(last=False)
+
+
+def cargar_registros(excel_path, usar_cache=True):
+    """Devuelve los registros del Excel usando la caché si el archivo no cambió.
+
+    Los errores de lectura (ValueError para Excel vacío o sin códigos) se
+    propagan igual que en etiquetas.leer_registros y no se guardan en caché.
+    """
+    if not usar_cache:
+        return etiquetas.leer_registros(excel_path)
+    return cargar_registros_y_hash(excel_path)[0]
+
+
+def cargar_registros_y_hash(excel_path, usar_cache=True):
+    """Como cargar_registros, pero devuelve (registros, hash del contenido).
+
+    El hash es el mismo que usa la caché en disco, así que quien lo necesita
+    (el diario de trabajos) no vuelve a leer el archivo para calcularlo.
+    """
+    ruta = os.path.abspath(excel_path)
+    if not usar_cache:
+        hash_archivo = hash_contenido(ruta)
+        return etiquetas.leer_registros(ruta), hash_archivo
+
+    estado = os.stat(ruta)
+    clave = (ruta, estado.st_mtime_ns, estado.st_size)
+
+    with _bloqueo:
+        entrada = _memoria.get(clave)
+        if entrada is not None:
+            _memoria.move_to_end(clave)
+            return entrada
+
+    # Si cambió la fecha pero no el contenido (copia, guardado sin cambios) sirve la caché en disco
+    hash_archivo = hash_contenido(ruta)
+    registros = _leer_disco(hash_archivo)
+    if registros is None:
+        registros = etiquetas.leer_registros(ruta)
+        _guardar_disco(hash_archivo, ruta, registros)
+
+    _guardar_memoria(clave, (registros, hash_archivo))
+    return registros, hash_archivo
+
+
+def limpiar_cache():
+    """Vacía la caché en memoria y en disco."""
+    with _bloqueo:
+        _memoria.clear()
+    if os.path.isdir(CARPETA_CACHE):
+        for nombre in os.listdir(CARPETA_CACHE):
+            try:
+                os.remove(os.path.join(CARPETA_CACHE, nombre))
+            except OSError:
+                pass
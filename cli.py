@@ -0,0 +1,205 @@
+# =============================================================================
+# MODO LÍNEA DE COMANDOS (SIN INTERFAZ GRÁFICA)
+# =============================================================================
+# Ejemplo:
+#   python etiquetador.py --excel pedidos.xlsx --venc 2026-10-20 --printer tcp://10.0.0.5:9100
+#
+# Imprime en stdout una línea JSON con el resultado y termina con uno de los
+# códigos de salida definidos abajo. Los módulos informan sus avisos con
+# logging (stderr), así stdout lleva solo esa línea.
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime
+
+import diario
+import medicion
+import trabajos
+import transportes
+
+SALIDA_OK = 0               # Todas las etiquetas enviadas
+SALIDA_PARCIAL = 1          # Algunas etiquetas no se pudieron enviar o tenían códigos inválidos
+SALIDA_ERROR_ENTRADA = 2    # Argumentos, fecha o Excel inválidos
+SALIDA_ERROR_IMPRESION = 3  # No se pudo enviar ninguna etiqueta
+
+REANUDAR_ULTIMO = "ultimo"
+
+
+def crear_parser():
+    """Crea el parser de argumentos de la línea de comandos."""
+    parser = argparse.ArgumentParser(
+        prog="etiquetador",
+        description="Genera e imprime las etiquetas de un Excel de pedidos sin abrir la interfaz.")
+    parser.add_argument("--excel", help="Archivo .xlsx con los pedidos")
+    parser.add_argument("--venc", help="Fecha de vencimiento (AAAA-MM-DD)")
+    parser.add_argument("--reanudar", nargs="?", const=REANUDAR_ULTIMO, metavar="DIARIO",
+                        help="Continuar una impresión interrumpida desde la primera etiqueta sin enviar "
+                             "(la más reciente si no se indica el diario de ~/.etiquetador/trabajos). "
+                             "Usa el Excel, la fecha y las opciones de la corrida original")
+    parser.add_argument("--printer", action="append",
+                        help='Nombre de la impresora Zebra, "tcp://host:9100" para red, '
+                             '"serial://COM3" para puerto serie (opcional "?baudios=115200&flujo=rtscts" '
+                             'o "flujo=xonxoff"), "file://ruta" para guardar el ZPL '
+                             'o "mem://nombre" para medir sin impresora. Repetir para repartir '
+                             'las etiquetas entre varias impresoras en paralelo')
+    parser.add_argument("--reparto", default=trabajos.REPARTO_ALTERNADO,
+                        choices=[trabajos.REPARTO_ALTERNADO, trabajos.REPARTO_MENU, trabajos.REPARTO_LUGAR],
+                        help="Cómo repartir las etiquetas entre varias impresoras (por defecto alternado)")
+    parser.add_argument("--controlar-estado", action="store_true",
+                        help="Consultar ~HS antes de cada lote (red y serie) y esperar si falta papel, "
+                             "el cabezal está abierto o el buffer está lleno")
+    parser.add_argument("--lote-etiquetas", type=int, default=50,
+                        help="Etiquetas máximas por trabajo de impresión (por defecto 50)")
+    parser.add_argument("--lote-bytes", type=int, default=65536,
+                        help="Bytes máximos por trabajo de impresión (por defecto 65536)")
+    parser.add_argument("--sin-cache", action="store_true",
+                        help="Volver a leer el Excel aunque esté en la caché de ~/.etiquetador")
+    parser.add_argument("--streaming", action="store_true",
+                        help="Leer, generar y enviar fila por fila con memoria constante (Excel muy grandes)")
+    parser.add_argument("--formato-almacenado", action="store_true",
+                        help="Guardar el diseño en la impresora (^DF) y enviar solo los datos de cada etiqueta (^XF)")
+    parser.add_argument("--agrupar", action="store_true",
+                        help="Enviar una sola vez las etiquetas idénticas, con ^PQ para la cantidad de copias")
+    parser.add_argument("--reintentos", type=int, default=3,
+                        help="Intentos por lote antes de darlo por fallido, con espera exponencial (por defecto 3)")
+    parser.add_argument("--timeout", type=float, default=None,
+                        help="Segundos máximos de espera de cada envío en red o serie")
+    parser.add_argument("--procesos", type=int, default=1,
+                        help="Procesos que generan el ZPL en paralelo, por bloques y sin cambiar el orden "
+                             "(por defecto 1: sin procesos extra; 0: uno por núcleo)")
+    parser.add_argument("--asincrono", action="store_true",
+                        help="Con varias impresoras de red (tcp://), enviar a todas desde un solo hilo con asyncio "
+                             "en lugar de un hilo por impresora")
+    parser.add_argument("--reporte", action="store_true",
+                        help="Medir cada etapa y guardar un reporte de tiempos en ~/.etiquetador/reportes")
+    return parser
+
+
+def emitir(resultado):
+    """Escribe el resultado como una línea JSON en stdout."""
+    print(json.dumps(resultado, ensure_ascii=False))
+
+
+def describir_invalidos(trabajo):
+    """Filas que no se imprimieron por tener un código de menú inválido, para el resultado JSON."""
+    return [invalido._asdict() for invalido in trabajo.codigos_invalidos]
+
+
+def main(argv=None):
+    """Punto de entrada del modo línea de comandos. Devuelve el código de salida."""
+    parser = crear_parser()
+    args = parser.parse_args(argv)
+    medicion_corrida = medicion.Medicion() if args.reporte else None
+    opciones_envio = {"reintentos": transportes.PoliticaReintentos(intentos=max(args.reintentos, 1)),
+                      "timeout": args.timeout,
+                      "procesos": args.procesos if args.procesos > 0 else os.cpu_count() or 1,
+                      "asincrono": args.asincrono}
+    inicio_validacion = time.perf_counter()
+
+    if args.reanudar:
+        ruta = diario.ultimo_pendiente() if args.reanudar == REANUDAR_ULTIMO else args.reanudar
+        if not ruta or not os.path.exists(ruta):
+            emitir({"estado": "error", "error": "No hay impresiones interrumpidas para reanudar."})
+            return SALIDA_ERROR_ENTRADA
+        try:
+            # Con --printer se puede reanudar en otras impresoras
+            trabajo = trabajos.TrabajoImpresion.desde_diario(ruta, destinos=args.printer,
+                                                             medicion=medicion_corrida, **opciones_envio)
+        except Exception as e:
+            emitir({"estado": "error", "error": f"No se pudo leer el diario {ruta}: {e}"})
+            return SALIDA_ERROR_ENTRADA
+    else:
+        if not args.excel or not args.venc or not args.printer:
+            parser.error("--excel, --venc y --printer son obligatorios salvo con --reanudar")
+
+        try:
+            fecha_vencimiento = datetime.strptime(args.venc, "%Y-%m-%d").date()
+        except ValueError:
+            emitir({"estado": "error", "error": f"Fecha de vencimiento inválida: {args.venc}"})
+            return SALIDA_ERROR_ENTRADA
+
+        if fecha_vencimiento < datetime.now().date():
+            emitir({"estado": "error", "error": "No se puede usar una fecha anterior a hoy."})
+            return SALIDA_ERROR_ENTRADA
+
+        if not os.path.exists(args.excel):
+            emitir({"estado": "error", "error": f"El archivo Excel no existe: {args.excel}"})
+            return SALIDA_ERROR_ENTRADA
+
+        trabajo = trabajos.TrabajoImpresion(
+            args.excel, args.printer, fecha_vencimiento,
+            args.lote_etiquetas, args.lote_bytes,
+            streaming=args.streaming, formato_almacenado=args.formato_almacenado,
+            agrupar_identicas=args.agrupar, reparto=args.reparto, usar_cache=not args.sin_cache,
+            controlar_estado=args.controlar_estado, medicion=medicion_corrida, **opciones_envio)
+    if medicion_corrida is not None:
+        medicion_corrida.sumar_etapa("validacion", time.perf_counter() - inicio_validacion)
+
+    # En la línea de comandos el trabajo se ejecuta en el hilo principal y los eventos se leen al final
+    inicio = time.perf_counter()
+    try:
+        trabajo.ejecutar()
+    except Exception as e:
+        # Error inesperado del transporte o del envío: igual se informa en una línea JSON
+        salida = {"estado": "error", "impresoras": trabajo.destinos, "error": f"Error durante la impresión: {e}"}
+        if trabajo.diario is not None and os.path.exists(trabajo.diario.ruta):
+            salida["diario"] = trabajo.diario.ruta
+        emitir(salida)
+        return SALIDA_ERROR_IMPRESION
+    segundos = time.perf_counter() - inicio
+
+    errores = []
+    resultado = None
+    while not trabajo.eventos.empty():
+        evento = trabajo.eventos.get()
+        if evento[0] == "fallo":
+            _, nombres, error, destino = evento
+            errores.append({"impresora": destino, "empleados": nombres, "error": error})
+        elif evento[0] == "error":
+            salida = {"estado": "error", "error": evento[1]}
+            if trabajo.codigos_invalidos:
+                salida["codigos_invalidos"] = describir_invalidos(trabajo)
+            emitir(salida)
+            return SALIDA_ERROR_ENTRADA
+        elif evento[0] == "fin":
+            resultado = evento
+
+    _, generadas, enviadas, _, grupos = resultado
+    if generadas == 0 and trabajo.codigos_invalidos:
+        # Modo streaming: todas las filas tenían códigos inválidos
+        estado, codigo_salida = "error", SALIDA_ERROR_ENTRADA
+    elif enviadas == generadas and trabajo.codigos_invalidos:
+        # Se imprimió todo lo válido, pero faltan las filas con códigos inválidos
+        estado, codigo_salida = "parcial", SALIDA_PARCIAL
+    elif enviadas == generadas:
+        estado, codigo_salida = "ok", SALIDA_OK
+    elif enviadas > 0:
+        estado, codigo_salida = "parcial", SALIDA_PARCIAL
+    else:
+        estado, codigo_salida = "error", SALIDA_ERROR_IMPRESION
+
+    salida = {
+        "estado": estado,
+        "impresoras": trabajo.destinos,
+        "etiquetas_generadas": generadas,
+        "etiquetas_enviadas": enviadas,
+        "segundos": round(segundos, 3),
+        "etiquetas_por_segundo": round(enviadas / segundos, 1) if segundos > 0 else None,
+        "grupos": [{"empleado": nombre, "cantidad": cantidad} for nombre, cantidad in grupos],
+        "errores": errores,
+        "codigos_invalidos": describir_invalidos(trabajo),
+    }
+    if trabajo.diario is not None and os.path.exists(trabajo.diario.ruta):
+        # Quedaron etiquetas sin enviar: se pueden reintentar con --reanudar
+        salida["diario"] = trabajo.diario.ruta
+    if medicion_corrida is not None:
+        salida["reporte"] = trabajo.ruta_reporte
+        salida["tiempos"] = medicion_corrida.reporte()
+    emitir(salida)
+    return codigo_salida
+
+
+if __name__ == "__main__":
+    sys.exit(main())
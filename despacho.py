@@ -0,0 +1,252 @@
+# =============================================================================
+# ENVÍO ASÍNCRONO A VARIAS IMPRESORAS DE RED
+# =============================================================================
+# Alternativa a un hilo por impresora cuando todas son Zebra en red (tcp://):
+# un solo bucle de asyncio mantiene abiertas las conexiones RAW con
+# asyncio.open_connection y atiende todas las impresoras a la vez.
+#
+# Cada impresora tiene su cola de lotes: una tarea arma los lotes en un hilo
+# aparte (asyncio.to_thread, porque generar el ZPL bloquea y con procesos > 1
+# espera resultados) y los deja en la cola mientras otra los envía, así la
+# generación no frena las conexiones de las demás impresoras. Los lotes, los
+# reintentos, el control de estado ~HS y los avisos (al_enviar, al_fallar,
+# al_reintentar, al_esperar) usan las mismas funciones que
+# transportes.enviar_etiquetas (agrupar_en_lotes, datos_lote, proximo_reintento,
+# impresora_lista, registrar_lote); aquí solo cambia cómo se espera.
+#
+# enviar_a_impresoras es una corrutina, para usarla dentro de otro bucle (por
+# ejemplo con impresoras simuladas con asyncio.start_server); despachar la
+# ejecuta en un bucle propio desde el hilo de trabajo.
+import asyncio
+import time
+from collections import namedtuple
+
+import transportes
+
+LOTES_EN_COLA = 2  # Lotes ya armados que esperan en la cola de cada impresora
+
+# Etiquetas (nombre, zpl, cantidad) que se envían a un destino y avisos del envío,
+# con los mismos argumentos que en transportes.enviar_etiquetas
+Envio = namedtuple("Envio", ["destino", "etiquetas", "al_enviar", "al_fallar", "al_reintentar", "al_esperar"],
+                   defaults=(None, None, None, None))
+
+
+def puede_despachar(destinos):
+    """True si todos los destinos son impresoras de red y se pueden atender con asyncio."""
+    return bool(destinos) and all(destino.startswith(transportes.PREFIJO_TCP) for destino in destinos)
+
+
+class ConexionAsincrona:
+    """Conexión persistente al puerto RAW de una impresora de red, para usar desde asyncio."""
+
+    def __init__(self, destino, timeout=None):
+        self.destino = destino
+        self.timeout = timeout or transportes.TIMEOUT_TCP
+        self.host, self.puerto = transportes.separar_host_puerto(destino[len(transportes.PREFIJO_TCP):])
+        self.lector = None
+        self.escritor = None
+        self.estado_disponible = True  # False después de una consulta ~HS fallida
+
+    async def conectar(self):
+        """Abre la conexión si todavía no está abierta."""
+        if self.escritor is None:
+            self.lector, self.escritor = await asyncio.wait_for(
+                asyncio.open_connection(self.host, self.puerto), self.timeout)
+            # Sin buffer propio: drain() espera a que todo pase al sistema, como sendall
+            self.escritor.transport.set_write_buffer_limits(high=0)
+
+    async def _escribir(self, datos):
+        """Escribe y espera el envío; si se corta después de enviar algo lanza EnvioIncompleto."""
+        self.escritor.write(datos)
+        # Lo que write() no pudo pasar al sistema en el momento queda en el buffer del transporte
+        sin_enviar = self.escritor.transport.get_write_buffer_size()
+        try:
+            await asyncio.wait_for(self.escritor.drain(), self.timeout)
+        except (OSError, asyncio.TimeoutError) as e:
+            if not self.escritor.transport.is_closing():
+                sin_enviar = self.escritor.transport.get_write_buffer_size()
+            # Si la conexión se cayó el buffer se descarta. Lo que pasó al sistema no
+            # indica qué etiquetas imprimió la impresora, solo que no se puede reintentar
+            enviados = len(datos) - sin_enviar
+            if enviados <= 0:
+                raise
+            await self.cerrar()
+            raise transportes.EnvioIncompleto(
+                f"se cortó después de enviar {enviados} de {len(datos)} bytes; parte del lote pudo "
+                f"haberse impreso ({str(e) or 'se agotó el tiempo de espera'})", enviados)
+
+    async def _enviar_crudo(self, datos):
+        """Envía los bytes por la conexión, reconectando una vez si se había cortado antes de enviar nada."""
+        try:
+            await self.conectar()
+            await self._escribir(datos)
+        except transportes.EnvioIncompleto:
+            raise
+        except (OSError, asyncio.TimeoutError):
+            # La impresora pudo cerrar la conexión (reinicio, timeout inactivo): reintentar una vez
+            await self.cerrar()
+            await self.conectar()
+            await self._escribir(datos)
+
+    async def enviar(self, datos):
+        try:
+            await self._enviar_crudo(datos)
+        except transportes.EnvioIncompleto as e:
+            raise transportes.EnvioIncompleto(f"Error al enviar a la impresora de red {self.destino}: {e}",
+                                              e.enviados)
+        except Exception as e:
+            raise Exception(f"Error al enviar a la impresora de red {self.destino}: "
+                            f"{str(e) or 'se agotó el tiempo de espera'}")
+
+    async def consultar_estado(self):
+        """Envía ~HS por la conexión y devuelve el EstadoImpresora."""
+        await self._enviar_crudo(transportes.CONSULTA_ESTADO)
+        try:
+            respuesta = b""
+            while respuesta.count(transportes.FIN_CADENA_ESTADO) < 3:
+                datos = await asyncio.wait_for(self.lector.read(1024), transportes.TIMEOUT_ESTADO)
+                if not datos:
+                    raise TimeoutError("La impresora no respondió a la consulta de estado.")
+                respuesta += datos
+            return transportes.interpretar_estado(respuesta)
+        except (OSError, ValueError, asyncio.TimeoutError):
+            # Descartar la conexión para no mezclar una respuesta tardía con la próxima consulta
+            await self.cerrar()
+            raise
+
+    async def cerrar(self):
+        """Cierra la conexión ignorando errores."""
+        if self.escritor is not None:
+            escritor = self.escritor
+            self.lector = self.escritor = None
+            try:
+                escritor.close()
+                await asyncio.wait_for(escritor.wait_closed(), self.timeout)
+            except (OSError, asyncio.TimeoutError):
+                pass
+
+
+async def esperar_impresora_lista(conexion, max_formatos, control=None, al_esperar=None):
+    """Igual que transportes.esperar_impresora_lista, sin bloquear a las otras impresoras."""
+    while conexion.estado_disponible:
+        try:
+            estado = await conexion.consultar_estado()
+        except Exception as e:
+            # Igual que transportes.consultar_estado: no volver a consultar una impresora que no responde
+            transportes.estado_no_disponible(conexion, e)
+            return
+        if transportes.impresora_lista(estado, max_formatos):
+            return
+        if al_esperar:
+            al_esperar(estado)
+        if control is not None and control.cancelado:
+            return
+        await asyncio.sleep(transportes.ESPERA_ESTADO)
+
+
+async def enviar_con_reintentos(conexion, datos, reintentos, control=None, al_reintentar=None):
+    """Igual que transportes.enviar_con_reintentos, esperando entre intentos sin bloquear el bucle."""
+    intento = 1
+    while True:
+        try:
+            await conexion.enviar(datos)
+            return
+        except Exception as e:
+            espera = transportes.proximo_reintento(reintentos, intento, e, control)
+            if espera is None:
+                raise
+            if al_reintentar:
+                al_reintentar(intento, e, espera)
+            await asyncio.sleep(espera)
+            if control is not None and control.cancelado:
+                raise
+            intento += 1
+            await conexion.cerrar()  # El próximo intento vuelve a conectar
+
+
+async def _armar_lotes(etiquetas, cola, max_etiquetas, max_bytes, control):
+    """Pone en la cola los lotes de una impresora y al final None (o el error al armarlos).
+
+    Cada lote se arma (y su ZPL se genera) en un hilo, para no detener el bucle.
+    """
+    lotes = transportes.agrupar_en_lotes(etiquetas, max_etiquetas, max_bytes)
+    try:
+        while True:
+            lote = await asyncio.to_thread(next, lotes, None)
+            if lote is None or (control is not None and control.cancelado):
+                break
+            await cola.put(lote)
+    except Exception as e:
+        # Por ejemplo un ValueError del Excel leído en modo streaming: lo lanza quien envía
+        await cola.put(e)
+        return
+    await cola.put(None)
+
+
+async def _enviar_lotes(envio, cola, conexion, control, encabezado, controlar_estado, max_etiquetas,
+                        medicion, reintentos):
+    """Envía en orden los lotes de la cola de una impresora y devuelve las etiquetas físicas enviadas."""
+    enviadas = 0
+    while True:
+        lote = await cola.get()
+        if lote is None:
+            return enviadas
+        if isinstance(lote, Exception):
+            raise lote
+        if control is not None:
+            if control.pausado:
+                # La pausa se espera en otro hilo para que el bucle siga atendiendo a las demás
+                await asyncio.to_thread(control.esperar_si_pausado)
+            if control.cancelado:
+                return enviadas
+        if controlar_estado:
+            # Dejar en la impresora como máximo un lote sin imprimir además del que se envía
+            await esperar_impresora_lista(conexion, max_etiquetas, control, envio.al_esperar)
+            if control is not None and control.cancelado:
+                return enviadas
+        datos = transportes.datos_lote(lote, encabezado)
+        error = None
+        inicio = time.perf_counter()
+        try:
+            await enviar_con_reintentos(conexion, datos, reintentos, control,
+                                        transportes.avisos_reintento(lote, envio.al_reintentar))
+        except Exception as e:
+            error = e
+        enviadas = transportes.registrar_lote(lote, datos, error, time.perf_counter() - inicio, enviadas,
+                                              medicion, envio.al_enviar, envio.al_fallar)
+
+
+async def _atender_impresora(envio, max_etiquetas, max_bytes, control, encabezado, controlar_estado,
+                             medicion, reintentos, timeout):
+    cola = asyncio.Queue(maxsize=LOTES_EN_COLA)
+    armado = asyncio.create_task(_armar_lotes(envio.etiquetas, cola, max_etiquetas, max_bytes, control))
+    conexion = ConexionAsincrona(envio.destino, timeout)
+    try:
+        return await _enviar_lotes(envio, cola, conexion, control, encabezado, controlar_estado,
+                                   max_etiquetas, medicion, reintentos)
+    finally:
+        # Si se canceló, el armado puede haber quedado esperando lugar en la cola
+        armado.cancel()
+        await asyncio.gather(armado, return_exceptions=True)
+        await conexion.cerrar()
+
+
+async def enviar_a_impresoras(envios, max_etiquetas, max_bytes, control=None, encabezado=b"",
+                              controlar_estado=False, medicion=None, reintentos=transportes.SIN_REINTENTOS,
+                              timeout=None):
+    """Envía a la vez las etiquetas de cada Envio a su impresora de red.
+
+    Devuelve la lista de etiquetas físicas enviadas a cada destino, en el
+    orden de envios. Las opciones son las de transportes.enviar_etiquetas;
+    timeout es la espera máxima para conectar y para cada escritura.
+    """
+    encabezado = transportes.a_bytes(encabezado)
+    return list(await asyncio.gather(*(
+        _atender_impresora(envio, max_etiquetas, max_bytes, control, encabezado, controlar_estado,
+                           medicion, reintentos, timeout)
+        for envio in envios)))
+
+
+def despachar(envios, max_etiquetas, max_bytes, **opciones):
+    """Ejecuta enviar_a_impresoras en un bucle de asyncio propio (desde el hilo de trabajo)."""
+    return asyncio.run(enviar_a_impresoras(envios, max_etiquetas, max_bytes, **opciones))
@@ -0,0 +1,118 @@
+# =============================================================================
+# DIARIO DE TRABAJOS (REANUDAR IMPRESIONES INTERRUMPIDAS)
+# =============================================================================
+# Cada corrida escribe un diario en ~/.etiquetador/trabajos/ con una línea JSON
+# de encabezado (Excel, hash del contenido, fecha de vencimiento, impresoras y
+# opciones) y luego una línea por lote enviado con los índices de las filas.
+# El archivo solo se agrega al final y se sincroniza a disco (fsync) como
+# mucho una vez por INTERVALO_FSYNC, para no frenar el envío. Si la corrida
+# termina completa el diario se elimina; si no, queda para reanudarla.
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+CARPETA_DIARIOS = os.path.join(os.path.expanduser("~"), ".etiquetador", "trabajos")
+INTERVALO_FSYNC = 1.0  # Segundos máximos entre sincronizaciones a disco
+MAX_DIARIOS = 20       # Diarios pendientes que se conservan
+
+
+class DiarioTrabajo:
+    """Diario de solo agregado con las filas enviadas de un trabajo."""
+
+    def __init__(self, ruta, datos, enviadas=None):
+        self.ruta = ruta
+        self.datos = datos                       # Encabezado del trabajo
+        self.enviadas = set(enviadas or ())      # Índices de filas ya enviadas
+        self._archivo = open(ruta, 'a', encoding='utf-8')
+        self._ultimo_fsync = time.monotonic()
+        self._bloqueo = threading.Lock()
+
+    @classmethod
+    def crear(cls, datos, carpeta=None):
+        """Crea el diario de un trabajo nuevo con el encabezado `datos`."""
+        carpeta = carpeta or CARPETA_DIARIOS
+        os.makedirs(carpeta, exist_ok=True)
+        datos = dict(datos, fecha=datetime.now().isoformat(timespec="seconds"))
+        ruta = os.path.join(carpeta, f"trabajo_{datetime.now().strftime('%Y%m%d_%H%M%S_%f')}.jsonl")
+        with open(ruta, 'w', encoding='utf-8') as f:
+            f.write(json.dumps(datos, ensure_ascii=False) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        _limpiar(carpeta)
+        return cls(ruta, datos)
+
+    @classmethod
+    def abrir(cls, ruta):
+        """Abre un diario existente para continuar el trabajo."""
+        datos, enviadas = leer(ruta)
+        return cls(ruta, datos, enviadas)
+
+    def registrar(self, indices):
+        """Agrega los índices de un lote enviado."""
+        with self._bloqueo:
+            self.enviadas.update(indices)
+            self._archivo.write(json.dumps(list(indices)) + "\n")
+            self._archivo.flush()
+            if time.monotonic() - self._ultimo_fsync >= INTERVALO_FSYNC:
+                os.fsync(self._archivo.fileno())
+                self._ultimo_fsync = time.monotonic()
+
+    def cerrar(self, completo=False):
+        """Cierra el diario; si el trabajo terminó completo lo elimina."""
+        with self._bloqueo:
+            if self._archivo.closed:
+                return
+            self._archivo.flush()
+            os.fsync(self._archivo.fileno())
+            self._archivo.close()
+        if completo:
+            try:
+                os.remove(self.ruta)
+            except OSError as e:
+                logger.warning("Error al eliminar el diario del trabajo: %s", e)
+
+
+def leer(ruta):
+    """Devuelve (encabezado, índices enviados) de un diario.
+
+    Una última línea incompleta (corte durante la escritura) se ignora.
+    """
+    enviadas = set()
+    with open(ruta, 'r', encoding='utf-8') as f:
+        datos = json.loads(f.readline())
+        for linea in f:
+            try:
+                enviadas.update(json.loads(linea))
+            except ValueError:
+                break
+    return datos, enviadas
+
+
+def pendientes(carpeta=None):
+    """Devuelve las rutas de los diarios sin terminar, del más reciente al más antiguo."""
+    carpeta = carpeta or CARPETA_DIARIOS
+    if not os.path.isdir(carpeta):
+        return []
+    nombres = sorted((nombre for nombre in os.listdir(carpeta)
+                      if nombre.startswith("trabajo_") and nombre.endswith(".jsonl")), reverse=True)
+    return [os.path.join(carpeta, nombre) for nombre in nombres]
+
+
+def ultimo_pendiente(carpeta=None):
+    """Devuelve la ruta del diario sin terminar más reciente, o None."""
+    rutas = pendientes(carpeta)
+    return rutas[0] if rutas else None
+
+
+def _limpiar(carpeta):
+    """Elimina los diarios más antiguos si hay más de MAX_DIARIOS."""
+    for ruta in pendientes(carpeta)[MAX_DIARIOS:]:
+        try:
+            os.remove(ruta)
+        except OSError:
+            pass
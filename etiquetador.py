@@ -1,17 +1,55 @@
 # =============================================================================
 # IMPORTS Y CONFIGURACIÓN INICIAL
 # =============================================================================
+import sys
+import time
+
+# Momento en que empieza a cargarse el programa, para medir el arranque (ver "medir_inicio")
+INICIO_PROGRAMA = time.perf_counter()
+
+# En el ejecutable de PyInstaller los procesos de generación en paralelo arrancan por aquí
+if __name__ == "__main__":
+    import multiprocessing
+    multiprocessing.freeze_support()
+
+# Con argumentos se ejecuta el modo línea de comandos, que no importa tkinter
+# ni ninguna otra dependencia de la interfaz gráfica
+if __name__ == "__main__" and len(sys.argv) > 1:
+    import cli
+    sys.exit(cli.main(sys.argv[1:]))
+
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
 from tkcalendar import DateEntry
-import pandas as pd
 from datetime import datetime
 import os
-import socket
-import win32print
-import subprocess
-import serial  
+import base64
 import json
+import logging
+import queue
+import threading
+
+import cache_registros
+import diario
+import etiquetas
+import impresoras
+import medicion
+import renderizado
+import trabajos
+import transportes
+import vista_previa
+
+FIN_IMPORTS = time.perf_counter()
+
+logger = logging.getLogger(__name__)
+
+FILAS_POR_PAGINA = 200  # Filas que se insertan en la lista cada vez que se llega al final
+BUSCANDO_IMPRESORAS = "Buscando impresoras..."  # Texto del combo mientras se enumeran en segundo plano
+TIPOS_CONEXION = ("USB", "Paralelo", "Serie", "Red")  # USB y Paralelo usan la cola de impresión de Windows
+MODIFICADOR_SHIFT = 0x0001    # Bits de event.state de Tk
+MODIFICADOR_CONTROL = 0x0004
+ADELANTO_VISTA_PREVIA = 3  # Etiquetas siguientes que se dibujan de antemano en la vista previa
+
 
 class EtiquetadoraApp:
     def aplicar_efecto_hover(self, boton, color_normal, color_hover):
@@ -56,7 +94,7 @@ class EtiquetadoraApp:
         self.root.title("Generador de Etiqueta")
         self.excel_path = ""
         
-        # Inicializar el tipo de conexión
+        # Tipo de conexión (se restaura el último usado al cargar las configuraciones)
         self.tipo_conexion = tk.StringVar()
         self.tipo_conexion.set("USB")  # Por defecto USB
         
@@ -70,6 +108,19 @@ class EtiquetadoraApp:
         
         # Cargar configuraciones guardadas
         self.cargar_configuraciones()
+        if self.configuraciones.get("ultimo_tipo_conexion") in TIPOS_CONEXION:
+            self.tipo_conexion.set(self.configuraciones["ultimo_tipo_conexion"])
+        
+        # Registro de impresoras Zebra con caché, para no enumerarlas en cada impresión
+        self.registro_impresoras = impresoras.RegistroImpresoras(
+            ttl=self.configuraciones.get("ttl_impresoras", 60))
+        
+        # Hilo de fondo que ejecuta los trabajos de impresión
+        self.trabajador = trabajos.TrabajadorImpresion()
+        self.trabajador.start()
+        
+        # Dibujo de vistas previas en segundo plano, con caché de las últimas etiquetas
+        self.cache_vista_previa = vista_previa.CacheVistaPrevia()
         
         # Definir constantes de espaciado para consistencia
         PADDING_EXTERNO = 30    # Padding externo para marcos principales
@@ -170,6 +221,21 @@ class EtiquetadoraApp:
                                                fg="#6c757d", bg=section_color,
                                                font=font_label)
         self.label_excel_seleccionado.grid(row=1, column=0, pady=5, sticky="ew")
+        
+        # Modo de impresión: todas las filas del Excel o solo las seleccionadas en la lista
+        modo_frame = tk.Frame(seccion_archivo, bg=section_color)
+        modo_frame.grid(row=2, column=0, sticky="w")
+        self.modo_impresion = tk.StringVar(value="todos")
+        tk.Radiobutton(modo_frame, text="Imprimir todas", variable=self.modo_impresion, value="todos",
+                       command=self.actualizar_modo_impresion, bg=section_color,
+                       font=font_label).pack(side=tk.LEFT)
+        tk.Radiobutton(modo_frame, text="Elegir etiquetas", variable=self.modo_impresion, value="seleccion",
+                       command=self.actualizar_modo_impresion, bg=section_color,
+                       font=font_label).pack(side=tk.LEFT, padx=(10, 0))
+        
+        # Lista de registros (solo visible en el modo de selección)
+        self.registros_frame = tk.Frame(seccion_archivo, bg="#f0f0f0")
+        self.setup_treeview()
 
         # Sección de fecha - visualmente separada
         seccion_fecha = tk.LabelFrame(main_frame, text="Fecha de vencimiento", 
@@ -230,16 +296,25 @@ class EtiquetadoraApp:
         impresora_frame = tk.Frame(seccion_impresora, bg=bg_color)
         impresora_frame.pack(fill=tk.X, expand=True, pady=5)
         
-        # Etiqueta para impresora
-        impresora_label = tk.Label(impresora_frame, 
+        # Tipo de conexión: cola de Windows (USB/Paralelo), puerto serie o red (tcp://)
+        tk.Label(impresora_frame, text="Conexión:", bg=bg_color, fg=text_color).pack(side=tk.LEFT, padx=(0, 5))
+        self.tipo_conexion_combo = ttk.Combobox(impresora_frame,
+                                                textvariable=self.tipo_conexion,
+                                                values=TIPOS_CONEXION,
+                                                width=9,
+                                                state="readonly")
+        self.tipo_conexion_combo.pack(side=tk.LEFT, padx=(0, 10))
+        self.tipo_conexion_combo.bind("<<ComboboxSelected>>", self.on_tipo_conexion_change)
+        
+        # Etiqueta para impresora (cambia según el tipo de conexión)
+        self.impresora_label = tk.Label(impresora_frame, 
                                  text="Impresora Zebra:", 
                                  bg=bg_color, fg=text_color)
-        impresora_label.pack(side=tk.LEFT, padx=(0, 5))
+        self.impresora_label.pack(side=tk.LEFT, padx=(0, 5))
         
-        # Obtener lista de impresoras disponibles
-        self.impresoras = self.obtener_impresoras_zebra()
-        if not self.impresoras:
-            self.impresoras = ["No se encontraron impresoras Zebra"]
+        # Las impresoras y los puertos COM se buscan en segundo plano después de mostrar
+        # la ventana (ver descubrir_dispositivos), porque enumerarlos puede tardar segundos
+        self.impresoras = [BUSCANDO_IMPRESORAS]
             
         # Combobox para selección de impresora
         self.impresora_combo = ttk.Combobox(impresora_frame, 
@@ -250,11 +325,16 @@ class EtiquetadoraApp:
             self.impresora_combo.current(0)
         self.impresora_combo.pack(side=tk.LEFT)
         
-        # Variables para mantener la funcionalidad de selección de puertos COM aunque no sea visible
+        # Puerto COM para conexión "Serie" (velocidad y control de flujo en config.json)
         self.combobox_com = ttk.Combobox(impresora_frame, state="readonly", width=10)
-        self.combobox_com['values'] = self.obtener_puertos_com()
-        self.combobox_com.set("COM1")
-        # No empaquetamos el combobox_com para mantenerlo oculto
+        self.combobox_com.set(self.configuraciones.get("ultimo_puerto_com", "COM1"))
+        
+        # Dirección "host:puerto" para conexión "Red"
+        self.direccion_red = tk.StringVar(value=self.configuraciones.get("direccion_red", ""))
+        self.entrada_red = tk.Entry(impresora_frame, textvariable=self.direccion_red, width=25)
+        
+        # Mostrar el control que corresponde al tipo de conexión restaurado
+        self.on_tipo_conexion_change()
 
         # Sección de acción - Solo con un botón de imprimir
         seccion_accion = tk.LabelFrame(main_frame, text="Generar etiquetas", 
@@ -280,6 +360,24 @@ class EtiquetadoraApp:
         self.btn_imprimir.pack(fill=tk.X, expand=True, padx=10, pady=15)
         self.aplicar_efecto_hover(self.btn_imprimir, "#007BFF", "#0056b3")
         
+        # Botón para ver cómo quedan las etiquetas antes de imprimirlas
+        self.btn_vista_previa = tk.Button(seccion_accion,
+                                    text="Vista previa",
+                                    command=self.mostrar_vista_previa,
+                                    font=font_button,
+                                    relief=tk.RAISED,
+                                    borderwidth=1)
+        self.btn_vista_previa.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        # Botón para continuar una impresión interrumpida (solo visible si hay un diario pendiente)
+        self.btn_reanudar = tk.Button(seccion_accion,
+                                    text="Reanudar impresión interrumpida",
+                                    command=self.reanudar_impresion,
+                                    font=font_button,
+                                    relief=tk.RAISED,
+                                    borderwidth=1)
+        self.actualizar_boton_reanudar()
+        
         # Pie de página con créditos
         footer_frame = tk.Frame(root, bg=header_color)
         footer_frame.pack(fill=tk.X, side=tk.BOTTOM)
@@ -296,6 +394,15 @@ class EtiquetadoraApp:
         
         # Centrar la ventana en la pantalla
         self.center_window()
+        
+        # Medición opcional del arranque: tiempos desde que empieza a cargarse el programa
+        self.tiempos_inicio = None
+        if self.configuraciones.get("medir_inicio", False):
+            self.tiempos_inicio = {"modulos_cargados": FIN_IMPORTS - INICIO_PROGRAMA,
+                                   "ventana_creada": time.perf_counter() - INICIO_PROGRAMA}
+        
+        # Buscar impresoras y puertos cuando la ventana ya está dibujada
+        self.root.after_idle(self.descubrir_dispositivos)
     
     # =============================================================================
     # MÉTODOS DE INTERFAZ Y UTILIDADES
@@ -342,6 +449,8 @@ class EtiquetadoraApp:
             nombre_archivo = os.path.basename(self.excel_path)
             self.label_excel_seleccionado.config(text=f"Archivo: {nombre_archivo}", fg="black")
             self.btn_eliminar_excel.config(state=tk.NORMAL)  # Habilitar botón de eliminación
+            if self.modo_impresion.get() == "seleccion":
+                self.cargar_datos_excel()
             # MENSAJE: Archivo cargado
             messagebox.showinfo("Archivo cargado", f"Seleccionado: {nombre_archivo}")
 
@@ -350,6 +459,7 @@ class EtiquetadoraApp:
         self.excel_path = ""
         self.label_excel_seleccionado.config(text="Ningún archivo seleccionado", fg="gray")
         self.btn_eliminar_excel.config(state=tk.DISABLED)  # Deshabilitar botón de eliminación
+        self.cargar_datos_excel()  # Vaciar la lista
         # MENSAJE: Selección eliminada
         messagebox.showinfo("Selección eliminada", "Se ha eliminado la selección del archivo Excel")
 
@@ -358,68 +468,39 @@ class EtiquetadoraApp:
     # =============================================================================
     
     def on_tipo_conexion_change(self, event=None):
-        """Maneja el cambio del tipo de conexión de la impresora."""
-        if self.tipo_conexion.get() == "Serie":
-            self.combobox_com['values'] = self.obtener_puertos_com()
-        # No hacemos pack ni unpack ya que la interfaz nunca se muestra
-
-    # El método verificar_conexion_impresora se modifica para uso interno sin interfaz
-    def verificar_conexion_impresora(self, event=None, show_always=False):
-        """Verifica si la impresora Zebra está correctamente conectada (uso interno)."""
+        """Muestra el selector de impresora, de puerto COM o de dirección según el tipo de conexión."""
         tipo = self.tipo_conexion.get()
-        impresora = self.impresora_combo.get()
-        
-        if impresora == "No se encontraron impresoras Zebra":
-            return False
-            
-        try:
-            if tipo == "Serie":
-                # Para conexión serie, intentamos abrir el puerto
-                puerto = self.combobox_com.get()
-                with serial.Serial(port=puerto, baudrate=9600, timeout=1) as ser:
-                    pass
-                return True
-            else:
-                # Para USB/Paralelo verificamos si podemos abrir la impresora
-                handle = win32print.OpenPrinter(impresora)
-                win32print.ClosePrinter(handle)
-                return True
-        except Exception as e:
-            if show_always:
-                messagebox.showerror("Error de conexión", 
-                                  f"No se puede conectar con la impresora.\nVerifique que esté encendida y conectada correctamente.")
-            return False
-        
+        for control in (self.impresora_combo, self.combobox_com, self.entrada_red):
+            control.pack_forget()
+        if tipo == "Serie":
+            self.impresora_label.config(text="Puerto:")
+            self.combobox_com.pack(side=tk.LEFT)
+        elif tipo == "Red":
+            self.impresora_label.config(text="Dirección (host:puerto):")
+            self.entrada_red.pack(side=tk.LEFT)
+        else:
+            self.impresora_label.config(text="Impresora Zebra:")
+            self.impresora_combo.pack(side=tk.LEFT)
+
     def obtener_puertos_com(self):
         """Devuelve la lista de puertos COM disponibles en el sistema."""
         import serial.tools.list_ports
         return [port.device for port in serial.tools.list_ports.comports()]
 
     def obtener_impresoras_zebra(self):
-        """Obtiene la lista de impresoras Zebra instaladas en el sistema."""
-        impresoras_zebra = []
-        try:
-            # Buscar impresoras locales (USB y Paralelo)
-            for printer in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL):
-                printer_name = printer[2].lower()
-                if any(term in printer_name for term in ["zebra", "zdesigner", "zt", "gk", "zd", "lp", "gx", "gc"]):
-                    impresoras_zebra.append(printer[2])
-        except Exception as e:
-            print(f"Error al enumerar impresoras: {e}")
-            try:
-                output = subprocess.check_output("wmic printer get name", shell=True).decode('utf-8')
-                for line in output.split('\n'):
-                    line = line.strip().lower()
-                    if any(term in line for term in ["zebra", "zdesigner", "zt", "gk", "zd"]):
-                        impresoras_zebra.append(line)
-            except:
-                pass
+        """Obtiene la lista de impresoras Zebra instaladas en el sistema (desde el registro en caché)."""
+        impresoras_zebra = self.registro_impresoras.listar()
         return impresoras_zebra if impresoras_zebra else ["No se encontraron impresoras Zebra"]
         
     def refrescar_impresoras(self):
         """Actualiza la lista de impresoras disponibles."""
+        self.registro_impresoras.refrescar()
+        self.mostrar_impresoras(self.obtener_impresoras_zebra())
+    
+    def mostrar_impresoras(self, impresoras_zebra):
+        """Carga la lista de impresoras en el combo, manteniendo la seleccionada si sigue disponible."""
         impresora_actual = self.impresora_combo.get()
-        self.impresoras = self.obtener_impresoras_zebra()
+        self.impresoras = impresoras_zebra
         self.impresora_combo['values'] = self.impresoras
         
         # Intentar mantener la impresora seleccionada si todavía existe
@@ -428,6 +509,39 @@ class EtiquetadoraApp:
         elif self.impresoras:
             self.impresora_combo.current(0)
     
+    def descubrir_dispositivos(self):
+        """Enumera impresoras y puertos COM en segundo plano, sin demorar la apertura de la ventana."""
+        if self.tiempos_inicio is not None:
+            self.tiempos_inicio["primer_cuadro"] = time.perf_counter() - INICIO_PROGRAMA
+        resultado = queue.Queue()
+        
+        def buscar():
+            impresoras_zebra = self.obtener_impresoras_zebra()
+            try:
+                puertos = self.obtener_puertos_com()
+            except Exception as e:
+                logger.warning("Error al enumerar puertos COM: %s", e)
+                puertos = []
+            resultado.put((impresoras_zebra, puertos))
+        
+        threading.Thread(target=buscar, name="DescubrirDispositivos", daemon=True).start()
+        self.root.after(50, self.recibir_dispositivos, resultado)
+    
+    def recibir_dispositivos(self, resultado):
+        """Muestra las impresoras y puertos encontrados por descubrir_dispositivos."""
+        try:
+            impresoras_zebra, puertos = resultado.get_nowait()
+        except queue.Empty:
+            self.root.after(50, self.recibir_dispositivos, resultado)
+            return
+        
+        self.mostrar_impresoras(impresoras_zebra)
+        self.combobox_com['values'] = puertos
+        
+        if self.tiempos_inicio is not None:
+            self.tiempos_inicio["dispositivos_listos"] = time.perf_counter() - INICIO_PROGRAMA
+            medicion.guardar_inicio(self.tiempos_inicio)
+    
     # =============================================================================
     # MÉTODOS DE IMPRESIÓN
     # =============================================================================
@@ -439,6 +553,10 @@ class EtiquetadoraApp:
         self.btn_imprimir.config(state=tk.DISABLED)
         self.root.update()
         
+        trabajo_iniciado = False
+        # Medición opcional de tiempos por etapa, con reporte en ~/.etiquetador/reportes
+        medicion_corrida = medicion.Medicion() if self.configuraciones.get("medir_tiempos", False) else None
+        inicio_validacion = time.perf_counter()
         try:
             # Serie de validaciones previas a la impresión
             if not self.excel_path:
@@ -446,21 +564,39 @@ class EtiquetadoraApp:
                 messagebox.showerror("Error", "Selecciona un archivo Excel primero.")
                 return
                 
-            impresora = self.impresora_combo.get()
-            if impresora == "No se encontraron impresoras Zebra" or not impresora:
-                # MENSAJE: Error - No hay impresora Zebra seleccionada
-                messagebox.showerror("Error", "No hay impresora Zebra seleccionada.")
-                return
-                
-            # Verificar si la impresora seleccionada sigue disponible
-            impresoras_actuales = self.obtener_impresoras_zebra()
-            if impresora not in impresoras_actuales:
-                # MENSAJE: Pregunta - Impresora no disponible
-                respuesta = messagebox.askquestion("Impresora no disponible", 
-                                                f"La impresora '{impresora}' ya no está disponible.\n¿Desea actualizar la lista de impresoras?")
-                if respuesta == 'yes':
-                    self.refrescar_impresoras()
-                return
+            tipo = self.tipo_conexion.get()
+            if tipo == "Serie":
+                impresora = self.combobox_com.get()
+                if not impresora:
+                    # MENSAJE: Error - No hay puerto COM seleccionado
+                    messagebox.showerror("Error", "No hay puerto COM seleccionado.")
+                    return
+            elif tipo == "Red":
+                impresora = self.direccion_red.get().strip()
+                if not impresora:
+                    # MENSAJE: Error - Falta la dirección de la impresora de red
+                    messagebox.showerror("Error", "Escriba la dirección de la impresora de red (host o host:puerto).")
+                    return
+            else:
+                impresora = self.impresora_combo.get()
+                if impresora == BUSCANDO_IMPRESORAS:
+                    # MENSAJE: Error - Todavía se están buscando las impresoras
+                    messagebox.showerror("Error", "Todavía se están buscando las impresoras. Intente de nuevo en unos segundos.")
+                    return
+                if impresora == "No se encontraron impresoras Zebra" or not impresora:
+                    # MENSAJE: Error - No hay impresora Zebra seleccionada
+                    messagebox.showerror("Error", "No hay impresora Zebra seleccionada.")
+                    return
+                    
+                # Verificar si la impresora seleccionada sigue disponible (búsqueda en la caché del registro).
+                # Solo aplica a la cola de Windows: un puerto COM o una dirección IP no están en el registro.
+                if not self.registro_impresoras.disponible(impresora):
+                    # MENSAJE: Pregunta - Impresora no disponible
+                    respuesta = messagebox.askquestion("Impresora no disponible", 
+                                                    f"La impresora '{impresora}' ya no está disponible.\n¿Desea actualizar la lista de impresoras?")
+                    if respuesta == 'yes':
+                        self.refrescar_impresoras()
+                    return
                 
             # Validar que el archivo Excel siga existiendo
             if not os.path.exists(self.excel_path):
@@ -470,231 +606,310 @@ class EtiquetadoraApp:
                 self.label_excel_seleccionado.config(text="Ningún archivo seleccionado", fg="gray")
                 self.btn_eliminar_excel.config(state=tk.DISABLED)
                 return
-                
-            try:
-                df = pd.read_excel(self.excel_path, header=1)
-            except Exception as e:
-                # MENSAJE: Error - No se pudo leer el Excel
-                messagebox.showerror("Error", f"No se pudo leer el Excel: {e}")
-                return
-        
-            if df.empty:
-                # MENSAJE: Error - El archivo Excel está vacío
-                messagebox.showerror("Error", "El archivo Excel está vacío.")
-                return
-                
-            # Verificar si hay al menos una fila con código válido
-            codigos_validos = 0
-            for _, row in df.iterrows():
-                codigo = str(row.get("Código del menú", "")).strip()
-                if codigo:
-                    codigos_validos += 1
-                    
-            if codigos_validos == 0:
-                # MENSAJE: Error - El Excel no contiene códigos de menú válidos
-                messagebox.showerror("Error", "El Excel no contiene códigos de menú válidos.")
-                return
-
-            # A partir de aquí, continúa el procesamiento original
-            fecha_vencimiento = self.fecha_entry.get_date()
-            fecha_elaboracion = datetime.now()
-            
-            # Procesar todas las filas del Excel
-            etiquetas_generadas = 0
-            etiquetas_enviadas = 0
             
-            # Mostrar una ventana de progreso
-            progreso = tk.Toplevel(self.root)
-            progreso.title("Imprimiendo etiquetas")
-            progreso.transient(self.root)
-            progreso.grab_set()
-            
-            # Centrar ventana de progreso
-            progreso_width = 300
-            progreso_height = 100
-            progreso_x = self.root.winfo_x() + (self.root.winfo_width() - progreso_width) // 2
-            progreso_y = self.root.winfo_y() + (self.root.winfo_height() - progreso_height) // 2
-            progreso.geometry(f"{progreso_width}x{progreso_height}+{progreso_x}+{progreso_y}")
-            
-            progreso.configure(bg="#f0f0f0")
-            progreso.resizable(False, False)
-            
-            mensaje_label = tk.Label(progreso, text=f"Imprimiendo etiquetas: 0/{codigos_validos}", 
-                                  font=("Arial", 10), bg="#f0f0f0", pady=10)
-            mensaje_label.pack()
-            
-            barra_progreso = ttk.Progressbar(progreso, orient="horizontal", 
-                                          length=250, mode="determinate", maximum=codigos_validos)
-            barra_progreso.pack(pady=5)
-            
-            # Actualizar la interfaz para mostrar la ventana de progreso
-            self.root.update()
+            # En el modo de selección solo se imprimen las filas elegidas en la lista
+            filas = None
+            if self.modo_impresion.get() == "seleccion":
+                filas = frozenset(self.filas_seleccionadas())
+                if not filas:
+                    # MENSAJE: Error - No hay etiquetas seleccionadas
+                    messagebox.showerror("Error", "No hay etiquetas seleccionadas para imprimir.")
+                    return
+                # MENSAJE: Confirmación - Cantidad de etiquetas seleccionadas
+                if not messagebox.askyesno("Confirmar impresión",
+                                           f"Se van a imprimir {len(filas)} de {len(self.registros)} etiquetas "
+                                           f"seleccionadas. ¿Continuar?"):
+                    return
+            if medicion_corrida is not None:
+                medicion_corrida.sumar_etapa("validacion", time.perf_counter() - inicio_validacion)
+
+            # La lectura, generación y envío se hacen en el hilo de trabajo para no congelar la ventana
+            # Impresoras adicionales (nombres o "tcp://host:puerto") para repartir la carga en paralelo
+            destinos = [self.obtener_destino(impresora)]
+            for destino in self.configuraciones.get("impresoras_paralelo", []):
+                if destino not in destinos:
+                    destinos.append(destino)
             
-            for index, row in df.iterrows():
-                codigo = str(row.get("Código del menú", "")).strip()
-                if not codigo:  # Omitir filas sin código
-                    continue
-                    
-                # Rellenar con ceros a la izquierda hasta tener 12 dígitos para EAN-13
-                # EAN-13 necesita exactamente 12 dígitos + 1 dígito de verificación automático
-                codigo = codigo.zfill(12)
-                
-                # Formatear el código EAN-13 con espacios específicos: "X XXXXXX XXXXXX"
-                # Pero ahora usamos los 12 dígitos completos
-                codigo_formateado = f"{codigo[0]} {codigo[1:7]} {codigo[7:12]}"
-                
-                # Manejar nombre del menú largo dividiéndolo en dos líneas si es necesario
-                nombre_menu_original = str(row.get("Nombre del menú", "")).strip()
-                if not nombre_menu_original:
-                    nombre_menu_original = "Sin especificar"
-                    
-                max_caracteres_linea = 30  # Máximo de caracteres por línea
-                
-                if len(nombre_menu_original) <= max_caracteres_linea:
-                    # Si el nombre cabe en una línea, lo usamos tal cual
-                    nombre_menu_linea1 = nombre_menu_original
-                    nombre_menu_linea2 = ""
-                else:
-                    # Mejorado: Buscar un punto óptimo para dividir el texto
-                    # Inicializar mitad con un valor por defecto seguro
-                    mitad = min(max_caracteres_linea, len(nombre_menu_original)-1)
-                    
-                    # Buscar un espacio cerca del punto de corte deseado
-                    # Solo buscar si hay suficiente texto
-                    if len(nombre_menu_original) > 1:
-                        # Buscar el último espacio antes del límite
-                        while mitad > 0 and nombre_menu_original[mitad] != ' ':
-                            mitad -= 1
-                        
-                        # Si no hay espacios cerca, simplemente cortar en el límite
-                        if mitad <= 5:  # Si está muy al principio, mejor cortar en el límite
-                            mitad = min(max_caracteres_linea, len(nombre_menu_original)-1)
-                    
-                    nombre_menu_linea1 = nombre_menu_original[:mitad].strip()
-                    nombre_menu_linea2 = nombre_menu_original[mitad:].strip()
-                    
-                    # Si la segunda línea es muy larga, la truncamos
-                    if len(nombre_menu_linea2) > max_caracteres_linea:
-                        nombre_menu_linea2 = nombre_menu_linea2[:max_caracteres_linea] + "..."
-                
-                nombre_empleado = str(row.get("Nombre de empleado", "")).strip()
-                if not nombre_empleado:
-                    nombre_empleado = "Sin especificar"
-
-                # Convertir el nombre a formato "APELLIDO, NOMBRE" en mayúsculas
-                # Si el nombre ya tiene coma, usar tal como está, sino convertir
-                if ',' in nombre_empleado:
-                    nombre_empleado_formato = nombre_empleado.upper()
-                else:
-                    # Intentar separar nombre y apellido para formato "APELLIDO, NOMBRE"
-                    partes_nombre = nombre_empleado.strip().split()
-                    if len(partes_nombre) >= 2:
-                        # Asumir que la última palabra es el apellido
-                        apellido = partes_nombre[-1]
-                        nombres = ' '.join(partes_nombre[:-1])
-                        nombre_empleado_formato = f"{apellido.upper()}, {nombres.upper()}"
-                    else:
-                        nombre_empleado_formato = nombre_empleado.upper()
-
-                # Generar ZPL con el formato exacto de la etiqueta real
-                    zpl = f"""
-^XA
-^PW400
-^LH20,20
-^CI28
-
-^CF0,30
-^FO0,5^FB360,40,1,C^FDLUGAR: Comedor Bella Italia^FS
-^FO0,35^GB360,2,2^FS  ; Línea horizontal como subrayado
-
-^CF0,25
-^FO10,45^FD{nombre_empleado_formato}^FS
-^FO10,80^FDMenu: {nombre_menu_linea1}^FS
-^FO10,115^FDELAB: {fecha_elaboracion.strftime('%d/%m/%Y')}^FS
-^FO10,150^FDVENC: {fecha_vencimiento.strftime('%d/%m/%Y')}^FS
-
-^BY2,3.0,120
-^FO40,175^BEN,120,Y,N^FD{codigo}^FS
-
-^XZ
-"""
-
-
-
-                # Intentar enviar a la impresora directamente
-                try:
-                    tipo = self.tipo_conexion.get()
-                    if tipo == "USB" or tipo == "Paralelo":
-                        self.enviar_a_impresora(zpl, impresora)
-                    elif tipo == "Serie":
-                        puerto = self.combobox_com.get()
-                        self.enviar_por_serie(zpl, puerto)
-                    else:
-                        raise Exception("Tipo de conexión no soportado.")
-                    etiquetas_enviadas += 1
-                    # Actualizar barra de progreso
-                    barra_progreso["value"] = etiquetas_enviadas
-                    mensaje_label.config(text=f"Imprimiendo etiquetas: {etiquetas_enviadas}/{codigos_validos}")
-                    self.root.update()
-                except Exception as e:
-                    # MENSAJE: Error de impresión - No se pudo imprimir la etiqueta para X
-                    messagebox.showerror("Error de impresión", f"No se pudo imprimir la etiqueta para {nombre_empleado}: {str(e)}")
-                etiquetas_generadas += 1
-
-            # MENSAJE: Impresión completada o Aviso
-            if etiquetas_enviadas > 0:
-                messagebox.showinfo("Impresión completada", 
-                                  f"Se imprimieron {etiquetas_enviadas} de {etiquetas_generadas} etiquetas en la impresora '{impresora}'.")
-            else:
-                messagebox.showwarning("Aviso", "No se pudieron imprimir etiquetas en la impresora.")
+            trabajo = trabajos.TrabajoImpresion(
+                self.excel_path, destinos,
+                self.fecha_entry.get_date(),
+                self.configuraciones.get("lote_max_etiquetas", 50),
+                self.configuraciones.get("lote_max_bytes", 65536),
+                streaming=self.configuraciones.get("lectura_streaming", False),
+                formato_almacenado=self.configuraciones.get("formato_almacenado", False),
+                agrupar_identicas=self.configuraciones.get("agrupar_identicas", False),
+                reparto=self.configuraciones.get("criterio_reparto", trabajos.REPARTO_ALTERNADO),
+                controlar_estado=self.configuraciones.get("controlar_estado", False),
+                medicion=medicion_corrida, filas=filas, **self.opciones_envio())
+            self.mostrar_progreso(trabajo, impresora)
+            self.trabajador.agregar(trabajo)
+            trabajo_iniciado = True
 
         except Exception as e:
             # MENSAJE: Error inesperado
             messagebox.showerror("Error inesperado", f"Ocurrió un error durante el proceso: {str(e)}")
         finally:
-            # Cerrar ventana de progreso si sigue abierta
-            try:
-                if 'progreso' in locals() and progreso.winfo_exists():
-                    barra_progreso.stop()
-                    progreso.destroy()
-            except:
-                pass
-                
-            # Restaurar interfaz
-            self.root.config(cursor="")
-            self.btn_imprimir.config(state=tk.NORMAL)
-            self.root.update()
-    
-    def enviar_a_impresora(self, zpl_data, impresora):
-        """Envía el código ZPL a la impresora Zebra por USB o puerto paralelo."""
-        handle = None
+            # Si el trabajo arrancó, la interfaz se restaura al terminar (ver finalizar_impresion)
+            if not trabajo_iniciado:
+                self.root.config(cursor="")
+                self.btn_imprimir.config(state=tk.NORMAL)
+
+    def actualizar_boton_reanudar(self):
+        """Muestra el botón de reanudar solo si quedó una impresión sin terminar."""
+        if diario.ultimo_pendiente():
+            self.btn_reanudar.pack(fill=tk.X, padx=10, pady=(0, 10))
+        else:
+            self.btn_reanudar.pack_forget()
+
+    def reanudar_impresion(self):
+        """Continúa la última impresión interrumpida desde la primera etiqueta sin enviar."""
+        ruta = diario.ultimo_pendiente()
+        if not ruta:
+            self.actualizar_boton_reanudar()
+            return
         try:
-            handle = win32print.OpenPrinter(impresora)
-            job = win32print.StartDocPrinter(handle, 1, ("Etiqueta ZPL", None, "RAW"))
-            win32print.StartPagePrinter(handle)
-            win32print.WritePrinter(handle, zpl_data.encode())
-            win32print.EndPagePrinter(handle)
-            win32print.EndDocPrinter(handle)
-            win32print.ClosePrinter(handle)
-            handle = None
-            return True
+            datos, enviadas = diario.leer(ruta)
         except Exception as e:
-            if handle:
-                try:
-                    win32print.ClosePrinter(handle)
-                except:
-                    pass
-            error_msg = str(e)
-            raise Exception(f"Error al imprimir: Verifica que la impresora esté conectada y encendida. {error_msg}")
-
-    def enviar_por_serie(self, zpl_data, puerto):
-        """Envía el código ZPL por puerto serie (RS-232)."""
+            # MENSAJE: Error - Diario dañado
+            messagebox.showerror("Error", f"No se pudo leer la impresión interrumpida: {e}")
+            return
+        
+        # MENSAJE: Pregunta - Confirmar reanudación
+        respuesta = messagebox.askyesno(
+            "Reanudar impresión",
+            f"Archivo: {os.path.basename(datos['excel'])}\n"
+            f"Impresoras: {', '.join(datos['destinos'])}\n"
+            f"Etiquetas ya enviadas: {len(enviadas)}\n\n"
+            "¿Desea imprimir las etiquetas que faltan?")
+        if not respuesta:
+            return
+        
         try:
-            # Configuración típica: 9600 baudios, 8N1, sin control de flujo
-            with serial.Serial(port=puerto, baudrate=9600, bytesize=8, parity='N', stopbits=1, timeout=2) as ser:
-                ser.write(zpl_data.encode('utf-8'))
+            medicion_corrida = medicion.Medicion() if self.configuraciones.get("medir_tiempos", False) else None
+            trabajo = trabajos.TrabajoImpresion.desde_diario(ruta, medicion=medicion_corrida,
+                                                             **self.opciones_envio())
         except Exception as e:
-            raise Exception(f"Error al enviar por puerto serie {puerto}: {e}")
+            messagebox.showerror("Error", f"No se pudo reanudar la impresión: {e}")
+            return
+        self.root.config(cursor="watch")
+        self.btn_imprimir.config(state=tk.DISABLED)
+        self.btn_reanudar.config(state=tk.DISABLED)
+        self.mostrar_progreso(trabajo, ", ".join(trabajo.destinos))
+        self.trabajador.agregar(trabajo)
+
+    def mostrar_progreso(self, trabajo, impresora):
+        """Muestra la ventana de progreso con botones de pausa y cancelación."""
+        progreso = tk.Toplevel(self.root)
+        progreso.title("Imprimiendo etiquetas")
+        progreso.transient(self.root)
+        progreso.grab_set()
+        
+        # Centrar ventana de progreso
+        progreso_width = 300
+        progreso_height = 140
+        if len(trabajo.destinos) > 1:
+            progreso_height += 22 * len(trabajo.destinos)
+        progreso_x = self.root.winfo_x() + (self.root.winfo_width() - progreso_width) // 2
+        progreso_y = self.root.winfo_y() + (self.root.winfo_height() - progreso_height) // 2
+        progreso.geometry(f"{progreso_width}x{progreso_height}+{progreso_x}+{progreso_y}")
+        
+        progreso.configure(bg="#f0f0f0")
+        progreso.resizable(False, False)
+        
+        mensaje_label = tk.Label(progreso, text="Leyendo Excel...", 
+                              font=("Arial", 10), bg="#f0f0f0", pady=10)
+        mensaje_label.pack()
+        
+        barra_progreso = ttk.Progressbar(progreso, orient="horizontal", 
+                                      length=250, mode="determinate")
+        barra_progreso.pack(pady=5)
+        
+        # Con varias impresoras, una línea de progreso por cada una
+        progreso_impresoras = {}
+        if len(trabajo.destinos) > 1:
+            for destino in trabajo.destinos:
+                etiqueta_impresora = tk.Label(progreso, text=f"{destino}: 0", 
+                                            font=("Arial", 9), bg="#f0f0f0")
+                etiqueta_impresora.pack()
+                progreso_impresoras[destino] = etiqueta_impresora
+        
+        botones_frame = tk.Frame(progreso, bg="#f0f0f0")
+        botones_frame.pack(pady=5)
+        
+        def alternar_pausa():
+            if trabajo.pausado:
+                trabajo.reanudar()
+                btn_pausa.config(text="Pausar")
+            else:
+                trabajo.pausar()
+                btn_pausa.config(text="Reanudar")
+        
+        def cancelar():
+            trabajo.cancelar()
+            btn_pausa.config(state=tk.DISABLED)
+            btn_cancelar.config(state=tk.DISABLED)
+            mensaje_label.config(text="Cancelando...")
+        
+        btn_pausa = tk.Button(botones_frame, text="Pausar", width=10, command=alternar_pausa)
+        btn_pausa.pack(side=tk.LEFT, padx=5)
+        btn_cancelar = tk.Button(botones_frame, text="Cancelar", width=10, command=cancelar,
+                                 bg="#F44336", fg="white")
+        btn_cancelar.pack(side=tk.LEFT, padx=5)
+        
+        # Cerrar la ventana equivale a cancelar
+        progreso.protocol("WM_DELETE_WINDOW", cancelar)
+        
+        self.root.after(100, self.atender_trabajo, trabajo, impresora, progreso,
+                        mensaje_label, barra_progreso, progreso_impresoras)
+
+    def atender_trabajo(self, trabajo, impresora, progreso, mensaje_label, barra_progreso,
+                        progreso_impresoras):
+        """Procesa los eventos publicados por el hilo de trabajo (se ejecuta en el hilo de Tk)."""
+        while True:
+            try:
+                evento = trabajo.eventos.get_nowait()
+            except queue.Empty:
+                break
+            
+            tipo = evento[0]
+            if tipo == "inicio":
+                barra_progreso.config(maximum=evento[1])
+                mensaje_label.config(text=f"Imprimiendo etiquetas: 0/{evento[1]}")
+            elif tipo == "progreso":
+                # Actualizar barra de progreso (en streaming el total crece a medida que se lee el Excel)
+                barra_progreso.config(maximum=evento[2], value=evento[1])
+                if not trabajo.cancelado:
+                    mensaje_label.config(text=f"Imprimiendo etiquetas: {evento[1]}/{evento[2]}")
+            elif tipo == "progreso_impresora":
+                _, destino, enviadas, total = evento
+                progreso_impresoras[destino].config(text=f"{destino}: {enviadas}/{total}")
+            elif tipo == "esperando":
+                # La impresora no puede recibir más etiquetas: el envío sigue solo cuando se resuelva
+                if not trabajo.cancelado:
+                    mensaje_label.config(text=f"Esperando impresora: {evento[2]}")
+            elif tipo == "reintento":
+                _, destino, intento, espera, _ = evento
+                if not trabajo.cancelado:
+                    mensaje_label.config(text=f"Error en {destino}, reintento {intento} en {espera:.1f} s")
+            elif tipo == "fallo":
+                # Las etiquetas fallidas se muestran todas juntas al terminar (ver ofrecer_reenvio)
+                if not trabajo.cancelado:
+                    mensaje_label.config(text=f"No se pudo enviar un lote a {evento[3]}; se seguirá con el resto")
+            elif tipo == "codigos_invalidos":
+                # La lista completa se muestra al terminar (ver informar_codigos_invalidos)
+                if not trabajo.cancelado:
+                    mensaje_label.config(text=f"{len(evento[1])} filas con código inválido no se imprimirán")
+            elif tipo == "error":
+                self.finalizar_impresion(progreso)
+                # MENSAJE: Error - No se pudo leer el Excel o error inesperado
+                messagebox.showerror("Error", evento[1])
+                self.informar_codigos_invalidos(trabajo)
+                return
+            elif tipo == "fin":
+                _, etiquetas_generadas, etiquetas_enviadas, cancelado, grupos = evento
+                self.finalizar_impresion(progreso)
+                self.informar_codigos_invalidos(trabajo)
+                # MENSAJE: Impresión completada, cancelada o Aviso
+                if cancelado:
+                    messagebox.showwarning("Impresión cancelada", 
+                                         f"Se canceló la impresión después de enviar {etiquetas_enviadas} de {etiquetas_generadas} etiquetas.")
+                elif trabajo.fallidas:
+                    self.ofrecer_reenvio(trabajo, etiquetas_generadas, etiquetas_enviadas)
+                elif etiquetas_enviadas > 0:
+                    mensaje = f"Se imprimieron {etiquetas_enviadas} de {etiquetas_generadas} etiquetas en la impresora '{impresora}'."
+                    if grupos:
+                        # Informar cuántas copias produjo cada etiqueta agrupada con ^PQ
+                        detalle = "\n".join(f"- {nombre}: {cantidad}" for nombre, cantidad in grupos[:10])
+                        if len(grupos) > 10:
+                            detalle += f"\n... y {len(grupos) - 10} grupos más"
+                        mensaje += f"\n\nEtiquetas idénticas enviadas una sola vez:\n{detalle}"
+                    if trabajo.medicion is not None:
+                        mensaje += f"\n\n{trabajo.medicion.resumen()}"
+                        if trabajo.ruta_reporte:
+                            mensaje += f"\nReporte: {trabajo.ruta_reporte}"
+                    messagebox.showinfo("Impresión completada", mensaje)
+                else:
+                    messagebox.showwarning("Aviso", "No se pudieron imprimir etiquetas en la impresora.")
+                return
+        
+        self.root.after(100, self.atender_trabajo, trabajo, impresora, progreso,
+                        mensaje_label, barra_progreso, progreso_impresoras)
+
+    def informar_codigos_invalidos(self, trabajo):
+        """Muestra juntas las filas que no se imprimieron por tener un código de menú inválido."""
+        invalidos = getattr(trabajo, "codigos_invalidos", None)
+        if not invalidos:
+            return
+        detalle = "\n".join(f"- Fila {invalido.fila}: {invalido.empleado}, código '{invalido.codigo}' {invalido.motivo}"
+                            for invalido in invalidos[:15])
+        if len(invalidos) > 15:
+            detalle += f"\n... y {len(invalidos) - 15} más"
+        # MENSAJE: Aviso - Códigos de menú inválidos
+        messagebox.showwarning("Códigos inválidos",
+                               f"Estas filas no se imprimieron porque su código de menú no es un EAN-13 válido:\n\n"
+                               f"{detalle}\n\nCorrija los códigos en el Excel y vuelva a imprimirlas.")
+
+    def ofrecer_reenvio(self, trabajo, etiquetas_generadas, etiquetas_enviadas):
+        """Muestra juntas las etiquetas que fallaron y ofrece reenviarlas en un solo trabajo."""
+        fallidas = trabajo.fallidas
+        detalle = "\n".join(f"- {fallida.nombre} ({fallida.destino})" for fallida in fallidas[:15])
+        if len(fallidas) > 15:
+            detalle += f"\n... y {len(fallidas) - 15} más"
+        
+        # MENSAJE: Pregunta - Etiquetas sin imprimir, ¿reenviar?
+        respuesta = messagebox.askyesno(
+            "Etiquetas sin imprimir",
+            f"Se imprimieron {etiquetas_enviadas} de {etiquetas_generadas} etiquetas.\n\n"
+            f"No se pudieron imprimir:\n{detalle}\n\n"
+            f"Último error: {fallidas[-1].error}\n\n"
+            "¿Desea reenviarlas ahora?")
+        if not respuesta:
+            return
+        
+        reenvio = trabajo.reenviar_fallidas()
+        self.root.config(cursor="watch")
+        self.btn_imprimir.config(state=tk.DISABLED)
+        self.btn_reanudar.config(state=tk.DISABLED)
+        self.mostrar_progreso(reenvio, ", ".join(reenvio.destinos))
+        self.trabajador.agregar(reenvio)
+
+    def opciones_envio(self):
+        """Política de reintentos, timeout de envío, procesos de generación y envío asíncrono según la configuración."""
+        return {
+            "reintentos": transportes.PoliticaReintentos(
+                intentos=max(int(self.configuraciones.get("reintentos", 3)), 1),
+                espera_inicial=self.configuraciones.get("espera_reintento", 0.5)),
+            "timeout": self.configuraciones.get("timeout_envio", 10),
+            "procesos": max(int(self.configuraciones.get("procesos_generacion", 1)), 1),
+            "asincrono": bool(self.configuraciones.get("envio_asincrono", False)),
+        }
+
+    def finalizar_impresion(self, progreso):
+        """Cierra la ventana de progreso y restaura la interfaz."""
+        try:
+            if progreso.winfo_exists():
+                progreso.destroy()
+        except:
+            pass
+            
+        # Restaurar interfaz
+        self.root.config(cursor="")
+        self.btn_imprimir.config(state=tk.NORMAL)
+        self.btn_reanudar.config(state=tk.NORMAL)
+        self.actualizar_boton_reanudar()
+    
+    def obtener_destino(self, impresora):
+        """Devuelve el destino de envío para transportes según el tipo de conexión."""
+        tipo = self.tipo_conexion.get()
+        if tipo == "USB" or tipo == "Paralelo":
+            return impresora
+        elif tipo == "Serie":
+            return transportes.destino_serie(self.combobox_com.get(),
+                                             self.configuraciones.get("baudios_serie", transportes.BAUDIOS_DEFECTO),
+                                             self.configuraciones.get("flujo_serie", transportes.FLUJO_NINGUNO))
+        elif tipo == "Red":
+            return transportes.PREFIJO_TCP + self.direccion_red.get().strip()
+        raise Exception("Tipo de conexión no soportado.")
     
     # =============================================================================
     # MÉTODOS DE CARGA Y GUARDADO DE CONFIGURACIONES
@@ -706,8 +921,27 @@ class EtiquetadoraApp:
             "ultima_impresora": "",
             "ultimo_tipo_conexion": "USB",
             "ultimo_puerto_com": "COM1",
+            "direccion_red": "",          # "host:puerto" de la impresora para conexión "Red"
+            "baudios_serie": 9600,        # Velocidad del puerto serie (hasta 115200, igual que en la impresora)
+            "flujo_serie": "ninguno",     # Control de flujo serie: "ninguno", "rtscts" o "xonxoff"
             "ultima_carpeta_excel": os.path.expanduser("~"),
-            "recientes": []
+            "recientes": [],
+            "ttl_impresoras": 60,         # Segundos que se reutiliza la lista de impresoras
+            "lote_max_etiquetas": 50,     # Etiquetas máximas por trabajo RAW
+            "lote_max_bytes": 65536,      # Bytes máximos por trabajo RAW
+            "lectura_streaming": False,   # Leer y enviar fila por fila (Excel muy grandes)
+            "formato_almacenado": False,  # Guardar el diseño en la impresora (^DF) y enviar solo los datos
+            "agrupar_identicas": False,   # Enviar una vez las etiquetas idénticas con ^PQ
+            "impresoras_paralelo": [],    # Impresoras extra (nombre o "tcp://host:puerto") para repartir
+            "criterio_reparto": "alternado",  # "alternado", "menu" o "lugar"
+            "controlar_estado": False,    # Consultar ~HS y esperar si falta papel o el buffer está lleno
+            "medir_tiempos": False,       # Medir cada etapa y guardar un reporte en ~/.etiquetador/reportes
+            "medir_inicio": False,        # Medir el arranque de la ventana y guardarlo en ~/.etiquetador/reportes
+            "reintentos": 3,              # Intentos por lote antes de darlo por fallido
+            "espera_reintento": 0.5,      # Segundos antes del primer reintento (se duplica en cada uno)
+            "timeout_envio": 10,          # Segundos máximos de espera de cada envío (red y serie)
+            "procesos_generacion": 1,     # Procesos que generan el ZPL en paralelo (corridas muy grandes)
+            "envio_asincrono": False      # Atender con asyncio varias impresoras "tcp://" en lugar de un hilo por impresora
         }
         
         try:
@@ -732,6 +966,9 @@ class EtiquetadoraApp:
             if hasattr(self, 'combobox_com'):
                 self.configuraciones["ultimo_puerto_com"] = self.combobox_com.get()
             
+            if hasattr(self, 'direccion_red'):
+                self.configuraciones["direccion_red"] = self.direccion_red.get().strip()
+            
             # Guardar la última carpeta usada para abrir Excel
             if self.excel_path:
                 self.configuraciones["ultima_carpeta_excel"] = os.path.dirname(self.excel_path)
@@ -752,31 +989,67 @@ class EtiquetadoraApp:
     # =============================================================================
     
     def setup_treeview(self):
-        """Configura el treeview para mostrar los registros del Excel."""
+        """Configura la lista de registros del Excel para el modo de impresión por selección.
+
+        La lista es virtual: las filas se insertan de a FILAS_POR_PAGINA a medida
+        que se desplaza, y la selección se guarda en self.seleccion (índices de
+        fila) para que incluya también las filas que todavía no se insertaron.
+        Un clic simple (o moverse con las flechas) reemplaza toda la selección;
+        Ctrl y Shift la modifican. Solo se imprimen las filas seleccionadas que
+        cumplen el filtro (ver filas_seleccionadas).
+        """
+        self.registros = []           # Registros del Excel cargado
+        self.textos_busqueda = []     # Empleado, menú y lugar en minúsculas de cada registro
+        self.vista = []               # Posiciones en self.registros que cumplen el filtro
+        self.filtro_actual = ""
+        self.insertadas = 0           # Filas de self.vista ya insertadas en el treeview
+        self.pagina_pendiente = False
+        self.seleccion = set()        # Índices de las filas seleccionadas para imprimir
+        self.indices_vista = None     # Índices de las filas que cumplen el filtro (None: sin filtro)
+        self.reemplazar_seleccion = False  # El próximo cambio de selección viene de un clic simple
+        self.filtro_pendiente = None  # after() del filtro en espera, para no filtrar en cada tecla
+        
+        # Campo de búsqueda
+        busqueda_frame = tk.Frame(self.registros_frame, bg="#f0f0f0")
+        busqueda_frame.pack(fill=tk.X, pady=(0, 5))
+        tk.Label(busqueda_frame, text="Buscar (empleado, menú o lugar):", bg="#f0f0f0").pack(side=tk.LEFT)
+        self.texto_filtro = tk.StringVar()
+        self.texto_filtro.trace_add("write", self.programar_filtro)
+        entrada_filtro = tk.Entry(busqueda_frame, textvariable=self.texto_filtro)
+        entrada_filtro.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+        
+        lista_frame = tk.Frame(self.registros_frame)
+        lista_frame.pack(fill=tk.BOTH, expand=True)
+        
         # Crear scrollbar para la lista
-        scrollbar = ttk.Scrollbar(self.registros_frame)
-        scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
+        self.scrollbar_registros = ttk.Scrollbar(lista_frame)
+        self.scrollbar_registros.pack(side=tk.RIGHT, fill=tk.Y)
         
         # Crear el treeview con columnas
-        self.tree = ttk.Treeview(self.registros_frame, 
-                               columns=("nombre", "menu"), 
+        self.tree = ttk.Treeview(lista_frame, 
+                               columns=("nombre", "menu", "lugar"), 
                                show="headings",
                                height=6,
                                selectmode="extended",
-                               yscrollcommand=scrollbar.set)
+                               yscrollcommand=self.al_desplazar_lista)
         
         # Configurar columnas
         self.tree.heading("nombre", text="Nombre de empleado")
         self.tree.heading("menu", text="Menú")
+        self.tree.heading("lugar", text="Lugar")
         
         self.tree.column("nombre", width=150, anchor="w")
         self.tree.column("menu", width=250, anchor="w")
+        self.tree.column("lugar", width=90, anchor="w")
         
         # Conectar scrollbar
-        scrollbar.configure(command=self.tree.yview)
+        self.scrollbar_registros.configure(command=self.tree.yview)
         
         # Empaquetar treeview
         self.tree.pack(fill=tk.BOTH, expand=True)
+        self.tree.bind("<<TreeviewSelect>>", self.al_cambiar_seleccion)
+        self.tree.bind("<Button-1>", self.al_pulsar_lista)
+        self.tree.bind("<KeyPress>", self.al_pulsar_tecla_lista)
         
         # Botones para manipular selección
         btn_frame = tk.Frame(self.registros_frame, bg="#f0f0f0")
@@ -792,59 +1065,289 @@ class EtiquetadoraApp:
                                      bg="#F44336", fg="white")
         btn_deseleccionar.pack(side=tk.LEFT)
         
+        # Cantidad de filas visibles y seleccionadas
+        self.label_registros = tk.Label(btn_frame, text="", bg="#f0f0f0", fg="#6c757d")
+        self.label_registros.pack(side=tk.RIGHT)
+        
     def seleccionar_items(self, seleccionar=True):
-        """Selecciona o deselecciona todos los items del treeview."""
+        """Selecciona o deselecciona todas las filas que cumplen el filtro, aunque no estén insertadas."""
+        indices = [self.registros[posicion].indice for posicion in self.vista]
+        self.reemplazar_seleccion = False
         if seleccionar:
-            self.tree.selection_set(self.tree.get_children())
+            self.seleccion.update(indices)
+            self.tree.selection_add(self.tree.get_children())
         else:
+            self.seleccion.difference_update(indices)
             self.tree.selection_remove(self.tree.get_children())
+        self.actualizar_contador_registros()
+    
+    def al_pulsar_lista(self, event):
+        """Anota si el clic sobre una fila reemplaza la selección (sin Ctrl ni Shift)."""
+        # Se ejecuta antes que el manejo propio del Treeview, que luego genera <<TreeviewSelect>>
+        if self.tree.identify_region(event.x, event.y) == "cell":
+            self.reemplazar_seleccion = not event.state & (MODIFICADOR_SHIFT | MODIFICADOR_CONTROL)
+    
+    def al_pulsar_tecla_lista(self, event):
+        """Las flechas sin Shift seleccionan una sola fila, igual que un clic simple."""
+        if event.keysym in ("Up", "Down", "Prior", "Next", "Home", "End"):
+            self.reemplazar_seleccion = not event.state & MODIFICADOR_SHIFT
+    
+    def al_cambiar_seleccion(self, event=None):
+        """Copia a self.seleccion lo que el usuario seleccionó en la lista.
+
+        Después de un clic simple la selección es solo lo marcado en la lista
+        (también se descartan las filas no insertadas y las ocultas por el
+        filtro); con Ctrl o Shift solo cambian las filas insertadas.
+        """
+        seleccionados = set(self.tree.selection())
+        if self.reemplazar_seleccion:
+            self.reemplazar_seleccion = False
+            self.seleccion = {int(iid) for iid in seleccionados}
+        else:
+            for iid in self.tree.get_children():
+                if iid in seleccionados:
+                    self.seleccion.add(int(iid))
+                else:
+                    self.seleccion.discard(int(iid))
+        self.actualizar_contador_registros()
+    
+    def filas_seleccionadas(self):
+        """Índices de las filas a imprimir: las seleccionadas que cumplen el filtro."""
+        if self.indices_vista is None:
+            return set(self.seleccion)
+        return self.seleccion & self.indices_vista
+    
+    def al_desplazar_lista(self, primero, ultimo):
+        """Actualiza la barra de desplazamiento y carga la página siguiente al acercarse al final."""
+        self.scrollbar_registros.set(primero, ultimo)
+        if float(ultimo) > 0.9 and self.insertadas < len(self.vista) and not self.pagina_pendiente:
+            self.pagina_pendiente = True
+            self.root.after_idle(self.insertar_pagina)
+    
+    def insertar_pagina(self):
+        """Inserta en el treeview las siguientes FILAS_POR_PAGINA filas de la vista."""
+        self.pagina_pendiente = False
+        fin = min(self.insertadas + FILAS_POR_PAGINA, len(self.vista))
+        seleccionadas = []
+        for posicion in self.vista[self.insertadas:fin]:
+            registro = self.registros[posicion]
+            nombre_menu = registro.nombre_menu
+            
+            # Truncar textos largos
+            if len(nombre_menu) > 40:
+                nombre_menu = nombre_menu[:37] + "..."
+            
+            iid = str(registro.indice)
+            self.tree.insert("", tk.END, iid=iid, values=(registro.nombre_empleado, nombre_menu, registro.lugar))
+            if registro.indice in self.seleccion:
+                seleccionadas.append(iid)
+        self.insertadas = fin
+        if seleccionadas:
+            # Cambio hecho por el programa: no debe tomarse como un clic simple pendiente
+            self.reemplazar_seleccion = False
+            self.tree.selection_add(seleccionadas)
+    
+    def programar_filtro(self, *args):
+        """Filtra la lista poco después de la última tecla."""
+        if self.filtro_pendiente is not None:
+            self.root.after_cancel(self.filtro_pendiente)
+        self.filtro_pendiente = self.root.after(200, self.aplicar_filtro)
+    
+    def aplicar_filtro(self):
+        """Recalcula las filas visibles según el texto de búsqueda."""
+        self.filtro_pendiente = None
+        texto = self.texto_filtro.get().strip().lower()
+        if not texto:
+            self.vista = list(range(len(self.registros)))
+        else:
+            # Si el texto nuevo contiene al anterior, alcanza con filtrar los resultados anteriores
+            base = self.vista if self.filtro_actual and self.filtro_actual in texto else range(len(self.registros))
+            self.vista = [posicion for posicion in base if texto in self.textos_busqueda[posicion]]
+        self.filtro_actual = texto
+        self.indices_vista = {self.registros[posicion].indice for posicion in self.vista} if texto else None
+        
+        self.tree.delete(*self.tree.get_children())
+        self.insertadas = 0
+        self.insertar_pagina()
+        self.tree.yview_moveto(0)
+        self.actualizar_contador_registros()
+    
+    def actualizar_contador_registros(self):
+        self.label_registros.config(
+            text=f"{len(self.vista)} de {len(self.registros)} filas · {len(self.filas_seleccionadas())} seleccionadas")
     
     def actualizar_modo_impresion(self):
         """Actualiza la interfaz según el modo de impresión seleccionado."""
         if self.modo_impresion.get() == "seleccion":
             # Cargar los datos del Excel para mostrar en la lista
             self.cargar_datos_excel()
-            self.registros_frame.pack(fill=tk.BOTH, expand=True, pady=5)
+            self.registros_frame.grid(row=3, column=0, sticky="nsew", pady=5)
         else:
-            self.registros_frame.pack_forget()
+            self.registros_frame.grid_remove()
     
     def cargar_datos_excel(self):
-        """Carga los datos del excel en el treeview."""
-        # Limpiar treeview
-        for item in self.tree.get_children():
-            self.tree.delete(item)
+        """Lee el Excel en segundo plano y muestra sus registros en la lista."""
+        self.registros = []
+        self.textos_busqueda = []
+        self.seleccion = set()
+        self.indices_vista = None
+        self.vista = []
+        self.tree.delete(*self.tree.get_children())
+        self.insertadas = 0
+        self.label_registros.config(text="")
             
         if not self.excel_path or not os.path.exists(self.excel_path):
             return
-            
+        
+        self.label_registros.config(text="Leyendo Excel...")
+        excel_path = self.excel_path
+        resultado = queue.Queue()
+        
+        def leer():
+            try:
+                resultado.put(("ok", cache_registros.cargar_registros(excel_path)))
+            except ValueError:
+                # Excel vacío o sin códigos de menú: la lista queda vacía
+                resultado.put(("ok", []))
+            except Exception as e:
+                resultado.put(("error", e))
+        
+        threading.Thread(target=leer, name="LecturaExcel", daemon=True).start()
+        self.root.after(50, self.recibir_registros, resultado, excel_path)
+    
+    def recibir_registros(self, resultado, excel_path):
+        """Muestra los registros leídos por cargar_datos_excel cuando están listos."""
         try:
-            df = pd.read_excel(self.excel_path, header=1)
-            if df.empty:
-                return
-                
-            # Iterar por las filas e insertar en el treeview
-            for index, row in df.iterrows():
-                codigo = str(row.get("Código del menú", "")).strip()
-                if not codigo:  # Omitir filas sin código
-                    continue
-                    
-                # Insertar fila en el treeview
-                nombre_empleado = str(row.get("Nombre de empleado", "")).strip() or "Sin especificar"
-                nombre_menu = str(row.get("Nombre del menú", "")).strip() or "Sin especificar"
-                
-                # Truncar textos largos
-                if len(nombre_menu) > 40:
-                    nombre_menu = nombre_menu[:37] + "..."
-                
-                self.tree.insert("", tk.END, iid=str(index), values=(nombre_empleado, nombre_menu),
-                                tags=(str(index), codigo))
-                
-            # Seleccionar todos los items por defecto
-            self.seleccionar_items(True)
-            
-        except Exception as e:
+            tipo, valor = resultado.get_nowait()
+        except queue.Empty:
+            self.root.after(50, self.recibir_registros, resultado, excel_path)
+            return
+        
+        if excel_path != self.excel_path:
+            return  # Se eligió otro archivo mientras se leía
+        if tipo == "error":
+            self.label_registros.config(text="")
             # MENSAJE: Error - No se pudieron cargar los datos del Excel
-            messagebox.showerror("Error", f"No se pudieron cargar los datos del Excel: {str(e)}")
+            messagebox.showerror("Error", f"No se pudieron cargar los datos del Excel: {str(valor)}")
+            return
+        
+        self.registros = valor
+        self.textos_busqueda = [f"{registro.nombre_empleado} {registro.nombre_menu} {registro.lugar}".lower()
+                                for registro in valor]
+        # Seleccionar todas las filas por defecto
+        self.seleccion = {registro.indice for registro in valor}
+        self.filtro_actual = ""
+        self.aplicar_filtro()
+    
+    # =============================================================================
+    # MÉTODOS DE VISTA PREVIA
+    # =============================================================================
+    
+    def mostrar_vista_previa(self):
+        """Abre una ventana para recorrer las etiquetas del Excel tal como se van a imprimir."""
+        if not self.excel_path or not os.path.exists(self.excel_path):
+            # MENSAJE: Error - Selecciona un archivo Excel primero
+            messagebox.showerror("Error", "Selecciona un archivo Excel primero.")
+            return
+        
+        ventana = tk.Toplevel(self.root)
+        ventana.title("Vista previa de etiquetas")
+        ventana.transient(self.root)
+        ventana.configure(bg="#f0f0f0")
+        
+        info_label = tk.Label(ventana, text="Leyendo Excel...", font=("Arial", 10), bg="#f0f0f0", pady=5)
+        info_label.pack()
+        imagen_label = tk.Label(ventana, bg="white", width=50, height=20, relief=tk.SUNKEN, borderwidth=1)
+        imagen_label.pack(padx=10, pady=5)
+        
+        controles = tk.Frame(ventana, bg="#f0f0f0")
+        controles.pack(fill=tk.X, padx=10, pady=(0, 10))
+        
+        estado = {"registros": [], "posicion": 0}
+        # Fechas fijas mientras la ventana está abierta, para que el ZPL (clave de la caché) no cambie
+        renderizador = renderizado.Renderizador(datetime.now(), self.fecha_entry.get_date())
+        
+        def zpl_de(posicion):
+            return renderizador.generar(estado["registros"][posicion])
+        
+        def mostrar(valor):
+            posicion = int(float(valor)) - 1
+            registros = estado["registros"]
+            if not 0 <= posicion < len(registros):
+                return
+            estado["posicion"] = posicion
+            info_label.config(text=f"{posicion + 1} de {len(registros)} · {registros[posicion].nombre_empleado}")
+            futuro = self.cache_vista_previa.solicitar(zpl_de(posicion))
+            # Dibujar de antemano las siguientes para que recorrer la lista sea fluido
+            for siguiente in range(posicion + 1, min(posicion + 1 + ADELANTO_VISTA_PREVIA, len(registros))):
+                self.cache_vista_previa.solicitar(zpl_de(siguiente))
+            esperar_imagen(futuro, posicion)
+        
+        def esperar_imagen(futuro, posicion):
+            if not ventana.winfo_exists() or posicion != estado["posicion"]:
+                return  # Ventana cerrada o el usuario ya pasó a otra etiqueta
+            if not futuro.done():
+                ventana.after(30, esperar_imagen, futuro, posicion)
+                return
+            try:
+                imagen = tk.PhotoImage(data=base64.b64encode(futuro.result()))
+            except Exception as e:
+                imagen_label.config(image="", text=f"No se pudo dibujar la etiqueta: {e}", width=50, height=20)
+                return
+            imagen_label.config(image=imagen, text="", width=imagen.width(), height=imagen.height())
+            imagen_label.image = imagen  # Conservar la referencia para que Tk no la descarte
+        
+        escala = tk.Scale(controles, from_=1, to=1, orient=tk.HORIZONTAL, showvalue=False,
+                          command=mostrar, bg="#f0f0f0", highlightthickness=0)
+        tk.Button(controles, text="< Anterior", width=10,
+                  command=lambda: escala.set(escala.get() - 1)).pack(side=tk.LEFT)
+        tk.Button(controles, text="Siguiente >", width=10,
+                  command=lambda: escala.set(escala.get() + 1)).pack(side=tk.RIGHT)
+        escala.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=10)
+        
+        def cargar(registros):
+            # En el modo de selección solo se muestran las filas elegidas
+            if self.modo_impresion.get() == "seleccion":
+                seleccionadas = self.filas_seleccionadas()
+                registros = [registro for registro in registros if registro.indice in seleccionadas]
+            # Las filas con código inválido no se imprimen, así que tampoco se muestran
+            registros = [registro for registro in registros if registro.ean13]
+            if not registros:
+                info_label.config(text="No hay etiquetas para mostrar.")
+                return
+            estado["registros"] = registros
+            escala.config(to=len(registros))
+            mostrar(1)
+        
+        # Si la lista de registros ya está cargada se usa; si no, el Excel se lee en segundo plano
+        if self.modo_impresion.get() == "seleccion" and self.registros:
+            cargar(self.registros)
+            return
+        
+        resultado = queue.Queue()
+        excel_path = self.excel_path
+        
+        def leer():
+            try:
+                resultado.put(("ok", cache_registros.cargar_registros(excel_path)))
+            except Exception as e:
+                resultado.put(("error", e))
+        
+        def recibir():
+            if not ventana.winfo_exists():
+                return
+            try:
+                tipo, valor = resultado.get_nowait()
+            except queue.Empty:
+                ventana.after(50, recibir)
+                return
+            if tipo == "error":
+                info_label.config(text=f"No se pudieron cargar los datos del Excel: {valor}")
+                return
+            cargar(valor)
+        
+        threading.Thread(target=leer, name="LecturaVistaPrevia", daemon=True).start()
+        ventana.after(50, recibir)
     
     # =============================================================================
     # MÉTODOS DE CIERRE Y SALIDA
@@ -854,6 +1357,7 @@ class EtiquetadoraApp:
     def on_close(self):
         """Método llamado al cerrar la aplicación."""
         self.guardar_configuraciones()
+        self.cache_vista_previa.cerrar()
         self.root.destroy()
 
     def cargar_iconos(self):
@@ -0,0 +1,234 @@
+# =============================================================================
+# LECTURA DE PEDIDOS Y GENERACIÓN DE ZPL
+# =============================================================================
+# Este módulo no depende de tkinter ni de win32print para poder usarse tanto
+# desde la interfaz gráfica como desde la línea de comandos. El armado del
+# ZPL está en renderizado.py; sus funciones se reexportan aquí.
+# pandas se importa recién al leer un Excel, porque tarda en cargar y
+# demoraría la apertura de la ventana.
+from collections import namedtuple
+
+from renderizado import (MAX_CARACTERES_LINEA, NOMBRE_FORMATO, agregar_cantidad, digito_verificador_ean13,
+                         dividir_nombre_menu, formatear_nombre_empleado, generar_formato, generar_zpl)
+
+SIN_ESPECIFICAR = "Sin especificar"
+
+COLUMNA_CODIGO = "Código del menú"
+COLUMNA_EMPLEADO = "Nombre de empleado"
+COLUMNA_MENU = "Nombre del menú"
+COLUMNA_LUGAR = "Lugar"
+COLUMNAS_EXCEL = (COLUMNA_CODIGO, COLUMNA_EMPLEADO, COLUMNA_MENU, COLUMNA_LUGAR)
+PRIMERA_FILA_DATOS = 3  # Fila de la hoja donde empiezan los pedidos (después del título y los encabezados)
+
+MOTIVO_NO_NUMERICO = "no es numérico"
+MOTIVO_LARGO = "tiene más de 13 dígitos"
+MOTIVO_VERIFICADOR = "el dígito verificador no corresponde"
+
+# Registro de una fila del Excel ya normalizada:
+#   indice          -> índice de la fila en el DataFrame (se usa como id en la lista)
+#   codigo          -> código del menú rellenado con ceros a 12 dígitos (EAN-13 sin verificador);
+#                      si no es un código válido, el texto tal como figura en el Excel
+#   nombre_empleado -> nombre tal como figura en el Excel
+#   nombre_formato  -> nombre en formato "APELLIDO, NOMBRE" en mayúsculas
+#   nombre_menu     -> nombre del menú completo
+#   lugar           -> columna "Lugar" ("" si el Excel no la tiene), para repartir entre impresoras
+#   ean13           -> código completo de 13 dígitos con el verificador ("" si el código no es válido;
+#                      esas filas no se imprimen)
+Registro = namedtuple("Registro", ["indice", "codigo", "nombre_empleado", "nombre_formato", "nombre_menu",
+                                   "lugar", "ean13"])
+
+# Fila cuyo código de menú no es un EAN-13 válido, para informarla antes de imprimir:
+#   fila    -> número de fila en la hoja de Excel
+#   codigo  -> texto del código tal como figura en el Excel
+#   empleado, motivo
+CodigoInvalido = namedtuple("CodigoInvalido", ["fila", "codigo", "empleado", "motivo"])
+
+
+def _columna_texto(df, columna):
+    """Devuelve la columna como texto sin espacios en los extremos ("" si falta o está vacía)."""
+    if columna not in df.columns:
+        import pandas as pd
+
+        return pd.Series("", index=df.index, dtype=object)
+    return df[columna].fillna("").astype(str).str.strip()
+
+
+def formatear_nombres_empleado(nombres):
+    """Versión vectorizada de formatear_nombre_empleado para una columna completa."""
+    mayusculas = nombres.str.upper()
+    # Separar la última palabra (apellido) del resto, normalizando los espacios intermedios
+    partes = mayusculas.str.replace(r"\s+", " ", regex=True).str.rpartition(" ")
+    invertido = partes[2] + ", " + partes[0]
+    # Con coma o con una sola palabra se usa el nombre tal como está
+    usar_original = nombres.str.contains(",", regex=False) | (partes[1] == "")
+    return mayusculas.where(usar_original, invertido)
+
+
+def validar_codigo(codigo):
+    """Valida un código de menú y devuelve (código de 12 dígitos, EAN-13 completo, motivo).
+
+    Se aceptan hasta 12 dígitos (se rellenan con ceros a la izquierda) o 13
+    con el dígito verificador correcto. Si el código no es válido se devuelve
+    el texto original, "" como EAN-13 y el motivo.
+    """
+    if not (codigo.isascii() and codigo.isdigit()):
+        return codigo, "", MOTIVO_NO_NUMERICO
+    if len(codigo) > 13:
+        return codigo, "", MOTIVO_LARGO
+    base = codigo.zfill(12)[:12]
+    ean13 = base + digito_verificador_ean13(base)
+    if len(codigo) == 13 and codigo != ean13:
+        return codigo, "", f"{MOTIVO_VERIFICADOR} (debería ser {ean13[-1]})"
+    return base, ean13, ""
+
+
+def validar_codigos(codigos):
+    """Versión vectorizada de validar_codigo para una columna completa.
+
+    Los dígitos verificadores de toda la columna se calculan de una vez con
+    NumPy. Devuelve dos Series alineadas con codigos: el código de 12 dígitos
+    (o el texto original si no es válido) y el EAN-13 ("" si no es válido).
+    """
+    import numpy as np
+    import pandas as pd
+
+    largos = codigos.str.len()
+    aceptables = codigos.str.fullmatch(r"[0-9]+") & (largos <= 13)
+    # Primeros 12 dígitos; los códigos no aceptables se reemplazan por ceros solo para el cálculo
+    bases = codigos.where(aceptables, "0").str.zfill(12).str[:12]
+    digitos = np.frombuffer("".join(bases).encode('ascii'), dtype=np.uint8).reshape(-1, 12) - ord("0")
+    # Pesos EAN-13: 1 en las posiciones pares y 3 en las impares, de izquierda a derecha
+    sumas = digitos[:, 0::2].sum(axis=1, dtype=np.int64) + 3 * digitos[:, 1::2].sum(axis=1, dtype=np.int64)
+    verificadores = ((10 - sumas % 10) % 10 + ord("0")).astype(np.uint8).tobytes().decode('ascii')
+    ean13 = bases + pd.Series(list(verificadores), index=codigos.index, dtype=object)
+    # Con 13 dígitos, el último tiene que coincidir con el verificador calculado
+    validos = aceptables & ((largos < 13) | (codigos == ean13))
+    return bases.where(validos, codigos), ean13.where(validos, "")
+
+
+def codigo_invalido(registro):
+    """Describe la fila de un registro con código inválido (registro.ean13 == "")."""
+    _, _, motivo = validar_codigo(registro.codigo)
+    return CodigoInvalido(registro.indice + PRIMERA_FILA_DATOS, registro.codigo, registro.nombre_empleado, motivo)
+
+
+def leer_registros(excel_path):
+    """Lee el Excel de pedidos y devuelve los registros que tienen código de menú.
+
+    Se leen solo las columnas necesarias como texto y la limpieza se hace
+    por columna, en una sola pasada, sin iterar fila por fila. Los registros
+    con un código que no es un EAN-13 válido se devuelven con ean13 == "".
+    """
+    import pandas as pd
+
+    df = pd.read_excel(excel_path, header=1, dtype=str,
+                       usecols=lambda columna: columna in COLUMNAS_EXCEL)
+    if df.empty:
+        raise ValueError("El archivo Excel está vacío.")
+
+    # Omitir filas sin código
+    codigos = _columna_texto(df, COLUMNA_CODIGO)
+    con_codigo = codigos != ""
+    if not con_codigo.any():
+        raise ValueError("El Excel no contiene códigos de menú válidos.")
+    df = df[con_codigo]
+
+    # Validar los códigos y rellenarlos con ceros a la izquierda hasta tener 12 dígitos para EAN-13
+    codigos, codigos_ean13 = validar_codigos(codigos[con_codigo])
+    empleados = _columna_texto(df, COLUMNA_EMPLEADO).replace("", SIN_ESPECIFICAR)
+    menus = _columna_texto(df, COLUMNA_MENU).replace("", SIN_ESPECIFICAR)
+    lugares = _columna_texto(df, COLUMNA_LUGAR)
+    nombres_formato = formatear_nombres_empleado(empleados)
+
+    return list(map(Registro._make, zip(df.index.tolist(), codigos.tolist(), empleados.tolist(),
+                                        nombres_formato.tolist(), menus.tolist(), lugares.tolist(),
+                                        codigos_ean13.tolist())))
+
+
+def _celda_texto(valor):
+    """Convierte una celda leída con openpyxl al mismo texto que produce leer_registros."""
+    if valor is None:
+        return ""
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def estimar_filas(excel_path):
+    """Estima la cantidad de filas de datos según las dimensiones guardadas en la hoja.
+
+    Los libros escritos en modo write_only o por otros programas pueden no
+    guardarlas (o guardarlas mal): en ese caso devuelve 0 o un valor
+    aproximado, así que sirve solo como total inicial del progreso.
+    """
+    from openpyxl import load_workbook
+
+    libro = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        return max((libro.active.max_row or 0) - 2, 0)
+    finally:
+        libro.close()
+
+
+def iterar_registros(excel_path):
+    """Lee los registros del Excel fila por fila, sin cargar el libro completo en memoria.
+
+    Usa openpyxl en modo solo lectura y aplica la misma normalización que
+    leer_registros, por lo que la memoria se mantiene constante sin importar
+    la cantidad de filas. Como leer_registros, lanza ValueError si el libro
+    no tiene filas o ningún código de menú (recién al terminar de recorrerlo).
+    """
+    from openpyxl import load_workbook
+
+    libro = load_workbook(excel_path, read_only=True, data_only=True)
+    try:
+        filas = libro.active.iter_rows(values_only=True)
+        # La primera fila es el título y la segunda los encabezados (header=1)
+        next(filas, None)
+        encabezados = [_celda_texto(valor) for valor in next(filas, ())]
+        posiciones = {columna: encabezados.index(columna) if columna in encabezados else None
+                      for columna in COLUMNAS_EXCEL}
+
+        def valor_columna(fila, columna):
+            posicion = posiciones[columna]
+            if posicion is None or posicion >= len(fila):
+                return ""
+            return _celda_texto(fila[posicion])
+
+        hay_filas = False
+        hay_registros = False
+        for indice, fila in enumerate(filas):
+            hay_filas = True
+            codigo = valor_columna(fila, COLUMNA_CODIGO)
+            if not codigo:  # Omitir filas sin código
+                continue
+            hay_registros = True
+            nombre_empleado = valor_columna(fila, COLUMNA_EMPLEADO) or SIN_ESPECIFICAR
+            codigo, codigo_ean13, _ = validar_codigo(codigo)
+            yield Registro(indice, codigo, nombre_empleado,
+                           formatear_nombre_empleado(nombre_empleado),
+                           valor_columna(fila, COLUMNA_MENU) or SIN_ESPECIFICAR,
+                           valor_columna(fila, COLUMNA_LUGAR), codigo_ean13)
+    finally:
+        libro.close()
+
+    if not hay_filas:
+        raise ValueError("El archivo Excel está vacío.")
+    if not hay_registros:
+        raise ValueError("El Excel no contiene códigos de menú válidos.")
+
+
+def agrupar_identicas(etiquetas):
+    """Junta las etiquetas (nombre, zpl, cantidad) con el mismo ZPL en una sola con ^PQ.
+
+    Se respeta el orden de la primera aparición de cada etiqueta. Recorre
+    todas las etiquetas antes de devolver, por lo que no es streaming.
+    """
+    grupos = {}
+    for nombre, zpl, cantidad in etiquetas:
+        if zpl in grupos:
+            grupos[zpl][2] += cantidad
+        else:
+            grupos[zpl] = [nombre, zpl, cantidad]
+    return [(nombre, agregar_cantidad(zpl, cantidad), cantidad)
+            for nombre, zpl, cantidad in grupos.values()]
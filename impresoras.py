@@ -0,0 +1,120 @@
+# =============================================================================
+# REGISTRO DE IMPRESORAS ZEBRA
+# =============================================================================
+# Enumerar impresoras (EnumPrinters y, si falla, "wmic") puede tardar varios
+# segundos. El registro guarda el último resultado durante un tiempo (TTL) y
+# lo actualiza en segundo plano, así verificar si una impresora existe es una
+# búsqueda en un conjunto en lugar de una nueva enumeración.
+import logging
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# Términos que identifican impresoras Zebra por su nombre
+TERMINOS_ZEBRA = ["zebra", "zdesigner", "zt", "gk", "zd", "lp", "gx", "gc"]
+TERMINOS_ZEBRA_WMIC = ["zebra", "zdesigner", "zt", "gk", "zd"]
+
+
+class FuenteWin32:
+    """Obtiene las impresoras Zebra instaladas en Windows."""
+
+    def listar(self):
+        impresoras_zebra = []
+        try:
+            import win32print
+
+            # Buscar impresoras locales (USB y Paralelo)
+            for printer in win32print.EnumPrinters(win32print.PRINTER_ENUM_LOCAL):
+                printer_name = printer[2].lower()
+                if any(term in printer_name for term in TERMINOS_ZEBRA):
+                    impresoras_zebra.append(printer[2])
+        except Exception as e:
+            logger.warning("Error al enumerar impresoras: %s", e)
+            try:
+                import subprocess
+
+                output = subprocess.check_output(["wmic", "printer", "get", "name"]).decode('utf-8')
+                for line in output.split('\n'):
+                    line = line.strip().lower()
+                    if any(term in line for term in TERMINOS_ZEBRA_WMIC):
+                        impresoras_zebra.append(line)
+            except Exception:
+                pass
+        return impresoras_zebra
+
+
+class FuenteFija:
+    """Fuente con una lista fija de impresoras, para pruebas o equipos sin Windows."""
+
+    def __init__(self, impresoras):
+        self.impresoras = list(impresoras)
+
+    def listar(self):
+        return list(self.impresoras)
+
+
+class RegistroImpresoras:
+    """Caché con vencimiento de las impresoras encontradas por una fuente."""
+
+    def __init__(self, fuente=None, ttl=60):
+        self.fuente = fuente if fuente is not None else FuenteWin32()
+        self.ttl = ttl  # Segundos que se considera vigente la última enumeración
+        self._impresoras = []
+        self._nombres = frozenset()
+        self._actualizado = None  # time.monotonic() de la última enumeración
+        self._bloqueo = threading.Lock()
+        self._refrescando = False
+
+    @property
+    def vencido(self):
+        return self._actualizado is None or time.monotonic() - self._actualizado > self.ttl
+
+    def refrescar(self):
+        """Vuelve a enumerar las impresoras (bloqueante) y devuelve la lista."""
+        impresoras = self.fuente.listar()
+        with self._bloqueo:
+            self._impresoras = impresoras
+            self._nombres = frozenset(impresoras)
+            self._actualizado = time.monotonic()
+            self._refrescando = False
+        return list(impresoras)
+
+    def refrescar_en_segundo_plano(self):
+        """Lanza una enumeración en un hilo aparte si no hay otra en curso."""
+        with self._bloqueo:
+            if self._refrescando:
+                return
+            self._refrescando = True
+
+        def tarea():
+            try:
+                self.refrescar()
+            except Exception as e:
+                logger.warning("Error al actualizar impresoras: %s", e)
+                with self._bloqueo:
+                    self._refrescando = False
+
+        threading.Thread(target=tarea, name="RegistroImpresoras", daemon=True).start()
+
+    def listar(self):
+        """Devuelve las impresoras conocidas; la primera vez enumera, luego actualiza en segundo plano."""
+        if self._actualizado is None:
+            return self.refrescar()
+        if self.vencido:
+            self.refrescar_en_segundo_plano()
+        with self._bloqueo:
+            return list(self._impresoras)
+
+    def disponible(self, nombre):
+        """Indica si la impresora está instalada.
+
+        Responde siempre desde la caché, sin enumerar en este hilo (se llama
+        desde la interfaz). Si no está, la da por ausente y actualiza la caché
+        en segundo plano, por si se acaba de conectar.
+        """
+        with self._bloqueo:
+            encontrada = nombre in self._nombres
+        if self.vencido or not encontrada:
+            self.refrescar_en_segundo_plano()
+        return encontrada
@@ -0,0 +1,173 @@
+# =============================================================================
+# MEDICIÓN DE TIEMPOS DE UNA CORRIDA
+# =============================================================================
+# Instrumentación opcional de un trabajo de impresión: tiempo por etapa
+# (carga, validación, generación, envío), tiempo de generación de cada
+# etiqueta y latencia de cada envío. Al terminar se guarda un reporte JSON en
+# ~/.etiquetador/reportes/ y se arma un resumen para mostrar al usuario.
+# También guarda los tiempos de arranque de la ventana (ver guardar_inicio).
+import json
+import logging
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+CARPETA_REPORTES = os.path.join(os.path.expanduser("~"), ".etiquetador", "reportes")
+MAX_REPORTES = 50  # Reportes que se conservan; los más antiguos se eliminan
+ARCHIVO_INICIO = "inicio.jsonl"  # Tiempos de arranque, una línea JSON por apertura
+
+
+def percentil(valores, porcentaje):
+    """Devuelve el percentil (método del rango más cercano) de una lista de valores, o None si está vacía."""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posicion = max(math.ceil(porcentaje / 100 * len(ordenados)) - 1, 0)
+    return ordenados[posicion]
+
+
+def _milisegundos(segundos):
+    return None if segundos is None else round(segundos * 1000, 3)
+
+
+class Medicion:
+    """Acumula los tiempos de una corrida. Se puede usar desde varios hilos."""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fecha = datetime.now()
+        self.fin = None
+        self.etapas = {}              # nombre -> segundos acumulados
+        self.generacion = []          # segundos de generación de cada etiqueta
+        self.envios = []              # segundos de cada envío (un lote)
+        self.bytes_enviados = 0
+        self.etiquetas_enviadas = 0
+        self.envios_fallidos = 0
+        self.etiquetas_fallidas = 0
+        self.datos = {}               # Información de la corrida (Excel, impresoras, opciones)
+        self._bloqueo = threading.Lock()
+
+    @contextmanager
+    def etapa(self, nombre):
+        """Suma al total de la etapa el tiempo que tarda el bloque with."""
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.sumar_etapa(nombre, time.perf_counter() - inicio)
+
+    def sumar_etapa(self, nombre, segundos):
+        with self._bloqueo:
+            self.etapas[nombre] = self.etapas.get(nombre, 0.0) + segundos
+
+    def registrar_generacion(self, segundos):
+        """Registra el tiempo de generación del ZPL de una etiqueta."""
+        with self._bloqueo:
+            self.generacion.append(segundos)
+
+    def registrar_envio(self, segundos, cantidad_bytes, cantidad_etiquetas):
+        """Registra un envío exitoso al transporte."""
+        with self._bloqueo:
+            self.envios.append(segundos)
+            self.bytes_enviados += cantidad_bytes
+            self.etiquetas_enviadas += cantidad_etiquetas
+
+    def registrar_fallo(self, segundos, cantidad_etiquetas):
+        """Registra un envío que no se pudo completar."""
+        with self._bloqueo:
+            self.envios.append(segundos)
+            self.envios_fallidos += 1
+            self.etiquetas_fallidas += cantidad_etiquetas
+
+    def terminar(self):
+        """Marca el final de la corrida."""
+        self.fin = time.perf_counter()
+
+    @property
+    def total(self):
+        return (self.fin or time.perf_counter()) - self.inicio
+
+    def reporte(self):
+        """Devuelve el reporte de la corrida como diccionario serializable a JSON."""
+        with self._bloqueo:
+            generacion = list(self.generacion)
+            envios = list(self.envios)
+            etapas = dict(self.etapas)
+            etapas["generacion"] = etapas.get("generacion", 0.0) + sum(generacion)
+            etapas["envio"] = etapas.get("envio", 0.0) + sum(envios)
+            return {
+                "fecha": self.fecha.isoformat(timespec="seconds"),
+                **self.datos,
+                "segundos_total": round(self.total, 3),
+                "etapas_segundos": {nombre: round(segundos, 4) for nombre, segundos in etapas.items()},
+                "generacion_ms": {"etiquetas": len(generacion),
+                                  "p50": _milisegundos(percentil(generacion, 50)),
+                                  "p95": _milisegundos(percentil(generacion, 95))},
+                "envio_ms": {"envios": len(envios),
+                             "p50": _milisegundos(percentil(envios, 50)),
+                             "p95": _milisegundos(percentil(envios, 95)),
+                             "maximo": _milisegundos(max(envios, default=None))},
+                "bytes_enviados": self.bytes_enviados,
+                "etiquetas_enviadas": self.etiquetas_enviadas,
+                "envios_fallidos": self.envios_fallidos,
+                "etiquetas_fallidas": self.etiquetas_fallidas,
+            }
+
+    def resumen(self):
+        """Texto breve con los datos principales del reporte, para el diálogo final."""
+        datos = self.reporte()
+        etapas = datos["etapas_segundos"]
+        lineas = [f"Tiempo total: {datos['segundos_total']:.2f} s"]
+        lineas.append("Etapas: " + ", ".join(f"{nombre} {segundos:.2f} s" for nombre, segundos in etapas.items()))
+        if datos["envio_ms"]["envios"]:
+            lineas.append(f"Latencia de envío: p50 {datos['envio_ms']['p50']:.1f} ms, "
+                          f"p95 {datos['envio_ms']['p95']:.1f} ms")
+        lineas.append(f"Enviado: {datos['bytes_enviados'] / 1024:.1f} KB en {datos['envio_ms']['envios']} trabajos")
+        if datos["envios_fallidos"]:
+            lineas.append(f"Fallos: {datos['envios_fallidos']} trabajos ({datos['etiquetas_fallidas']} etiquetas)")
+        return "\n".join(lineas)
+
+    def guardar(self, carpeta=None):
+        """Guarda el reporte en la carpeta de reportes y devuelve la ruta (None si falla)."""
+        carpeta = carpeta or CARPETA_REPORTES
+        try:
+            os.makedirs(carpeta, exist_ok=True)
+            ruta = os.path.join(carpeta, f"reporte_{self.fecha.strftime('%Y%m%d_%H%M%S_%f')}.json")
+            with open(ruta, 'w', encoding='utf-8') as f:
+                json.dump(self.reporte(), f, ensure_ascii=False, indent=2)
+
+            # Conservar solo los MAX_REPORTES más recientes
+            reportes = sorted(nombre for nombre in os.listdir(carpeta)
+                              if nombre.startswith("reporte_") and nombre.endswith(".json"))
+            for viejo in reportes[:-MAX_REPORTES]:
+                os.remove(os.path.join(carpeta, viejo))
+            return ruta
+        except Exception as e:
+            logger.warning("Error al guardar el reporte de la corrida: %s", e)
+            return None
+
+
+def guardar_inicio(tiempos, carpeta=None):
+    """Agrega los tiempos de arranque (segundos desde que empezó a cargarse el programa) al historial.
+
+    Devuelve la ruta del archivo, o None si no se pudo guardar.
+    """
+    carpeta = carpeta or CARPETA_REPORTES
+    datos = {"fecha": datetime.now().isoformat(timespec="seconds"),
+             **{etapa: round(segundos, 4) for etapa, segundos in tiempos.items()}}
+    # Solo se muestra si se configura logging con nivel INFO
+    logger.info("Arranque: %s", ", ".join(f"{etapa} {segundos:.3f} s" for etapa, segundos in tiempos.items()))
+    try:
+        os.makedirs(carpeta, exist_ok=True)
+        ruta = os.path.join(carpeta, ARCHIVO_INICIO)
+        with open(ruta, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(datos, ensure_ascii=False) + "\n")
+        return ruta
+    except Exception as e:
+        logger.warning("Error al guardar los tiempos de arranque: %s", e)
+        return None
@@ -0,0 +1,270 @@
+# =============================================================================
+# ARMADO DEL ZPL DE LAS ETIQUETAS
+# =============================================================================
+# Este módulo no depende de tkinter, win32print ni pandas: solo convierte los
+# registros ya leídos en el ZPL que se envía a la impresora, así se puede
+# importar y probar por separado.
+#
+# Los menús y los nombres se repiten cientos de veces en un mismo Excel, por
+# eso la división del menú en líneas y el formato "APELLIDO, NOMBRE" se
+# memorizan por texto. El ZPL se arma como bytes uniendo partes fijas
+# codificadas una sola vez por corrida con los campos variables de cada
+# etiqueta, sin formatear la plantilla completa en cada fila.
+#
+# Para corridas muy grandes, generar_en_procesos reparte la generación entre
+# varios procesos por bloques y devuelve el ZPL en el orden original.
+import os
+from array import array
+from collections import deque
+from functools import lru_cache
+from itertools import islice
+
+MAX_CARACTERES_LINEA = 30  # Máximo de caracteres por línea del nombre del menú
+MAX_DISPOSICIONES = 4096   # Menús y nombres distintos que se recuerdan ya divididos y codificados
+TAMANO_BLOQUE_PROCESOS = 2000  # Registros que genera un proceso por cada pedido
+BLOQUES_POR_PROCESO = 2        # Bloques pedidos de antemano por proceso, para que no esperen al envío
+
+# Formato almacenado en la memoria RAM (R:) de la impresora para el modo plantilla
+NOMBRE_FORMATO = "R:VIANDA.ZPL"
+
+# Partes fijas de la etiqueta completa, alrededor de los campos variables
+_COMPLETA_INICIO = """
+^XA
+^PW400
+^LH20,20
+^CI28
+
+^CF0,30
+^FO0,5^FB360,40,1,C^FDLUGAR: Comedor Bella Italia^FS
+^FO0,35^GB360,2,2^FS  ; Línea horizontal como subrayado
+
+^CF0,25
+^FO10,45^FD""".encode('utf-8')
+_COMPLETA_MENU = b"^FS\n^FO10,80^FDMenu: "
+_COMPLETA_FECHAS = "^FS\n^FO10,115^FDELAB: {elaboracion}^FS\n^FO10,150^FDVENC: {vencimiento}^FS\n\n^BY2,3.0,120\n^FO40,175^BEN,120,Y,N^FD"
+_COMPLETA_FIN = b"^FS\n\n^XZ\n"
+
+# Partes fijas de la llamada al formato almacenado (^XF con los campos ^FN)
+_ALMACENADA_INICIO = f"^XA^XF{NOMBRE_FORMATO}^CI28^FN1^FD".encode('utf-8')
+_ALMACENADA_MENU = b"^FS^FN2^FDMenu: "
+_ALMACENADA_CODIGO = b"^FS^FN3^FD"
+_ALMACENADA_FIN = b"^FS^XZ\n"
+
+
+@lru_cache(maxsize=MAX_DISPOSICIONES)
+def dividir_nombre_menu(nombre_menu_original, max_caracteres_linea=MAX_CARACTERES_LINEA):
+    """Divide el nombre del menú en dos líneas buscando un espacio cerca del límite."""
+    if len(nombre_menu_original) <= max_caracteres_linea:
+        # Si el nombre cabe en una línea, lo usamos tal cual
+        return nombre_menu_original, ""
+
+    # Inicializar mitad con un valor por defecto seguro
+    mitad = min(max_caracteres_linea, len(nombre_menu_original)-1)
+
+    # Buscar el último espacio antes del límite
+    while mitad > 0 and nombre_menu_original[mitad] != ' ':
+        mitad -= 1
+
+    # Si no hay espacios cerca, simplemente cortar en el límite
+    if mitad <= 5:  # Si está muy al principio, mejor cortar en el límite
+        mitad = min(max_caracteres_linea, len(nombre_menu_original)-1)
+
+    nombre_menu_linea1 = nombre_menu_original[:mitad].strip()
+    nombre_menu_linea2 = nombre_menu_original[mitad:].strip()
+
+    # Si la segunda línea es muy larga, la truncamos
+    if len(nombre_menu_linea2) > max_caracteres_linea:
+        nombre_menu_linea2 = nombre_menu_linea2[:max_caracteres_linea] + "..."
+    return nombre_menu_linea1, nombre_menu_linea2
+
+
+@lru_cache(maxsize=MAX_DISPOSICIONES)
+def formatear_nombre_empleado(nombre_empleado):
+    """Convierte el nombre a formato "APELLIDO, NOMBRE" en mayúsculas."""
+    # Si el nombre ya tiene coma, usar tal como está, sino convertir
+    if ',' in nombre_empleado:
+        return nombre_empleado.upper()
+
+    # Intentar separar nombre y apellido para formato "APELLIDO, NOMBRE"
+    partes_nombre = nombre_empleado.strip().split()
+    if len(partes_nombre) >= 2:
+        # Asumir que la última palabra es el apellido
+        apellido = partes_nombre[-1]
+        nombres = ' '.join(partes_nombre[:-1])
+        return f"{apellido.upper()}, {nombres.upper()}"
+    return nombre_empleado.upper()
+
+
+@lru_cache(maxsize=MAX_DISPOSICIONES)
+def campo_menu(nombre_menu):
+    """Devuelve la línea del menú que se imprime, ya codificada."""
+    return dividir_nombre_menu(nombre_menu)[0].encode('utf-8')
+
+
+@lru_cache(maxsize=MAX_DISPOSICIONES)
+def campo_nombre(nombre_formato):
+    """Devuelve el nombre "APELLIDO, NOMBRE" ya codificado."""
+    return nombre_formato.encode('utf-8')
+
+
+def limpiar_caches():
+    """Vacía las cachés de nombres y menús ya formateados (para medir la generación desde cero)."""
+    for funcion in (dividir_nombre_menu, formatear_nombre_empleado, campo_menu, campo_nombre):
+        funcion.cache_clear()
+
+
+class Etiqueta:
+    """Campos variables de una etiqueta, ya codificados en UTF-8."""
+
+    __slots__ = ("nombre", "menu", "codigo")
+
+    def __init__(self, nombre, menu, codigo):
+        self.nombre = nombre
+        self.menu = menu
+        self.codigo = codigo
+
+    def __repr__(self):
+        return f"Etiqueta(nombre={self.nombre!r}, menu={self.menu!r}, codigo={self.codigo!r})"
+
+
+class Renderizador:
+    """Arma el ZPL de las etiquetas de una corrida (mismas fechas y mismo modo).
+
+    Con formato_almacenado=True cada etiqueta es solo la llamada al formato
+    guardado (^XF) con sus campos (^FN); el formato se envía como encabezado.
+    """
+
+    __slots__ = ("formato_almacenado", "formato", "_partes")
+
+    def __init__(self, fecha_elaboracion, fecha_vencimiento, formato_almacenado=False):
+        self.formato_almacenado = formato_almacenado
+        self.formato = generar_formato(fecha_elaboracion, fecha_vencimiento).encode('utf-8')
+        if formato_almacenado:
+            self._partes = (_ALMACENADA_INICIO, _ALMACENADA_MENU, _ALMACENADA_CODIGO, _ALMACENADA_FIN)
+        else:
+            fechas = _COMPLETA_FECHAS.format(elaboracion=fecha_elaboracion.strftime('%d/%m/%Y'),
+                                             vencimiento=fecha_vencimiento.strftime('%d/%m/%Y'))
+            self._partes = (_COMPLETA_INICIO, _COMPLETA_MENU, fechas.encode('utf-8'), _COMPLETA_FIN)
+
+    @staticmethod
+    def maquetar(registro):
+        """Devuelve la Etiqueta con los campos variables del registro."""
+        # El código ya viene con 12 dígitos: EAN-13 agrega el dígito de verificación automático
+        return Etiqueta(campo_nombre(registro.nombre_formato), campo_menu(registro.nombre_menu),
+                        registro.codigo.encode('utf-8'))
+
+    def zpl(self, etiqueta):
+        """Devuelve el ZPL (bytes) de una Etiqueta."""
+        inicio, menu, codigo, fin = self._partes
+        return b"".join((inicio, etiqueta.nombre, menu, etiqueta.menu, codigo, etiqueta.codigo, fin))
+
+    def generar(self, registro):
+        """Devuelve el ZPL (bytes) de la etiqueta de un registro."""
+        return self.zpl(self.maquetar(registro))
+
+
+def digito_verificador_ean13(codigo):
+    """Calcula el dígito verificador de los 12 primeros dígitos de un EAN-13."""
+    suma = sum(int(digito) * (3 if posicion % 2 else 1) for posicion, digito in enumerate(codigo[:12]))
+    return str((10 - suma % 10) % 10)
+
+
+def crear_ejecutor(procesos=None):
+    """Crea el grupo de procesos para generar_en_procesos (por defecto uno por núcleo)."""
+    from concurrent.futures import ProcessPoolExecutor
+
+    return ProcessPoolExecutor(max_workers=procesos or os.cpu_count() or 1)
+
+
+def _generar_bloque(renderizador, campos):
+    # Se ejecuta en un proceso hijo; las memorias de menús y nombres quedan en cada proceso.
+    # Se devuelve un solo bloque de bytes con los largos de cada etiqueta: transferir
+    # miles de objetos bytes sueltos entre procesos cuesta más que generarlos.
+    zpls = [renderizador.zpl(Etiqueta(campo_nombre(nombre), campo_menu(menu), codigo.encode('utf-8')))
+            for nombre, menu, codigo in campos]
+    return b"".join(zpls), array("I", map(len, zpls))
+
+
+def generar_en_procesos(registros, renderizador, ejecutor, procesos, tamano_bloque=TAMANO_BLOQUE_PROCESOS):
+    """Genera en el ejecutor de procesos el ZPL de los registros y devuelve (registro, zpl) en orden.
+
+    Los registros se toman de a bloques a medida que se consumen, con como
+    mucho BLOQUES_POR_PROCESO bloques pendientes por proceso, así un Excel
+    leído en modo streaming no se carga entero en memoria.
+    """
+    registros = iter(registros)
+    pendientes = deque()
+
+    def pedir_bloque():
+        bloque = list(islice(registros, tamano_bloque))
+        if bloque:
+            # Al proceso hijo solo se le pasan los campos que usa la etiqueta
+            campos = [(registro.nombre_formato, registro.nombre_menu, registro.codigo) for registro in bloque]
+            pendientes.append((bloque, ejecutor.submit(_generar_bloque, renderizador, campos)))
+
+    try:
+        for _ in range(procesos * BLOQUES_POR_PROCESO):
+            pedir_bloque()
+        while pendientes:
+            bloque, futuro = pendientes.popleft()
+            datos, largos = futuro.result()
+            pedir_bloque()
+            inicio = 0
+            for registro, largo in zip(bloque, largos):
+                yield registro, datos[inicio:inicio + largo]
+                inicio += largo
+    finally:
+        # Si se deja de consumir (cancelación), descartar los bloques que todavía no empezaron
+        for _, futuro in pendientes:
+            futuro.cancel()
+
+
+def agregar_cantidad(zpl, cantidad):
+    """Agrega ^PQ al final del formato para que la impresora repita la etiqueta."""
+    if cantidad == 1:
+        return zpl
+    if isinstance(zpl, bytes):
+        posicion = zpl.rindex(b"^XZ")
+        return b"%s^PQ%d%s" % (zpl[:posicion], cantidad, zpl[posicion:])
+    posicion = zpl.rindex("^XZ")
+    return f"{zpl[:posicion]}^PQ{cantidad}{zpl[posicion:]}"
+
+
+def generar_formato(fecha_elaboracion, fecha_vencimiento):
+    """Genera el ZPL que guarda en la impresora el diseño fijo de la etiqueta (^DF).
+
+    Las fechas son iguales para toda la corrida, así que quedan dentro del
+    formato; cada etiqueta solo envía el empleado, el menú y el código.
+    """
+    return f"""
+^XA
+^DF{NOMBRE_FORMATO}^FS
+^PW400
+^LH20,20
+^CI28
+
+^CF0,30
+^FO0,5^FB360,40,1,C^FDLUGAR: Comedor Bella Italia^FS
+^FO0,35^GB360,2,2^FS
+
+^CF0,25
+^FO10,45^FN1^FS
+^FO10,80^FN2^FS
+^FO10,115^FDELAB: {fecha_elaboracion.strftime('%d/%m/%Y')}^FS
+^FO10,150^FDVENC: {fecha_vencimiento.strftime('%d/%m/%Y')}^FS
+
+^BY2,3.0,120
+^FO40,175^BEN,120,Y,N^FN3^FS
+
+^XZ
+"""
+
+
+def generar_zpl(registro, fecha_elaboracion, fecha_vencimiento, formato_almacenado=False):
+    """Genera el ZPL (texto) de la etiqueta de un registro.
+
+    Para muchas etiquetas conviene crear un Renderizador y usar generar(),
+    que devuelve bytes y no vuelve a codificar las partes fijas.
+    """
+    renderizador = Renderizador(fecha_elaboracion, fecha_vencimiento, formato_almacenado)
+    return renderizador.generar(registro).decode('utf-8')
@@ -0,0 +1,94 @@
+# =============================================================================
+# CONFIGURACIÓN COMÚN DE LAS PRUEBAS
+# =============================================================================
+# Las pruebas no necesitan impresoras: envían a "mem://" o a transportes de
+# prueba registrados con transportes.registrar_transporte. Los diarios, la
+# caché y los reportes se guardan en una carpeta temporal en lugar de ~/.etiquetador.
+import os
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import cache_registros  # noqa: E402
+import diario  # noqa: E402
+import etiquetas  # noqa: E402
+import medicion  # noqa: E402
+import transportes  # noqa: E402
+
+# Código de 12 dígitos de cada etiqueta, tanto completa (^BEN...^FD) como con formato almacenado (^FN3^FD)
+PATRON_CODIGO = re.compile(rb"\^FD(\d{12})\^FS")
+
+
+@pytest.fixture(autouse=True)
+def carpetas_temporales(tmp_path, monkeypatch):
+    """Guarda diarios, caché y reportes en tmp_path y empieza cada prueba sin sumideros en memoria."""
+    monkeypatch.setattr(diario, "CARPETA_DIARIOS", str(tmp_path / "trabajos"))
+    monkeypatch.setattr(cache_registros, "CARPETA_CACHE", str(tmp_path / "cache"))
+    monkeypatch.setattr(medicion, "CARPETA_REPORTES", str(tmp_path / "reportes"))
+    transportes.SUMIDEROS_MEMORIA.clear()
+    yield
+    transportes.SUMIDEROS_MEMORIA.clear()
+
+
+def escribir_excel(ruta, filas, encabezados=etiquetas.COLUMNAS_EXCEL):
+    """Escribe un Excel de pedidos: título, encabezados y una fila por pedido."""
+    from openpyxl import Workbook
+
+    libro = Workbook()
+    hoja = libro.active
+    hoja.append(["Pedidos del día"])
+    hoja.append(list(encabezados))
+    for fila in filas:
+        hoja.append(list(fila))
+    libro.save(ruta)
+    return str(ruta)
+
+
+def filas_pedidos(cantidad):
+    """Pedidos válidos con códigos distintos, menús y lugares repetidos."""
+    return [(f"{7790000000000 + indice * 10:013d}"[:12], f"Empleado{indice} Apellido{indice % 7}",
+             f"Menú del día número {indice % 5} con guarnición", f"Lugar {indice % 3}")
+            for indice in range(cantidad)]
+
+
+@pytest.fixture
+def excel_pedidos(tmp_path):
+    """Excel con 120 pedidos válidos."""
+    return escribir_excel(tmp_path / "pedidos.xlsx", filas_pedidos(120))
+
+
+def codigos_enviados(datos):
+    """Códigos de las etiquetas contenidas en los bytes enviados, en orden."""
+    return [codigo.decode('ascii') for codigo in PATRON_CODIGO.findall(datos)]
+
+
+class TransporteGuion(transportes.Transporte):
+    """Transporte de prueba: cada envío toma el siguiente paso del guion.
+
+    Un paso None recibe los datos; una excepción se lanza sin recibirlos.
+    Sin pasos en el guion, todos los envíos se reciben.
+    """
+
+    guion = []
+    recibidos = []
+    aperturas = 0
+
+    def abrir(self):
+        type(self).aperturas += 1
+
+    def enviar(self, datos):
+        paso = self.guion.pop(0) if self.guion else None
+        if paso is not None:
+            raise paso
+        self.recibidos.append(bytes(datos))
+
+
+@pytest.fixture
+def impresora(monkeypatch):
+    """Registra "prueba://" con una subclase propia de TransporteGuion y la devuelve."""
+    clase = type("ImpresoraPrueba", (TransporteGuion,), {"guion": [], "recibidos": [], "aperturas": 0})
+    monkeypatch.setitem(transportes.TRANSPORTES, "prueba://", clase)
+    return clase
@@ -0,0 +1,70 @@
+import json
+from datetime import date, timedelta
+
+import pytest
+
+import cli
+import transportes
+from test_trabajos import TransporteRoto
+
+VENCIMIENTO = (date.today() + timedelta(days=7)).isoformat()
+
+
+def ejecutar_cli(capsys, *argumentos):
+    """Ejecuta la línea de comandos y devuelve (código de salida, resultado JSON)."""
+    codigo = cli.main(list(argumentos))
+    lineas = capsys.readouterr().out.splitlines()
+    assert len(lineas) == 1  # stdout lleva solo la línea JSON
+    return codigo, json.loads(lineas[0])
+
+
+def test_impresion_completa(capsys, excel_pedidos):
+    codigo, resultado = ejecutar_cli(capsys, "--excel", excel_pedidos, "--venc", VENCIMIENTO,
+                                     "--printer", "mem://zebra", "--sin-cache")
+    assert codigo == cli.SALIDA_OK
+    assert resultado["estado"] == "ok"
+    assert resultado["etiquetas_enviadas"] == 120
+    assert "diario" not in resultado
+
+
+def test_impresora_sin_conexion(capsys, excel_pedidos):
+    pytest.importorskip("serial")
+    codigo, resultado = ejecutar_cli(capsys, "--excel", excel_pedidos, "--venc", VENCIMIENTO,
+                                     "--printer", "serial:///dev/no-existe", "--reintentos", "1")
+    assert codigo == cli.SALIDA_ERROR_IMPRESION
+    assert resultado["estado"] == "error"
+    assert resultado["etiquetas_enviadas"] == 0
+    assert resultado["errores"]
+    assert "diario" in resultado
+
+
+def test_reanudar_el_ultimo_diario(capsys, excel_pedidos, impresora):
+    impresora.guion = [OSError("sin conexión")]
+    codigo, resultado = ejecutar_cli(capsys, "--excel", excel_pedidos, "--venc", VENCIMIENTO,
+                                     "--printer", "prueba://zebra", "--reintentos", "1")
+    assert codigo == cli.SALIDA_PARCIAL
+    assert resultado["etiquetas_enviadas"] == 70
+    assert "diario" in resultado
+
+    # Se reanuda en otra impresora: solo falta el primer lote
+    codigo, resultado = ejecutar_cli(capsys, "--reanudar", "--printer", "mem://zebra")
+    assert codigo == cli.SALIDA_OK
+    assert resultado["etiquetas_enviadas"] == 50
+    assert "diario" not in resultado
+
+
+def test_error_inesperado_se_informa_en_json(capsys, excel_pedidos, monkeypatch):
+    monkeypatch.setitem(transportes.TRANSPORTES, "roto://", TransporteRoto)
+    codigo, resultado = ejecutar_cli(capsys, "--excel", excel_pedidos, "--venc", VENCIMIENTO,
+                                     "--printer", "roto://zebra")
+    assert codigo == cli.SALIDA_ERROR_IMPRESION
+    assert resultado["estado"] == "error"
+    assert "controlador de la impresora dañado" in resultado["error"]
+    assert "diario" in resultado
+
+
+def test_fecha_anterior_a_hoy(capsys, excel_pedidos):
+    codigo, resultado = ejecutar_cli(capsys, "--excel", excel_pedidos, "--venc", "2000-01-01",
+                                     "--printer", "mem://zebra")
+    assert codigo == cli.SALIDA_ERROR_ENTRADA
+    assert resultado["estado"] == "error"
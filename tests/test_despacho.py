@@ -0,0 +1,230 @@
+import asyncio
+import socketserver
+import threading
+import time
+from datetime import date, timedelta
+
+import pytest
+
+import despacho
+import trabajos
+import transportes
+from test_transportes import ESTADO_OK, ESTADO_SIN_PAPEL, etiquetas_prueba, puerto_cerrado
+
+SIN_ESPERA = transportes.PoliticaReintentos(intentos=3, espera_inicial=0)
+
+
+class ManejadorImpresora(socketserver.BaseRequestHandler):
+    def handle(self):
+        impresora = self.server
+        with impresora.bloqueo:
+            impresora.conexiones += 1
+        while datos := self.request.recv(65536):
+            consulta = datos.endswith(transportes.CONSULTA_ESTADO)
+            if consulta:
+                datos = datos[:-len(transportes.CONSULTA_ESTADO)]
+            with impresora.bloqueo:
+                impresora.datos += datos
+                respuesta = impresora.estados.pop(0) if impresora.estados else ESTADO_OK
+            if consulta and not impresora.muda:
+                self.request.sendall(respuesta)
+
+
+class ImpresoraRed(socketserver.ThreadingTCPServer):
+    """Impresora Zebra de red simulada: guarda lo que recibe y contesta ~HS."""
+
+    daemon_threads = True
+
+    def __init__(self, estados=(), muda=False):
+        super().__init__(("127.0.0.1", 0), ManejadorImpresora)
+        self.datos = bytearray()
+        self.estados = list(estados)
+        self.muda = muda  # No contesta ~HS
+        self.conexiones = 0
+        self.bloqueo = threading.Lock()
+        self.destino = f"tcp://127.0.0.1:{self.server_address[1]}"
+        threading.Thread(target=self.serve_forever, args=(0.05,), daemon=True).start()
+
+    def recibido(self, largo):
+        """Devuelve lo recibido después de esperar (como mucho 5 s) a que lleguen `largo` bytes."""
+        limite = time.monotonic() + 5
+        while len(self.datos) < largo and time.monotonic() < limite:
+            time.sleep(0.01)
+        with self.bloqueo:
+            return bytes(self.datos)
+
+
+@pytest.fixture
+def impresoras_red():
+    creadas = []
+
+    def crear(**opciones):
+        impresora = ImpresoraRed(**opciones)
+        creadas.append(impresora)
+        return impresora
+
+    yield crear
+    for impresora in creadas:
+        impresora.shutdown()
+        impresora.server_close()
+
+
+def test_despacho_envia_lo_mismo_que_los_hilos(impresoras_red):
+    red = [impresoras_red() for _ in range(3)]
+    etiquetas = [etiquetas_prueba(25 + indice) for indice in range(3)]
+    enviados = []
+    envios = [despacho.Envio(impresora.destino, lista,
+                             al_enviar=lambda lote, total, destino=impresora.destino: enviados.append((destino, total)))
+              for impresora, lista in zip(red, etiquetas)]
+
+    resultado = despacho.despachar(envios, 10, 65536, encabezado="^XA^DFformato^XZ", reintentos=SIN_ESPERA)
+
+    assert resultado == [25, 26, 27]
+    for indice, (impresora, lista) in enumerate(zip(red, etiquetas)):
+        transportes.enviar_etiquetas(lista, f"mem://hilo{indice}", 10, 65536, encabezado="^XA^DFformato^XZ")
+        esperado = b"".join(transportes.obtener_sumidero(f"hilo{indice}").trabajos)
+        assert impresora.recibido(len(esperado)) == esperado
+    assert [impresora.conexiones for impresora in red] == [1, 1, 1]  # Una conexión para todos los lotes
+    assert max(total for destino, total in enviados if destino == red[2].destino) == 27
+
+
+def test_impresora_sin_conexion_no_frena_a_las_demas(impresoras_red):
+    activa = impresoras_red()
+    fallidos = []
+    envios = [despacho.Envio(activa.destino, etiquetas_prueba(5)),
+              despacho.Envio(f"tcp://127.0.0.1:{puerto_cerrado()}", etiquetas_prueba(5),
+                             al_fallar=lambda lote, error: fallidos.append((len(lote), str(error))))]
+    assert despacho.despachar(envios, 2, 65536, timeout=2) == [5, 0]
+    assert [cantidad for cantidad, _ in fallidos] == [2, 2, 1]
+    assert all("impresora de red" in error for _, error in fallidos)
+
+
+def test_espera_a_que_la_impresora_este_lista(impresoras_red, monkeypatch):
+    monkeypatch.setattr(transportes, "ESPERA_ESTADO", 0)
+    impresora = impresoras_red(estados=[ESTADO_SIN_PAPEL, ESTADO_SIN_PAPEL])
+    esperas = []
+    envio = despacho.Envio(impresora.destino, etiquetas_prueba(4),
+                           al_esperar=lambda estado: esperas.append(estado.motivo))
+    assert despacho.despachar([envio], 2, 65536, controlar_estado=True) == [4]
+    assert esperas == ["sin papel", "sin papel"]
+    esperado = b"".join(zpl for _, zpl, _ in etiquetas_prueba(4))
+    assert impresora.recibido(len(esperado)) == esperado
+
+
+def test_impresora_que_no_contesta_el_estado_se_consulta_una_vez(impresoras_red, monkeypatch):
+    monkeypatch.setattr(transportes, "TIMEOUT_ESTADO", 0.2)
+    impresora = impresoras_red(muda=True)
+    envio = despacho.Envio(impresora.destino, etiquetas_prueba(6))
+    inicio = time.perf_counter()
+    assert despacho.despachar([envio], 2, 65536, controlar_estado=True) == [6]
+    # Sin recordar el fallo se esperaría TIMEOUT_ESTADO antes de cada uno de los tres lotes
+    assert time.perf_counter() - inicio < 0.5
+
+
+def test_armado_de_lotes_no_frena_el_envio(impresoras_red):
+    red = [impresoras_red() for _ in range(3)]
+
+    def lentas(cantidad):
+        for etiqueta in etiquetas_prueba(cantidad):
+            time.sleep(0.05)  # Generación que bloquea (por ejemplo, la lectura en streaming)
+            yield etiqueta
+
+    inicio = time.perf_counter()
+    assert despacho.despachar([despacho.Envio(impresora.destino, lentas(6)) for impresora in red],
+                              3, 65536) == [6, 6, 6]
+    # Si el armado bloqueara el bucle las tres impresoras se atenderían una después de otra (~0.9 s)
+    assert time.perf_counter() - inicio < 0.7
+
+
+class EscritorCortado:
+    """Escritor de asyncio cuya conexión se cae después de mandar `enviados` bytes."""
+
+    def __init__(self, enviados):
+        self.enviados = enviados
+        self.sin_enviar = 0
+
+    @property
+    def transport(self):
+        return self
+
+    def get_write_buffer_size(self):
+        return self.sin_enviar
+
+    def is_closing(self):
+        return True
+
+    def write(self, datos):
+        self.sin_enviar = len(datos) - self.enviados
+
+    async def drain(self):
+        raise ConnectionResetError("conexión reiniciada")
+
+    def close(self):
+        pass
+
+    async def wait_closed(self):
+        pass
+
+
+def enviar_por_conexion_cortada(destino, enviados, datos):
+    """Envía los datos por una ConexionAsincrona cuya conexión abierta se cae al escribir."""
+    async def enviar():
+        conexion = despacho.ConexionAsincrona(destino, timeout=2)
+        conexion.escritor = EscritorCortado(enviados)
+        try:
+            await despacho.enviar_con_reintentos(conexion, datos, SIN_ESPERA)
+        finally:
+            await conexion.cerrar()
+
+    asyncio.run(enviar())
+
+
+def test_reconecta_si_la_conexion_se_cayo_antes_de_enviar(impresoras_red):
+    impresora = impresoras_red()
+    datos = b"".join(zpl for _, zpl, _ in etiquetas_prueba(3))
+    enviar_por_conexion_cortada(impresora.destino, 0, datos)
+    assert impresora.recibido(len(datos)) == datos
+    assert impresora.conexiones == 1
+
+
+def test_envio_incompleto_no_se_reintenta(impresoras_red):
+    impresora = impresoras_red()
+    datos = b"".join(zpl for _, zpl, _ in etiquetas_prueba(3))
+    with pytest.raises(transportes.EnvioIncompleto) as error:
+        enviar_por_conexion_cortada(impresora.destino, 30, datos)
+    assert error.value.enviados == 30
+    assert "conexión reiniciada" in str(error.value)
+    assert impresora.conexiones == 0
+
+
+def test_envio_cortado_deja_el_lote_entero_como_fallido(monkeypatch):
+    async def conectar(conexion):
+        if conexion.escritor is None:
+            conexion.escritor = EscritorCortado(30)
+
+    monkeypatch.setattr(despacho.ConexionAsincrona, "conectar", conectar)
+    enviados, fallidos = [], []
+    envio = despacho.Envio("tcp://127.0.0.1:9100", etiquetas_prueba(3),
+                           al_enviar=lambda lote, total: enviados.append(total),
+                           al_fallar=lambda lote, error: fallidos.append(len(lote)))
+    assert despacho.despachar([envio], 10, 65536, reintentos=SIN_ESPERA) == [0]
+    assert enviados == []
+    assert fallidos == [3]
+
+
+def test_trabajo_asincrono_igual_que_con_hilos(excel_pedidos, impresoras_red):
+    vencimiento = date.today() + timedelta(days=7)
+
+    def ejecutar(destinos, asincrono=False):
+        trabajo = trabajos.TrabajoImpresion(excel_pedidos, destinos, vencimiento, 10, 65536, usar_cache=False,
+                                            asincrono=asincrono, formato_almacenado=True)
+        trabajo.ejecutar()
+        assert trabajo.fallidas == []
+
+    ejecutar(["mem://a", "mem://b"])
+    esperado = [b"".join(transportes.obtener_sumidero(nombre).trabajos) for nombre in "ab"]
+    assert [datos.count(b"^XA^XF") for datos in esperado] == [60, 60]
+    for asincrono in (False, True):
+        red = [impresoras_red(), impresoras_red()]
+        ejecutar([impresora.destino for impresora in red], asincrono)
+        assert [impresora.recibido(len(datos)) for impresora, datos in zip(red, esperado)] == esperado
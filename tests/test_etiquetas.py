@@ -0,0 +1,97 @@
+import pandas as pd
+import pytest
+
+import etiquetas
+from conftest import escribir_excel, filas_pedidos
+
+
+def leer_ambos(ruta):
+    return etiquetas.leer_registros(ruta), list(etiquetas.iterar_registros(ruta))
+
+
+def test_streaming_lee_lo_mismo_que_pandas(tmp_path):
+    filas = filas_pedidos(40) + [
+        # Códigos numéricos (celdas con número), cortos, con verificador e inválidos
+        (779123456789, "Ana Pérez", "Pollo", "Planta"),
+        (12345, "  Juan   Carlos  Gómez ", "  Ñoquis  ", None),
+        ("7791234567898", "Gómez, Ana", "Tarta", "Oficina"),
+        ("7791234567890", "Luis Díaz", "Tarta", "Oficina"),
+        ("12A45", "Sin Menú", None, "Planta"),
+        ("12345678901234", None, "Milanesa", ""),
+        (None, "Sin código", "Pollo", "Planta"),
+        ("   ", "Código vacío", "Pollo", "Planta"),
+    ]
+    ruta = escribir_excel(tmp_path / "mixto.xlsx", filas)
+
+    con_pandas, en_streaming = leer_ambos(ruta)
+
+    assert en_streaming == con_pandas
+    assert len(con_pandas) == len(filas) - 2  # Las filas sin código se omiten
+    assert etiquetas.estimar_filas(ruta) == len(filas)
+
+
+def test_normalizacion_de_campos(tmp_path):
+    ruta = escribir_excel(tmp_path / "campos.xlsx", [
+        (12345, "  Juan   Carlos  Gómez ", "  Ñoquis  ", None),
+        ("7791234567898", "Gómez, Ana", None, "Oficina"),
+    ])
+    primero, segundo = etiquetas.leer_registros(ruta)
+    assert primero.codigo == "000000012345"
+    assert primero.ean13 == "0000000123457"
+    assert primero.nombre_formato == "GÓMEZ, JUAN CARLOS"
+    assert primero.nombre_menu == "Ñoquis"
+    assert primero.lugar == ""
+    assert segundo.codigo == "779123456789"
+    assert segundo.nombre_formato == "GÓMEZ, ANA"
+    assert segundo.nombre_menu == etiquetas.SIN_ESPECIFICAR
+
+
+def test_codigos_invalidos(tmp_path):
+    ruta = escribir_excel(tmp_path / "invalidos.xlsx", [
+        ("7791234567890", "Luis Díaz", "Tarta", ""),
+        ("12A45", "Ana Pérez", "Pollo", ""),
+        ("12345678901234", "Juan Gómez", "Milanesa", ""),
+    ])
+    for registros in leer_ambos(ruta):
+        assert [registro.ean13 for registro in registros] == ["", "", ""]
+        invalidos = [etiquetas.codigo_invalido(registro) for registro in registros]
+        assert [invalido.fila for invalido in invalidos] == [3, 4, 5]
+        assert invalidos[0].motivo.startswith(etiquetas.MOTIVO_VERIFICADOR)
+        assert invalidos[0].motivo.endswith("(debería ser 8)")
+        assert invalidos[1].motivo == etiquetas.MOTIVO_NO_NUMERICO
+        assert invalidos[2].motivo == etiquetas.MOTIVO_LARGO
+
+
+def test_validar_codigos_coincide_con_validar_codigo():
+    codigos = ["1", "12345", "779123456789", "7791234567898", "7791234567893", "12A45", "٣٤٥",
+               "12345678901234", "0000000000000", "-12", "1.5"]
+    bases, ean13 = etiquetas.validar_codigos(pd.Series(codigos, dtype=object))
+    for codigo, base, completo in zip(codigos, bases, ean13):
+        esperado_base, esperado_ean13, _ = etiquetas.validar_codigo(codigo)
+        assert (base, completo) == (esperado_base, esperado_ean13), codigo
+
+
+def test_columna_lugar_opcional(tmp_path):
+    ruta = escribir_excel(tmp_path / "sin_lugar.xlsx", [("12345", "Ana Pérez", "Pollo")],
+                          encabezados=etiquetas.COLUMNAS_EXCEL[:3])
+    con_pandas, en_streaming = leer_ambos(ruta)
+    assert en_streaming == con_pandas
+    assert con_pandas[0].lugar == ""
+
+
+@pytest.mark.parametrize("filas, mensaje", [
+    ([], "vacío"),
+    ([(None, "Ana Pérez", "Pollo", "Planta")], "no contiene códigos"),
+])
+def test_excel_sin_pedidos(tmp_path, filas, mensaje):
+    ruta = escribir_excel(tmp_path / "vacio.xlsx", filas)
+    with pytest.raises(ValueError, match=mensaje):
+        etiquetas.leer_registros(ruta)
+    with pytest.raises(ValueError, match=mensaje):
+        list(etiquetas.iterar_registros(ruta))
+
+
+def test_agrupar_identicas_usa_pq():
+    agrupadas = etiquetas.agrupar_identicas([("Ana", b"^XAa^XZ", 1), ("Juan", b"^XAb^XZ", 1),
+                                             ("Ana", b"^XAa^XZ", 1)])
+    assert agrupadas == [("Ana", b"^XAa^PQ2^XZ", 2), ("Juan", b"^XAb^XZ", 1)]
@@ -0,0 +1,33 @@
+import threading
+
+import impresoras
+
+
+class FuenteLenta(impresoras.FuenteFija):
+    """Fuente fija que no termina de enumerar hasta que se libera."""
+
+    def __init__(self, impresoras):
+        super().__init__(impresoras)
+        self.liberar = threading.Event()
+        self.liberar.set()
+
+    def listar(self):
+        self.liberar.wait(5)
+        return super().listar()
+
+
+def test_disponible_no_enumera_en_el_hilo_que_pregunta():
+    fuente = FuenteLenta(["ZDesigner GK420d"])
+    registro = impresoras.RegistroImpresoras(fuente)
+    registro.refrescar()
+    assert registro.disponible("ZDesigner GK420d")
+
+    # Una impresora recién conectada no está en la caché: se responde al instante y se enumera aparte
+    fuente.liberar.clear()
+    fuente.impresoras.append("ZDesigner ZD420")
+    assert not registro.disponible("ZDesigner ZD420")
+    fuente.liberar.set()
+    for hilo in threading.enumerate():
+        if hilo.name == "RegistroImpresoras":
+            hilo.join(5)
+    assert registro.disponible("ZDesigner ZD420")
@@ -0,0 +1,74 @@
+from datetime import date
+
+import pytest
+
+import etiquetas
+import renderizado
+from conftest import codigos_enviados, escribir_excel, filas_pedidos
+
+ELABORACION = date(2026, 10, 18)
+VENCIMIENTO = date(2026, 10, 25)
+
+
+@pytest.fixture(scope="module")
+def registros(tmp_path_factory):
+    ruta = escribir_excel(tmp_path_factory.mktemp("excel") / "pedidos.xlsx", filas_pedidos(300))
+    return etiquetas.leer_registros(ruta)
+
+
+@pytest.mark.parametrize("formato_almacenado", [False, True])
+def test_generar_coincide_con_generar_zpl(registros, formato_almacenado):
+    renderizador = renderizado.Renderizador(ELABORACION, VENCIMIENTO, formato_almacenado)
+    for registro in registros[:20]:
+        zpl = renderizador.generar(registro)
+        assert zpl == renderizado.generar_zpl(registro, ELABORACION, VENCIMIENTO,
+                                              formato_almacenado).encode('utf-8')
+        assert zpl.lstrip().startswith(b"^XA")
+        assert zpl.rstrip().endswith(b"^XZ")
+
+
+def test_etiqueta_completa_lleva_campos_y_fechas(registros):
+    registro = registros[0]
+    zpl = renderizado.generar_zpl(registro, ELABORACION, VENCIMIENTO)
+    assert f"^FD{registro.nombre_formato}^FS" in zpl
+    assert f"^FDMenu: {renderizado.dividir_nombre_menu(registro.nombre_menu)[0]}^FS" in zpl
+    assert "^FDELAB: 18/10/2026^FS" in zpl
+    assert "^FDVENC: 25/10/2026^FS" in zpl
+    assert codigos_enviados(zpl.encode('utf-8')) == [registro.codigo]
+
+
+def test_formato_almacenado_usa_xf_y_campos(registros):
+    renderizador = renderizado.Renderizador(ELABORACION, VENCIMIENTO, formato_almacenado=True)
+    assert renderizador.formato.decode('utf-8') == renderizado.generar_formato(ELABORACION, VENCIMIENTO)
+    assert f"^DF{renderizado.NOMBRE_FORMATO}".encode() in renderizador.formato
+    zpl = renderizador.generar(registros[0])
+    assert zpl.startswith(f"^XA^XF{renderizado.NOMBRE_FORMATO}".encode())
+    assert b"ELAB" not in zpl
+    assert codigos_enviados(zpl) == [registros[0].codigo]
+
+
+@pytest.mark.parametrize("formato_almacenado", [False, True])
+def test_generar_en_procesos_da_los_mismos_bytes_en_orden(registros, formato_almacenado):
+    renderizador = renderizado.Renderizador(ELABORACION, VENCIMIENTO, formato_almacenado)
+    esperado = [renderizador.generar(registro) for registro in registros]
+    with renderizado.crear_ejecutor(2) as ejecutor:
+        # Bloques chicos para que haya varios pendientes y se compruebe el orden
+        generados = list(renderizado.generar_en_procesos(iter(registros), renderizador, ejecutor, 2,
+                                                         tamano_bloque=7))
+    assert [registro for registro, _ in generados] == registros
+    assert [zpl for _, zpl in generados] == esperado
+
+
+def test_dividir_nombre_menu():
+    assert renderizado.dividir_nombre_menu("Pollo") == ("Pollo", "")
+    primera, segunda = renderizado.dividir_nombre_menu("Milanesa napolitana con papas fritas")
+    assert (primera, segunda) == ("Milanesa napolitana con papas", "fritas")
+
+
+@pytest.mark.parametrize("zpl", ["^XA^FDx^FS^XZ\n", b"^XA^FDx^FS^XZ\n"])
+def test_agregar_cantidad(zpl):
+    con_cantidad = renderizado.agregar_cantidad(zpl, 3)
+    assert type(con_cantidad) is type(zpl)
+    esperado = "^XA^FDx^FS^PQ3^XZ\n"
+    assert con_cantidad == (esperado.encode() if isinstance(zpl, bytes) else esperado)
+    assert renderizado.agregar_cantidad(zpl, 1) is zpl
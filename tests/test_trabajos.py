@@ -0,0 +1,226 @@
+import os
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import cache_registros
+import diario
+import etiquetas
+import medicion
+import renderizado
+import trabajos
+import transportes
+from conftest import codigos_enviados, escribir_excel, filas_pedidos
+
+VENCIMIENTO = date.today() + timedelta(days=7)
+
+
+def crear_trabajo(excel, destinos, max_etiquetas=10, **opciones):
+    return trabajos.TrabajoImpresion(excel, destinos, VENCIMIENTO, max_etiquetas, 65536, usar_cache=False,
+                                     **opciones)
+
+
+def ejecutar(trabajo):
+    """Ejecuta el trabajo y devuelve sus eventos."""
+    trabajo.ejecutar()
+    eventos = []
+    while not trabajo.eventos.empty():
+        eventos.append(trabajo.eventos.get())
+    return eventos
+
+
+def evento_fin(eventos):
+    return next(evento for evento in eventos if evento[0] == "fin")
+
+
+def recibido(nombre):
+    return b"".join(transportes.obtener_sumidero(nombre).trabajos)
+
+
+def todos_los_codigos(excel):
+    return [registro.codigo for registro in etiquetas.leer_registros(excel)]
+
+
+def lotes_enviados(excel, nombre, **opciones):
+    """Ejecuta el trabajo hacia "mem://nombre" y devuelve los lotes recibidos."""
+    ejecutar(crear_trabajo(excel, [f"mem://{nombre}"], **opciones))
+    return transportes.obtener_sumidero(nombre).trabajos
+
+
+def test_streaming_envia_los_mismos_lotes(excel_pedidos):
+    normal = lotes_enviados(excel_pedidos, "normal")
+    assert lotes_enviados(excel_pedidos, "streaming", streaming=True) == normal
+    assert len(normal) == 12
+
+    renderizador = renderizado.Renderizador(datetime.now(), VENCIMIENTO)
+    esperado = [renderizador.generar(registro) for registro in etiquetas.leer_registros(excel_pedidos)]
+    assert b"".join(normal) == b"".join(esperado)
+
+
+def test_streaming_cuenta_las_filas_leidas(tmp_path):
+    from openpyxl import Workbook
+
+    # Un libro escrito en modo write_only no guarda las dimensiones de la hoja
+    libro = Workbook(write_only=True)
+    hoja = libro.create_sheet()
+    hoja.append(["Pedidos del día"])
+    hoja.append(list(etiquetas.COLUMNAS_EXCEL))
+    for fila in filas_pedidos(25):
+        hoja.append(list(fila))
+    ruta = str(tmp_path / "sin_dimensiones.xlsx")
+    libro.save(ruta)
+    assert etiquetas.estimar_filas(ruta) == 0
+
+    trabajo = crear_trabajo(ruta, ["mem://zebra"], streaming=True, medicion=medicion.Medicion())
+    progreso = [evento[1:] for evento in ejecutar(trabajo) if evento[0] == "progreso"]
+    # Cada lote de 10 se envía después de leer la etiqueta siguiente
+    assert progreso == [(10, 11), (20, 21), (25, 25)]
+    assert trabajo.medicion.datos["filas"] == 25
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_formato_almacenado_antepone_el_formato_a_cada_lote(excel_pedidos, streaming):
+    lotes = lotes_enviados(excel_pedidos, "zebra", formato_almacenado=True, streaming=streaming)
+    assert len(lotes) == 12
+
+    renderizador = renderizado.Renderizador(datetime.now(), VENCIMIENTO, formato_almacenado=True)
+    esperado = [renderizador.generar(registro) for registro in etiquetas.leer_registros(excel_pedidos)]
+    assert all(lote.startswith(renderizador.formato) for lote in lotes)
+    assert b"".join(lote[len(renderizador.formato):] for lote in lotes) == b"".join(esperado)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+@pytest.mark.parametrize("formato_almacenado", [False, True])
+def test_procesos_envian_los_mismos_lotes(excel_pedidos, streaming, formato_almacenado):
+    normal = lotes_enviados(excel_pedidos, "normal", formato_almacenado=formato_almacenado)
+    assert lotes_enviados(excel_pedidos, "procesos", formato_almacenado=formato_almacenado,
+                          streaming=streaming, procesos=2) == normal
+
+
+def test_varias_impresoras_reciben_cada_etiqueta_una_vez(excel_pedidos):
+    eventos = ejecutar(crear_trabajo(excel_pedidos, ["mem://a", "mem://b", "mem://c"]))
+    _, generadas, enviadas, cancelado, _ = evento_fin(eventos)
+    assert generadas == enviadas == 120 and not cancelado
+    partes = [codigos_enviados(recibido(nombre)) for nombre in "abc"]
+    assert [len(parte) for parte in partes] == [40, 40, 40]
+    assert sorted(sum(partes, [])) == sorted(todos_los_codigos(excel_pedidos))
+
+
+def test_agrupar_identicas_envia_pq(tmp_path):
+    filas = [("12345", "Ana Pérez", "Pollo", "")] * 3 + [("54321", "Juan Gómez", "Tarta", "")]
+    excel = escribir_excel(tmp_path / "repetidos.xlsx", filas)
+    eventos = ejecutar(crear_trabajo(excel, ["mem://zebra"], agrupar_identicas=True))
+    _, _, enviadas, _, grupos = evento_fin(eventos)
+    assert enviadas == 4
+    assert grupos == [("Ana Pérez", 3)]
+    assert recibido("zebra").count(b"^PQ3^XZ") == 1
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_codigos_invalidos_no_se_envian(tmp_path, streaming):
+    filas = filas_pedidos(5) + [("12A45", "Ana Pérez", "Pollo", ""), ("7791234567890", "Luis Díaz", "Tarta", "")]
+    excel = escribir_excel(tmp_path / "invalidos.xlsx", filas)
+    trabajo = crear_trabajo(excel, ["mem://zebra"], streaming=streaming)
+    eventos = ejecutar(trabajo)
+    assert evento_fin(eventos)[2] == 5
+    assert [invalido.fila for invalido in trabajo.codigos_invalidos] == [8, 9]
+    assert len(codigos_enviados(recibido("zebra"))) == 5
+
+
+def test_filas_elegidas(excel_pedidos):
+    ejecutar(crear_trabajo(excel_pedidos, ["mem://zebra"], filas=[0, 5, 7]))
+    codigos = todos_los_codigos(excel_pedidos)
+    assert codigos_enviados(recibido("zebra")) == [codigos[0], codigos[5], codigos[7]]
+
+
+def test_corrida_completa_elimina_el_diario(excel_pedidos):
+    trabajo = crear_trabajo(excel_pedidos, ["mem://zebra"])
+    ejecutar(trabajo)
+    assert not os.path.exists(trabajo.diario.ruta)
+    assert diario.pendientes() == []
+
+
+@pytest.mark.parametrize("usar_cache", [False, True])
+def test_el_excel_se_hashea_una_sola_vez(excel_pedidos, monkeypatch, usar_cache):
+    calculados = []
+    hash_contenido = cache_registros.hash_contenido
+    monkeypatch.setattr(cache_registros, "hash_contenido",
+                        lambda ruta: calculados.append(ruta) or hash_contenido(ruta))
+    trabajo = trabajos.TrabajoImpresion(excel_pedidos, ["mem://zebra"], VENCIMIENTO, 10, 65536,
+                                        usar_cache=usar_cache)
+    ejecutar(trabajo)
+    assert len(calculados) == 1
+    assert trabajo.diario.datos["hash"] == hash_contenido(excel_pedidos)
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_reanudar_envia_solo_lo_que_falta(excel_pedidos, impresora, streaming):
+    # El segundo y el cuarto lote fallan; el diario queda con los demás
+    impresora.guion = [None, OSError("sin conexión"), None, OSError("sin conexión")]
+    trabajo = crear_trabajo(excel_pedidos, ["prueba://zebra"], streaming=streaming)
+    _, generadas, enviadas, _, _ = evento_fin(ejecutar(trabajo))
+    assert (generadas, enviadas) == (120, 100)
+    assert diario.pendientes() == [trabajo.diario.ruta]
+    datos, ya_enviadas = diario.leer(trabajo.diario.ruta)
+    assert datos["excel"] == os.path.abspath(excel_pedidos)
+    assert ya_enviadas == set(range(120)) - set(range(10, 20)) - set(range(30, 40))
+
+    reanudado = trabajos.TrabajoImpresion.desde_diario(trabajo.diario.ruta, destinos=["mem://reanudado"])
+    assert reanudado.streaming == streaming
+    _, _, enviadas, _, _ = evento_fin(ejecutar(reanudado))
+
+    codigos = todos_los_codigos(excel_pedidos)
+    assert enviadas == 20
+    assert codigos_enviados(recibido("reanudado")) == codigos[10:20] + codigos[30:40]
+    assert sorted(codigos_enviados(b"".join(impresora.recibidos)) + codigos_enviados(recibido("reanudado"))) \
+        == sorted(codigos)
+    assert diario.pendientes() == []
+
+
+class TransporteRoto(transportes.Transporte):
+    """Transporte que falla al crearse, fuera del manejo de lotes fallidos."""
+
+    def __init__(self, destino, timeout=None):
+        raise RuntimeError("controlador de la impresora dañado")
+
+
+@pytest.mark.parametrize("streaming", [False, True])
+def test_error_inesperado_conserva_el_diario(excel_pedidos, monkeypatch, streaming):
+    monkeypatch.setitem(transportes.TRANSPORTES, "roto://", TransporteRoto)
+    trabajo = crear_trabajo(excel_pedidos, ["roto://zebra"], streaming=streaming)
+    with pytest.raises(RuntimeError):
+        trabajo.ejecutar()
+    assert diario.pendientes() == [trabajo.diario.ruta]
+
+    reanudado = trabajos.TrabajoImpresion.desde_diario(trabajo.diario.ruta, destinos=["mem://zebra"])
+    assert evento_fin(ejecutar(reanudado))[2] == 120
+    assert diario.pendientes() == []
+
+
+def test_no_se_reanuda_si_el_excel_cambio(tmp_path, impresora):
+    excel = escribir_excel(tmp_path / "pedidos.xlsx", filas_pedidos(30))
+    impresora.guion = [None, OSError("sin conexión")]
+    trabajo = crear_trabajo(excel, ["prueba://zebra"])
+    ejecutar(trabajo)
+    escribir_excel(excel, filas_pedidos(31))
+
+    eventos = ejecutar(trabajos.TrabajoImpresion.desde_diario(trabajo.diario.ruta, destinos=["mem://zebra"]))
+    assert [evento[0] for evento in eventos] == ["error"]
+    assert "cambió" in eventos[0][1]
+    assert diario.pendientes() == []
+
+
+def test_reenviar_fallidas_completa_el_diario(excel_pedidos, impresora):
+    impresora.guion = [None, OSError("sin conexión"), None, None, OSError("sin conexión")]
+    trabajo = crear_trabajo(excel_pedidos, ["prueba://zebra"])
+    ejecutar(trabajo)
+    assert sum(fallida.cantidad for fallida in trabajo.fallidas) == 20
+    assert all(fallida.error == "sin conexión" for fallida in trabajo.fallidas)
+    assert os.path.exists(trabajo.diario.ruta)
+
+    reenvio = trabajos.TrabajoReenvio(trabajo)
+    _, total, enviadas, _, _ = evento_fin(ejecutar(reenvio))
+    assert total == enviadas == 20
+    assert reenvio.fallidas == []
+    assert sorted(codigos_enviados(b"".join(impresora.recibidos))) == sorted(todos_los_codigos(excel_pedidos))
+    assert not os.path.exists(trabajo.diario.ruta)
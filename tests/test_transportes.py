@@ -0,0 +1,182 @@
+import logging
+import socket
+
+import pytest
+
+import transportes
+
+ESTADO_OK = (b"\x02030,0,0,1234,000,0,0,0,000,0,0,0\x03\r\n"
+             b"\x02001,0,0,0,1,2,6,0,00000000,1,000\x03\r\n\x021234,0\x03\r\n")
+ESTADO_SIN_PAPEL = ESTADO_OK.replace(b"030,0,0", b"030,1,0", 1)
+
+SIN_ESPERA = transportes.PoliticaReintentos(intentos=3, espera_inicial=0)
+
+
+def etiquetas_prueba(cantidad):
+    return [(f"Empleado {indice}", b"^XA^FD%d^FS^XZ\n" % indice, 1) for indice in range(cantidad)]
+
+
+class Control:
+    """Control de trabajo mínimo (sin pausa) que se puede cancelar desde un aviso."""
+
+    def __init__(self):
+        self.cancelado = False
+
+    def esperar_si_pausado(self):
+        pass
+
+
+def puerto_cerrado():
+    """Devuelve un puerto local en el que nadie escucha."""
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_politica_reintentos_espera_exponencial():
+    politica = transportes.PoliticaReintentos(intentos=5, espera_inicial=0.5, factor=2, espera_maxima=3)
+    assert [politica.espera(intento) for intento in range(1, 5)] == [0.5, 1.0, 2.0, 3]
+    assert transportes.SIN_REINTENTOS.intentos == 1
+
+
+def test_proximo_reintento():
+    politica = transportes.PoliticaReintentos(intentos=3, espera_inicial=0.5, factor=2)
+    assert transportes.proximo_reintento(politica, 1, OSError()) == 0.5
+    assert transportes.proximo_reintento(politica, 2, OSError()) == 1.0
+    assert transportes.proximo_reintento(politica, 3, OSError()) is None
+    # Un envío cortado a la mitad nunca se reintenta, ni un trabajo cancelado
+    assert transportes.proximo_reintento(politica, 1, transportes.EnvioIncompleto("cortado", 10)) is None
+    control = Control()
+    control.cancelado = True
+    assert transportes.proximo_reintento(politica, 1, OSError(), control) is None
+
+
+def test_reintenta_y_reabre_el_transporte(impresora):
+    impresora.guion = [OSError("sin conexión"), OSError("sin conexión")]
+    reintentos = []
+    transporte = transportes.crear_transporte("prueba://zebra")
+    transportes.enviar_con_reintentos(transporte, b"^XA^XZ", SIN_ESPERA,
+                                      al_reintentar=lambda *aviso: reintentos.append(aviso))
+    assert impresora.recibidos == [b"^XA^XZ"]
+    assert [(intento, str(error), espera) for intento, error, espera in reintentos] == [
+        (1, "sin conexión", 0), (2, "sin conexión", 0)]
+    assert impresora.aperturas == 2
+
+
+def test_agotados_los_intentos_lanza_el_ultimo_error(impresora):
+    impresora.guion = [OSError("primero"), OSError("segundo"), OSError("tercero"), None]
+    transporte = transportes.crear_transporte("prueba://zebra")
+    with pytest.raises(OSError, match="tercero"):
+        transportes.enviar_con_reintentos(transporte, b"^XA^XZ", SIN_ESPERA)
+    assert impresora.recibidos == []
+
+
+def test_cancelar_corta_los_reintentos(impresora):
+    impresora.guion = [OSError("sin conexión"), None]
+    control = Control()
+    transporte = transportes.crear_transporte("prueba://zebra")
+    with pytest.raises(OSError):
+        transportes.enviar_con_reintentos(transporte, b"^XA^XZ", SIN_ESPERA, control,
+                                          al_reintentar=lambda *aviso: setattr(control, "cancelado", True))
+    assert impresora.recibidos == []
+
+
+def test_agrupar_en_lotes_respeta_ambos_limites():
+    etiquetas = [("a", b"x" * 10, 1)] * 7
+    assert [len(lote) for lote in transportes.agrupar_en_lotes(etiquetas, 3, 1000)] == [3, 3, 1]
+    assert [len(lote) for lote in transportes.agrupar_en_lotes(etiquetas, 10, 25)] == [2, 2, 2, 1]
+    # Una etiqueta más grande que el límite de bytes va sola en su lote
+    assert [len(lote) for lote in transportes.agrupar_en_lotes([("a", b"x" * 50, 1)] * 2, 10, 25)] == [1, 1]
+
+
+def test_lote_fallido_no_corta_la_corrida(impresora):
+    impresora.guion = [None, OSError("papel atascado")]
+    enviados, fallidos = [], []
+    enviadas = transportes.enviar_etiquetas(
+        etiquetas_prueba(10), "prueba://zebra", 4, 65536, encabezado="^XA^DFformato^XZ",
+        al_enviar=lambda lote, total: enviados.append((len(lote), total)),
+        al_fallar=lambda lote, error: fallidos.append(([nombre for nombre, _, _ in lote], str(error))))
+    assert enviadas == 6
+    assert enviados == [(4, 4), (2, 6)]
+    assert fallidos == [(["Empleado 4", "Empleado 5", "Empleado 6", "Empleado 7"], "papel atascado")]
+    # El encabezado va en cada lote
+    assert all(datos.startswith(b"^XA^DFformato^XZ") for datos in impresora.recibidos)
+
+
+def test_envio_incompleto_no_se_reintenta(impresora):
+    # Se cortó después de aceptar parte del lote: no se sabe qué etiquetas llegaron a imprimirse
+    impresora.guion = [transportes.EnvioIncompleto("conexión cortada", 40)]
+    enviados, fallidos = [], []
+    enviadas = transportes.enviar_etiquetas(
+        etiquetas_prueba(3), "prueba://zebra", 10, 65536, encabezado=b"^XA^DFformato^XZ", reintentos=SIN_ESPERA,
+        al_enviar=lambda lote, total: enviados.append(total),
+        al_fallar=lambda lote, error: fallidos.append([nombre for nombre, _, _ in lote]))
+    assert enviadas == 0
+    assert enviados == []
+    assert fallidos == [["Empleado 0", "Empleado 1", "Empleado 2"]]  # Todo el lote, para revisarlo
+    assert impresora.recibidos == []  # No hubo un segundo intento con el lote entero
+
+
+def test_puerto_serie_inexistente_deja_los_lotes_como_fallidos():
+    pytest.importorskip("serial")
+    fallidos = []
+    enviadas = transportes.enviar_etiquetas(etiquetas_prueba(5), "serial:///dev/no-existe", 2, 65536,
+                                            al_fallar=lambda lote, error: fallidos.append((len(lote), str(error))))
+    assert enviadas == 0
+    assert [cantidad for cantidad, _ in fallidos] == [2, 2, 1]
+    assert all("/dev/no-existe" in error for _, error in fallidos)
+
+
+def test_red_sin_impresora_deja_los_lotes_como_fallidos():
+    fallidos = []
+    destino = f"tcp://127.0.0.1:{puerto_cerrado()}"
+    enviadas = transportes.enviar_etiquetas(etiquetas_prueba(3), destino, 2, 65536, timeout=2,
+                                            al_fallar=lambda lote, error: fallidos.append(str(error)))
+    assert enviadas == 0
+    assert len(fallidos) == 2
+    assert all(destino in error for error in fallidos)
+
+
+def test_archivo_recibe_los_lotes(tmp_path):
+    ruta = tmp_path / "salida.zpl"
+    etiquetas = etiquetas_prueba(5)
+    assert transportes.enviar_etiquetas(etiquetas, f"file://{ruta}", 2, 65536) == 5
+    assert ruta.read_bytes() == b"".join(zpl for _, zpl, _ in etiquetas)
+
+
+def test_interpretar_estado():
+    assert transportes.interpretar_estado(ESTADO_OK).motivo == ""
+    estado = transportes.interpretar_estado(ESTADO_SIN_PAPEL)
+    assert estado.sin_papel
+    assert estado.motivo == "sin papel"
+    with pytest.raises(ValueError):
+        transportes.interpretar_estado(b"\x02030,0\x03")
+
+
+def test_estado_no_disponible_se_consulta_una_sola_vez(impresora, caplog):
+    consultas = []
+
+    def consultar_estado(transporte):
+        consultas.append(transporte)
+        raise TimeoutError("La impresora no respondió a la consulta de estado.")
+
+    impresora.consultar_estado = consultar_estado
+    transporte = transportes.crear_transporte("prueba://zebra")
+    with caplog.at_level(logging.WARNING, logger="transportes"):
+        assert transportes.consultar_estado(transporte) is None
+        assert transportes.consultar_estado(transporte) is None
+    assert len(consultas) == 1
+    assert not transporte.estado_disponible
+    assert "TimeoutError" in caplog.text
+
+
+def test_espera_mientras_la_impresora_no_esta_lista(impresora, monkeypatch):
+    monkeypatch.setattr(transportes, "ESPERA_ESTADO", 0)
+    estados = [ESTADO_SIN_PAPEL, ESTADO_SIN_PAPEL, ESTADO_OK]
+    impresora.consultar_estado = lambda transporte: transportes.interpretar_estado(estados.pop(0))
+    esperas = []
+    enviadas = transportes.enviar_etiquetas(etiquetas_prueba(2), "prueba://zebra", 5, 65536,
+                                            controlar_estado=True,
+                                            al_esperar=lambda estado: esperas.append(estado.motivo))
+    assert enviadas == 2
+    assert esperas == ["sin papel", "sin papel"]
@@ -0,0 +1,562 @@
+# =============================================================================
+# TRABAJOS DE IMPRESIÓN EN SEGUNDO PLANO
+# =============================================================================
+# La lectura del Excel, la generación del ZPL y el envío se ejecutan en un hilo
+# aparte. El hilo no toca widgets: publica eventos en la cola del trabajo y la
+# interfaz los consume periódicamente con root.after.
+import logging
+import os
+import queue
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime
+
+import cache_registros
+import despacho
+import diario
+import etiquetas
+import renderizado
+import transportes
+
+logger = logging.getLogger(__name__)
+
+# Criterios para repartir las etiquetas entre varias impresoras
+REPARTO_ALTERNADO = "alternado"  # Una etiqueta a cada impresora por turno
+REPARTO_MENU = "menu"            # Todas las etiquetas de un menú a la misma impresora
+REPARTO_LUGAR = "lugar"          # Todas las etiquetas de un lugar a la misma impresora
+
+
+def repartir_registros(registros, cantidad, criterio=REPARTO_ALTERNADO):
+    """Divide los registros en `cantidad` partes, una por impresora.
+
+    Con REPARTO_MENU o REPARTO_LUGAR los grupos se asignan de mayor a menor
+    a la parte con menos etiquetas, para que la carga quede equilibrada.
+    """
+    if criterio == REPARTO_ALTERNADO:
+        return [registros[i::cantidad] for i in range(cantidad)]
+
+    campo = "nombre_menu" if criterio == REPARTO_MENU else "lugar"
+    grupos = {}
+    for registro in registros:
+        grupos.setdefault(getattr(registro, campo), []).append(registro)
+
+    partes = [[] for _ in range(cantidad)]
+    for grupo in sorted(grupos.values(), key=len, reverse=True):
+        min(partes, key=len).extend(grupo)
+    return partes
+
+
+# Etiqueta que no se pudo enviar después de todos los reintentos:
+#   destino -> impresora donde falló
+#   nombre, zpl, cantidad -> la etiqueta tal como se envía (ZPL en bytes, cantidad > 1 con ^PQ)
+#   filas   -> índices de las filas del Excel que representa, para el diario
+#   error   -> mensaje del último error
+EtiquetaFallida = namedtuple("EtiquetaFallida", ["destino", "nombre", "zpl", "cantidad", "filas", "error"])
+
+
+class ControlTrabajo:
+    """Cola de eventos, pausa y cancelación comunes a los trabajos del hilo de fondo."""
+
+    def __init__(self):
+        self.eventos = queue.Queue()
+        self.fallidas = []  # EtiquetaFallida que se pueden reenviar con reenviar_fallidas()
+        self._cancelado = threading.Event()
+        self._reanudar = threading.Event()
+        self._reanudar.set()
+
+    @property
+    def cancelado(self):
+        return self._cancelado.is_set()
+
+    @property
+    def pausado(self):
+        return not self._reanudar.is_set()
+
+    def cancelar(self):
+        """Pide detener el trabajo después del lote en curso."""
+        self._cancelado.set()
+        self._reanudar.set()  # Liberar el hilo si estaba en pausa
+
+    def pausar(self):
+        """Pausa el envío después del lote en curso."""
+        self._reanudar.clear()
+
+    def reanudar(self):
+        """Continúa un trabajo pausado."""
+        self._reanudar.set()
+
+    def esperar_si_pausado(self):
+        """Bloquea el hilo de trabajo mientras el trabajo esté pausado."""
+        self._reanudar.wait()
+
+    def reenviar_fallidas(self):
+        """Devuelve un trabajo que reenvía juntas las etiquetas que fallaron."""
+        return TrabajoReenvio(self)
+
+
+class TrabajoImpresion(ControlTrabajo):
+    """Trabajo de impresión de un Excel en una o más impresoras, con pausa y cancelación.
+
+    Eventos publicados en self.eventos (tuplas):
+        ("inicio", total)
+        ("progreso", enviadas, total)
+        ("progreso_impresora", destino, enviadas, total)  (solo con varias impresoras)
+        ("esperando", destino, motivo)  (solo con control de estado ~HS)
+        ("reintento", destino, intento, espera, mensaje_error)
+        ("fallo", nombres, mensaje_error, destino)  (el lote agotó los reintentos)
+        ("fin", generadas, enviadas, cancelado, grupos)
+        ("error", mensaje_error)
+
+    grupos es la lista de (nombre, cantidad) de las etiquetas idénticas que
+    se enviaron una sola vez con ^PQ (vacía si no se agrupa).
+
+    Si se pasa una medicion.Medicion, se miden las etapas y al terminar se
+    guarda el reporte (su ruta queda en self.ruta_reporte).
+
+    Cada corrida lleva un diario.DiarioTrabajo con las filas enviadas; si se
+    pasa uno existente (ver desde_diario) solo se envían las filas que faltan.
+
+    Cada lote se reintenta según reintentos (transportes.PoliticaReintentos);
+    los que fallan igual quedan en self.fallidas para reenviarlos al final.
+
+    Las filas cuyo código de menú no es un EAN-13 válido no se envían: quedan
+    en self.codigos_invalidos (etiquetas.CodigoInvalido) y se informan juntas
+    con el evento ("codigos_invalidos", lista), antes de empezar a enviar o,
+    en modo streaming, al terminar de recorrer el Excel.
+
+    Con procesos > 1 el ZPL se genera en ese número de procesos, por bloques,
+    y se envía en el mismo orden que generándolo en el hilo de trabajo.
+
+    Con asincrono=True y varias impresoras, todas de red (tcp://), el envío
+    se hace con despacho (asyncio) en lugar de un hilo por impresora.
+    """
+
+    def __init__(self, excel_path, destinos, fecha_vencimiento, max_etiquetas, max_bytes,
+                 streaming=False, formato_almacenado=False, agrupar_identicas=False,
+                 reparto=REPARTO_ALTERNADO, usar_cache=True, controlar_estado=False, medicion=None,
+                 diario_trabajo=None, usar_diario=True, reintentos=transportes.SIN_REINTENTOS, timeout=None,
+                 filas=None, procesos=1, asincrono=False):
+        super().__init__()
+        self.excel_path = excel_path
+        # Lista de destinos de transportes; con más de uno las etiquetas se reparten en paralelo.
+        # Los repetidos se descartan porque compartirían la misma conexión.
+        self.destinos = list(dict.fromkeys(destinos))
+        self.fecha_vencimiento = fecha_vencimiento
+        self.max_etiquetas = max_etiquetas
+        self.max_bytes = max_bytes
+        # En modo streaming las filas se leen, generan y envían de a una sin pasar por la caché
+        self.streaming = streaming
+        # Enviar el diseño una vez como formato almacenado (^DF) y cada etiqueta como ^XF + campos
+        self.formato_almacenado = formato_almacenado
+        # Enviar una sola vez las etiquetas idénticas con ^PQ en lugar de repetirlas
+        self.agrupar_identicas = agrupar_identicas
+        self.reparto = reparto
+        self.usar_cache = usar_cache
+        # Consultar ~HS antes de cada lote y esperar si la impresora no puede recibirlo
+        self.controlar_estado = controlar_estado
+        self.medicion = medicion
+        self.ruta_reporte = None
+        # Diario de filas enviadas para poder reanudar si la corrida se interrumpe
+        self.diario = diario_trabajo
+        self.usar_diario = usar_diario or diario_trabajo is not None
+        # Índices de las filas a imprimir (None: todas), para el modo de selección
+        self.filas = frozenset(filas) if filas is not None else None
+        self.reintentos = reintentos
+        self.timeout = timeout  # Segundos máximos de cada envío (None: el del transporte)
+        self.procesos = procesos  # Procesos que generan el ZPL (1: en el hilo de trabajo)
+        self.asincrono = asincrono  # Atender varias impresoras de red con asyncio
+        self.codigos_invalidos = []  # Filas que no se imprimen por tener un código inválido
+        self.encabezado = b""
+        # True si al terminar solo faltan las etiquetas fallidas (para cerrar el diario al reenviarlas)
+        self.completo_salvo_fallidas = False
+
+    @classmethod
+    def desde_diario(cls, ruta, destinos=None, medicion=None, **opciones):
+        """Crea el trabajo que continúa el de un diario pendiente con sus mismas opciones.
+
+        Si no se indican destinos se usan las impresoras de la corrida original.
+        opciones (reintentos, timeout, procesos, asincrono) se pasan al constructor.
+        """
+        diario_trabajo = diario.DiarioTrabajo.abrir(ruta)
+        datos = diario_trabajo.datos
+        return cls(datos["excel"], destinos or datos["destinos"],
+                   date.fromisoformat(datos["fecha_vencimiento"]),
+                   datos["max_etiquetas"], datos["max_bytes"],
+                   streaming=datos["streaming"], formato_almacenado=datos["formato_almacenado"],
+                   agrupar_identicas=datos["agrupar_identicas"], reparto=datos["reparto"],
+                   controlar_estado=datos["controlar_estado"], medicion=medicion,
+                   diario_trabajo=diario_trabajo, filas=datos.get("filas"), **opciones)
+
+    def _datos_diario(self, hash_excel):
+        """Encabezado del diario con lo necesario para repetir la corrida."""
+        return {
+            "excel": os.path.abspath(self.excel_path), "hash": hash_excel,
+            "fecha_vencimiento": self.fecha_vencimiento.isoformat(), "destinos": self.destinos,
+            "max_etiquetas": self.max_etiquetas, "max_bytes": self.max_bytes,
+            "streaming": self.streaming, "formato_almacenado": self.formato_almacenado,
+            "agrupar_identicas": self.agrupar_identicas, "reparto": self.reparto,
+            "controlar_estado": self.controlar_estado,
+            "filas": sorted(self.filas) if self.filas is not None else None,
+        }
+
+    def _informar_invalidos(self, registros):
+        """Guarda y publica juntas las filas con códigos inválidos."""
+        self.codigos_invalidos = [etiquetas.codigo_invalido(registro) for registro in registros]
+        self.eventos.put(("codigos_invalidos", self.codigos_invalidos))
+
+    def ejecutar(self):
+        """Lee, genera y envía las etiquetas. Se ejecuta en el hilo de trabajo."""
+        inicio_carga = time.perf_counter()
+        try:
+            hash_excel = None
+            # Con varias impresoras hace falta la lista completa para repartirla
+            if self.streaming and len(self.destinos) == 1:
+                if self.usar_diario:
+                    hash_excel = cache_registros.hash_contenido(self.excel_path)
+                # Solo una estimación inicial: el total se corrige con las filas leídas
+                total = etiquetas.estimar_filas(self.excel_path)
+                registros = etiquetas.iterar_registros(self.excel_path)
+            else:
+                if self.usar_diario:
+                    # La caché ya calcula el hash del contenido: no volver a leer el archivo
+                    registros, hash_excel = cache_registros.cargar_registros_y_hash(
+                        self.excel_path, usar_cache=self.usar_cache)
+                else:
+                    registros = cache_registros.cargar_registros(self.excel_path, usar_cache=self.usar_cache)
+                total = len(registros)
+        except ValueError as e:
+            self.eventos.put(("error", str(e)))
+            return
+        except Exception as e:
+            self.eventos.put(("error", f"No se pudo leer el Excel: {e}"))
+            return
+
+        ya_enviadas = set()
+        if self.diario is not None:
+            if self.diario.datos.get("hash") != hash_excel:
+                self.diario.cerrar(completo=True)  # Ya no se puede reanudar: descartar el diario
+                self.eventos.put(("error", "El Excel cambió desde la impresión interrumpida; no se puede reanudar."))
+                return
+            ya_enviadas = self.diario.enviadas
+        elif self.usar_diario:
+            try:
+                self.diario = diario.DiarioTrabajo.crear(self._datos_diario(hash_excel))
+            except Exception as e:
+                logger.warning("Error al crear el diario del trabajo: %s", e)
+        if ya_enviadas or self.filas is not None:
+            # Enviar solo las filas elegidas y, al reanudar, las que no llegaron a la impresora
+            def incluir(registro):
+                return ((self.filas is None or registro.indice in self.filas)
+                        and registro.indice not in ya_enviadas)
+
+            if isinstance(registros, list):
+                registros = [registro for registro in registros if incluir(registro)]
+                total = len(registros)
+            else:
+                registros = filter(incluir, registros)
+                if self.filas is not None:
+                    total = len(self.filas)
+                total = max(total - len(ya_enviadas), 0)
+
+        # Las filas con códigos inválidos nunca llegan al transporte
+        invalidos = []
+        if isinstance(registros, list):
+            invalidos = [registro for registro in registros if not registro.ean13]
+            if invalidos:
+                registros = [registro for registro in registros if registro.ean13]
+                total = len(registros)
+                self._informar_invalidos(invalidos)
+                if not registros and not ya_enviadas:
+                    if self.diario is not None:
+                        self.diario.cerrar(completo=True)
+                    self.eventos.put(("error", "Ningún código de menú es un EAN-13 válido; no se imprimió nada."))
+                    return
+        else:
+            # En streaming los inválidos se conocen al recorrer el Excel y se informan al terminar
+            def es_valido(registro):
+                if registro.ean13:
+                    return True
+                invalidos.append(registro)
+                return False
+
+            registros = filter(es_valido, registros)
+
+        if self.medicion is not None:
+            self.medicion.sumar_etapa("carga", time.perf_counter() - inicio_carga)
+            self.medicion.datos.update({
+                "excel": self.excel_path, "impresoras": self.destinos, "filas": total,
+                "streaming": self.streaming, "formato_almacenado": self.formato_almacenado,
+                "agrupar_identicas": self.agrupar_identicas,
+                "lote_max_etiquetas": self.max_etiquetas, "lote_max_bytes": self.max_bytes})
+
+        self.eventos.put(("inicio", total))
+
+        renderizador = renderizado.Renderizador(datetime.now(), self.fecha_vencimiento,
+                                                formato_almacenado=self.formato_almacenado)
+        if self.formato_almacenado:
+            self.encabezado = renderizador.formato
+
+        if len(self.destinos) == 1:
+            partes = [registros]
+        else:
+            partes = repartir_registros(registros, len(self.destinos), self.reparto)
+
+        bloqueo = threading.Lock()
+        generadas = 0
+        enviadas_total = 0
+        grupos = []
+
+        # Un solo grupo de procesos para todas las impresoras
+        ejecutor_procesos = renderizado.crear_ejecutor(self.procesos) if self.procesos > 1 else None
+
+        def generar_etiquetas(parte, indices):
+            # El ZPL se genera a medida que el transporte pide el siguiente lote.
+            # indices recibe, en el mismo orden, las filas de cada etiqueta para el diario.
+            nonlocal generadas
+            if ejecutor_procesos is not None:
+                # Se mide la espera de cada etiqueta, que incluye la lectura de su registro
+                generados = renderizado.generar_en_procesos(parte, renderizador, ejecutor_procesos,
+                                                            self.procesos)
+                while True:
+                    inicio = time.perf_counter()
+                    siguiente = next(generados, None)
+                    if siguiente is None:
+                        return
+                    if self.medicion is not None:
+                        self.medicion.registrar_generacion(time.perf_counter() - inicio)
+                    registro, zpl = siguiente
+                    indices.append([registro.indice])
+                    with bloqueo:
+                        generadas += 1
+                    yield (registro.nombre_empleado, zpl, 1)
+            for registro in parte:
+                indices.append([registro.indice])
+                with bloqueo:
+                    generadas += 1
+                inicio = time.perf_counter()
+                zpl = renderizador.generar(registro)
+                if self.medicion is not None:
+                    self.medicion.registrar_generacion(time.perf_counter() - inicio)
+                yield (registro.nombre_empleado, zpl, 1)
+
+        def preparar_parte(destino, parte):
+            """Devuelve el despacho.Envio de una parte, con los avisos que publican los eventos."""
+            total_parte = len(parte) if len(self.destinos) > 1 else total
+
+            def al_enviar(lote, enviadas):
+                nonlocal enviadas_total
+                filas = [indice for _ in lote for indice in indices.popleft()]
+                if self.diario is not None:
+                    self.diario.registrar(filas)
+                with bloqueo:
+                    enviadas_total += sum(cantidad for _, _, cantidad in lote)
+                    # En streaming total es una estimación: nunca menos que las filas ya leídas
+                    self.eventos.put(("progreso", enviadas_total, max(total, generadas)))
+                if len(self.destinos) > 1:
+                    self.eventos.put(("progreso_impresora", destino, enviadas, total_parte))
+
+            def al_fallar(lote, error):
+                with bloqueo:
+                    self.fallidas.extend(EtiquetaFallida(destino, nombre, zpl, cantidad, indices.popleft(), str(error))
+                                         for nombre, zpl, cantidad in lote)
+                self.eventos.put(("fallo", [nombre for nombre, _, _ in lote], str(error), destino))
+
+            def al_reintentar(lote, intento, error, espera):
+                self.eventos.put(("reintento", destino, intento, espera, str(error)))
+
+            def al_esperar(estado):
+                motivo = estado.motivo or "terminando de imprimir las etiquetas pendientes"
+                self.eventos.put(("esperando", destino, motivo))
+
+            # Filas de cada etiqueta pendiente de enviar, en el orden en que se envían
+            indices = deque()
+            lista_etiquetas = generar_etiquetas(parte, indices)
+            if self.agrupar_identicas:
+                # agrupar_identicas respeta el orden de la primera aparición, igual que este diccionario
+                lista_etiquetas = list(lista_etiquetas)
+                filas_por_zpl = {}
+                for (_, zpl, _), filas in zip(lista_etiquetas, indices):
+                    filas_por_zpl.setdefault(zpl, []).extend(filas)
+                indices = deque(filas_por_zpl.values())
+                lista_etiquetas = etiquetas.agrupar_identicas(lista_etiquetas)
+                with bloqueo:
+                    grupos.extend((nombre, cantidad) for nombre, _, cantidad in lista_etiquetas if cantidad > 1)
+            return despacho.Envio(destino, lista_etiquetas, al_enviar, al_fallar, al_reintentar, al_esperar)
+
+        def enviar_parte(destino, parte):
+            """Envía una parte de las etiquetas a un destino (un hilo por impresora)."""
+            envio = preparar_parte(destino, parte)
+            return transportes.enviar_etiquetas(envio.etiquetas, destino,
+                                                self.max_etiquetas, self.max_bytes,
+                                                al_enviar=envio.al_enviar, al_fallar=envio.al_fallar,
+                                                control=self, encabezado=self.encabezado,
+                                                controlar_estado=self.controlar_estado,
+                                                al_esperar=envio.al_esperar, medicion=self.medicion,
+                                                reintentos=self.reintentos, timeout=self.timeout,
+                                                al_reintentar=envio.al_reintentar)
+
+        try:
+            if len(self.destinos) == 1:
+                enviadas = enviar_parte(self.destinos[0], partes[0])
+            elif self.asincrono and despacho.puede_despachar(self.destinos):
+                envios = [preparar_parte(destino, parte) for destino, parte in zip(self.destinos, partes)]
+                enviadas = sum(despacho.despachar(envios, self.max_etiquetas, self.max_bytes,
+                                                  control=self, encabezado=self.encabezado,
+                                                  controlar_estado=self.controlar_estado,
+                                                  medicion=self.medicion, reintentos=self.reintentos,
+                                                  timeout=self.timeout))
+            else:
+                with ThreadPoolExecutor(max_workers=len(self.destinos),
+                                        thread_name_prefix="Impresora") as ejecutor:
+                    resultados = ejecutor.map(enviar_parte, self.destinos, partes)
+                    enviadas = sum(resultados)
+
+            # Se compara con las filas a enviar y no con las generadas: si algo cortó la
+            # generación, 0 == 0 daría el trabajo por completo. En streaming el recorrido
+            # del Excel terminó, así que las generadas son todas las filas.
+            filas_a_enviar = total if isinstance(registros, list) else generadas
+            fallidas = sum(fallida.cantidad for fallida in self.fallidas)
+            self.completo_salvo_fallidas = not self.cancelado and enviadas_total + fallidas == filas_a_enviar
+            if self.diario is not None:
+                # El diario se elimina solo si ya no queda nada por enviar
+                self.diario.cerrar(completo=self.completo_salvo_fallidas and not fallidas)
+        except ValueError as e:
+            # En modo streaming el Excel vacío o sin códigos se detecta al recorrerlo
+            self.eventos.put(("error", str(e)))
+            return
+        finally:
+            if ejecutor_procesos is not None:
+                ejecutor_procesos.shutdown(cancel_futures=True)
+            if self.diario is not None:
+                # Si hubo un error el diario queda (ya cerrado) para reanudar la corrida
+                self.diario.cerrar()
+        if invalidos and not self.codigos_invalidos:
+            self._informar_invalidos(invalidos)
+        if self.medicion is not None:
+            if not isinstance(registros, list):
+                self.medicion.datos["filas"] = generadas  # Las que se leyeron, no las estimadas
+            self.medicion.terminar()
+            self.ruta_reporte = self.medicion.guardar()
+        self.eventos.put(("fin", generadas, enviadas, self.cancelado, grupos))
+
+
+class TrabajoReenvio(ControlTrabajo):
+    """Reenvía como un solo trabajo las etiquetas que fallaron en otro trabajo.
+
+    Cada etiqueta vuelve a la impresora donde falló, con las mismas opciones
+    de lotes, reintentos y formato. Publica los mismos eventos que
+    TrabajoImpresion; las que vuelven a fallar quedan en self.fallidas.
+    """
+
+    def __init__(self, original):
+        super().__init__()
+        self.etiquetas = list(original.fallidas)
+        self.destinos = list(dict.fromkeys(fallida.destino for fallida in self.etiquetas))
+        self.max_etiquetas = original.max_etiquetas
+        self.max_bytes = original.max_bytes
+        self.encabezado = original.encabezado
+        self.controlar_estado = original.controlar_estado
+        self.reintentos = original.reintentos
+        self.timeout = original.timeout
+        self.asincrono = original.asincrono
+        self.completo_salvo_fallidas = original.completo_salvo_fallidas
+        self.ruta_diario = original.diario.ruta if getattr(original, "diario", None) is not None else None
+        self.diario = None
+        self.medicion = None
+        self.ruta_reporte = None
+
+    def ejecutar(self):
+        """Envía las etiquetas fallidas agrupadas por impresora. Se ejecuta en el hilo de trabajo."""
+        total = sum(fallida.cantidad for fallida in self.etiquetas)
+        if self.ruta_diario is not None and os.path.exists(self.ruta_diario):
+            try:
+                self.diario = diario.DiarioTrabajo.abrir(self.ruta_diario)
+            except Exception as e:
+                logger.warning("Error al abrir el diario del trabajo: %s", e)
+        self.eventos.put(("inicio", total))
+
+        bloqueo = threading.Lock()
+        enviadas_total = 0
+
+        def preparar_destino(destino):
+            pendientes = deque(fallida for fallida in self.etiquetas if fallida.destino == destino)
+            total_destino = sum(fallida.cantidad for fallida in pendientes)
+
+            def al_enviar(lote, enviadas):
+                nonlocal enviadas_total
+                filas = [fila for _ in lote for fila in pendientes.popleft().filas]
+                if self.diario is not None:
+                    self.diario.registrar(filas)
+                with bloqueo:
+                    enviadas_total += sum(cantidad for _, _, cantidad in lote)
+                    self.eventos.put(("progreso", enviadas_total, total))
+                if len(self.destinos) > 1:
+                    self.eventos.put(("progreso_impresora", destino, enviadas, total_destino))
+
+            def al_fallar(lote, error):
+                with bloqueo:
+                    self.fallidas.extend(pendientes.popleft()._replace(error=str(error)) for _ in lote)
+                self.eventos.put(("fallo", [nombre for nombre, _, _ in lote], str(error), destino))
+
+            def al_reintentar(lote, intento, error, espera):
+                self.eventos.put(("reintento", destino, intento, espera, str(error)))
+
+            lista_etiquetas = [(fallida.nombre, fallida.zpl, fallida.cantidad) for fallida in pendientes]
+            return despacho.Envio(destino, lista_etiquetas, al_enviar, al_fallar, al_reintentar)
+
+        def enviar_destino(destino):
+            envio = preparar_destino(destino)
+            return transportes.enviar_etiquetas(envio.etiquetas, destino,
+                                                self.max_etiquetas, self.max_bytes,
+                                                al_enviar=envio.al_enviar, al_fallar=envio.al_fallar,
+                                                control=self, encabezado=self.encabezado,
+                                                controlar_estado=self.controlar_estado,
+                                                reintentos=self.reintentos, timeout=self.timeout,
+                                                al_reintentar=envio.al_reintentar)
+
+        try:
+            if self.asincrono and len(self.destinos) > 1 and despacho.puede_despachar(self.destinos):
+                enviadas = sum(despacho.despachar([preparar_destino(destino) for destino in self.destinos],
+                                                  self.max_etiquetas, self.max_bytes,
+                                                  control=self, encabezado=self.encabezado,
+                                                  controlar_estado=self.controlar_estado,
+                                                  reintentos=self.reintentos, timeout=self.timeout))
+            else:
+                with ThreadPoolExecutor(max_workers=max(len(self.destinos), 1),
+                                        thread_name_prefix="Impresora") as ejecutor:
+                    enviadas = sum(ejecutor.map(enviar_destino, self.destinos))
+            if self.diario is not None:
+                self.diario.cerrar(completo=self.completo_salvo_fallidas and not self.cancelado
+                                   and enviadas_total == total)
+        finally:
+            if self.diario is not None:
+                # Si hubo un error el diario queda para reanudar la corrida
+                self.diario.cerrar()
+        self.eventos.put(("fin", total, enviadas, self.cancelado, []))
+
+
+class TrabajadorImpresion(threading.Thread):
+    """Hilo de fondo que ejecuta, en orden, los trabajos que recibe por su cola."""
+
+    def __init__(self):
+        super().__init__(name="TrabajadorImpresion", daemon=True)
+        self.cola = queue.Queue()
+
+    def agregar(self, trabajo):
+        """Encola un trabajo para ejecutarlo en segundo plano."""
+        self.cola.put(trabajo)
+
+    def run(self):
+        while True:
+            trabajo = self.cola.get()
+            try:
+                if trabajo.cancelado:
+                    trabajo.eventos.put(("fin", 0, 0, True, []))
+                else:
+                    trabajo.ejecutar()
+            except Exception as e:
+                trabajo.eventos.put(("error", f"Ocurrió un error durante el proceso: {e}"))
+            finally:
+                self.cola.task_done()
@@ -0,0 +1,684 @@
+# =============================================================================
+# ENVÍO DE ZPL A LAS IMPRESORAS
+# =============================================================================
+# Cada forma de conexión es un Transporte que se elige según el destino:
+#   "tcp://host:puerto"   -> TransporteTCP (puerto RAW 9100)
+#   "serial://COM3"       -> TransporteSerie ("serial://COM3?baudios=115200&flujo=rtscts")
+#   "file://ruta"         -> TransporteArchivo (archivo o carpeta, sin impresora)
+#   "mem://nombre"        -> TransporteMemoria (en memoria, para pruebas y mediciones)
+#   cualquier otro texto  -> TransporteSpooler (nombre de impresora de Windows)
+# win32print y pyserial se importan dentro de cada transporte para que el módulo
+# pueda usarse sin interfaz y en equipos que no tienen alguno de los dos.
+# Los avisos se registran con logging (stderr), nunca en stdout: en la línea de
+# comandos stdout lleva solo el resultado JSON.
+import logging
+import os
+import socket
+import threading
+import time
+from collections import namedtuple
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+PREFIJO_SERIE = "serial://"
+PREFIJO_TCP = "tcp://"
+PREFIJO_ARCHIVO = "file://"
+PREFIJO_MEMORIA = "mem://"
+PUERTO_TCP_DEFECTO = 9100  # Puerto RAW estándar de las impresoras Zebra en red
+TIMEOUT_TCP = 10           # Segundos de espera para conectar y escribir
+TIMEOUT_ESTADO = 2         # Segundos de espera para la respuesta de ~HS
+ESPERA_ESTADO = 1.0        # Segundos entre consultas mientras la impresora no está lista
+TIMEOUT_SERIE = 10         # Segundos máximos para escribir cada bloque por el puerto serie
+BAUDIOS_SERIE = (9600, 19200, 38400, 57600, 115200)  # Velocidades que aceptan las Zebra por RS-232
+BAUDIOS_DEFECTO = 9600
+TAMANO_BLOQUE_SERIE = 4096  # Bytes por escritura: el timeout se aplica a cada bloque y no al lote entero
+
+# Control de flujo del puerto serie (debe coincidir con la configuración de la impresora)
+FLUJO_NINGUNO = "ninguno"
+FLUJO_RTSCTS = "rtscts"    # Por hardware (cables RTS/CTS)
+FLUJO_XONXOFF = "xonxoff"  # Por software (la impresora envía XOFF cuando su buffer se llena)
+FLUJOS_SERIE = (FLUJO_NINGUNO, FLUJO_RTSCTS, FLUJO_XONXOFF)
+
+CONSULTA_ESTADO = b"~HS"
+FIN_CADENA_ESTADO = b"\x03"  # ~HS responde tres cadenas, cada una entre STX (0x02) y ETX (0x03)
+
+
+class EnvioIncompleto(Exception):
+    """El envío se cortó después de mandar parte de los datos.
+
+    No se reintenta: volver a enviar el lote entero imprimiría de nuevo las
+    etiquetas que ya llegaron. enviados son los bytes que aceptó el sistema,
+    que no indican cuántos recibió (ni imprimió) la impresora: el lote entero
+    queda como fallido y hay que revisar cuáles etiquetas salieron.
+    """
+
+    def __init__(self, mensaje, enviados):
+        super().__init__(mensaje)
+        self.enviados = enviados
+
+
+class EstadoImpresora(namedtuple("EstadoImpresora", [
+        "sin_papel", "pausada", "buffer_lleno", "formatos_en_buffer",
+        "cabezal_abierto", "sin_ribbon", "etiquetas_pendientes"])):
+    """Estado de la impresora según la respuesta a ~HS (Host Status)."""
+    __slots__ = ()
+
+    @property
+    def motivo(self):
+        """Describe por qué la impresora no puede recibir más etiquetas ("" si está lista)."""
+        motivos = []
+        if self.sin_papel:
+            motivos.append("sin papel")
+        if self.cabezal_abierto:
+            motivos.append("cabezal abierto")
+        if self.sin_ribbon:
+            motivos.append("sin ribbon")
+        if self.pausada:
+            motivos.append("en pausa")
+        if self.buffer_lleno:
+            motivos.append("buffer lleno")
+        return ", ".join(motivos)
+
+
+def interpretar_estado(respuesta):
+    """Convierte la respuesta cruda de ~HS en un EstadoImpresora.
+
+    Cadena 1: aaa,b(sin papel),c(pausa),dddd,eee(formatos en buffer),f(buffer lleno),...
+    Cadena 2: mmm,n,o(cabezal abierto),p(sin ribbon),q,r,s,t,uuuuuuuu(etiquetas pendientes),...
+    """
+    cadenas = [parte.split(b"\x02")[-1].decode('ascii', 'replace').strip()
+               for parte in respuesta.split(FIN_CADENA_ESTADO)[:2]]
+    if len(cadenas) < 2:
+        raise ValueError(f"Respuesta de estado incompleta: {respuesta!r}")
+    campos1 = cadenas[0].split(",")
+    campos2 = cadenas[1].split(",")
+    if len(campos1) < 6 or len(campos2) < 9:
+        raise ValueError(f"Respuesta de estado inválida: {respuesta!r}")
+    return EstadoImpresora(
+        sin_papel=campos1[1] == "1",
+        pausada=campos1[2] == "1",
+        buffer_lleno=campos1[5] == "1",
+        formatos_en_buffer=int(campos1[4]),
+        cabezal_abierto=campos2[2] == "1",
+        sin_ribbon=campos2[3] == "1",
+        etiquetas_pendientes=int(campos2[8]),
+    )
+
+
+def leer_respuesta_estado(leer):
+    """Lee con leer(n) hasta recibir las tres cadenas de ~HS."""
+    respuesta = b""
+    while respuesta.count(FIN_CADENA_ESTADO) < 3:
+        datos = leer(1024)
+        if not datos:
+            raise TimeoutError("La impresora no respondió a la consulta de estado.")
+        respuesta += datos
+    return respuesta
+
+
+class Transporte:
+    """Interfaz común de los transportes.
+
+    Un transporte se crea por destino y por corrida: se abre una vez, recibe
+    todos los lotes con enviar() y se cierra al terminar. Los transportes que
+    no pueden leer respuestas de la impresora devuelven None en consultar_estado().
+    timeout son los segundos máximos de espera de cada envío (None: el del transporte).
+    """
+
+    def __init__(self, destino, timeout=None):
+        self.destino = destino
+        self.timeout = timeout
+        # False después de una consulta ~HS fallida: la impresora no responde y no se vuelve a consultar
+        self.estado_disponible = True
+
+    def abrir(self):
+        """Prepara el transporte antes del primer envío."""
+
+    def enviar(self, datos):
+        """Envía un trabajo (bytes con uno o más formatos ^XA...^XZ)."""
+        raise NotImplementedError
+
+    def consultar_estado(self):
+        """Devuelve el EstadoImpresora (~HS) o None si el transporte no lo soporta."""
+        return None
+
+    def cerrar(self):
+        """Libera los recursos del transporte."""
+
+    def __enter__(self):
+        self.abrir()
+        return self
+
+    def __exit__(self, *exc):
+        self.cerrar()
+
+
+class TransporteSpooler(Transporte):
+    """Impresora instalada en Windows (USB o paralelo), un trabajo RAW por envío."""
+
+    def enviar(self, datos):
+        import win32print
+
+        handle = None
+        try:
+            handle = win32print.OpenPrinter(self.destino)
+            win32print.StartDocPrinter(handle, 1, ("Etiqueta ZPL", None, "RAW"))
+            win32print.StartPagePrinter(handle)
+            win32print.WritePrinter(handle, datos)
+            win32print.EndPagePrinter(handle)
+            win32print.EndDocPrinter(handle)
+            win32print.ClosePrinter(handle)
+            handle = None
+        except Exception as e:
+            if handle:
+                try:
+                    win32print.ClosePrinter(handle)
+                except Exception:
+                    pass
+            error_msg = str(e)
+            raise Exception(f"Error al imprimir: Verifica que la impresora esté conectada y encendida. {error_msg}")
+
+
+def destino_serie(puerto, baudios=BAUDIOS_DEFECTO, flujo=FLUJO_NINGUNO):
+    """Arma el destino "serial://PUERTO" con la velocidad y el control de flujo si no son los de por defecto."""
+    opciones = []
+    if baudios != BAUDIOS_DEFECTO:
+        opciones.append(f"baudios={baudios}")
+    if flujo != FLUJO_NINGUNO:
+        opciones.append(f"flujo={flujo}")
+    return PREFIJO_SERIE + puerto + ("?" + "&".join(opciones) if opciones else "")
+
+
+def separar_opciones_serie(direccion):
+    """Separa "PUERTO?baudios=N&flujo=F" en (puerto, baudios, flujo), validando los valores."""
+    puerto, _, consulta = direccion.partition("?")
+    opciones = {clave: valores[-1] for clave, valores in parse_qs(consulta).items()}
+    try:
+        baudios = int(opciones.get("baudios", BAUDIOS_DEFECTO))
+    except ValueError:
+        baudios = None
+    if baudios not in BAUDIOS_SERIE:
+        raise ValueError(f"Velocidad no soportada para {puerto}: {opciones.get('baudios')} "
+                         f"(valores válidos: {', '.join(map(str, BAUDIOS_SERIE))})")
+    flujo = opciones.get("flujo", FLUJO_NINGUNO).lower()
+    if flujo not in FLUJOS_SERIE:
+        raise ValueError(f"Control de flujo no soportado para {puerto}: {flujo} "
+                         f"(valores válidos: {', '.join(FLUJOS_SERIE)})")
+    return puerto, baudios, flujo
+
+
+class TransporteSerie(Transporte):
+    """Impresora conectada por puerto serie (RS-232), con el puerto abierto durante toda la corrida.
+
+    El puerto se abre en el primer envío, así un puerto que no se puede abrir
+    falla como cualquier lote (con reintentos y etiquetas fallidas) y no
+    corta la corrida. Cada envío (un lote) se escribe en bloques de
+    TAMANO_BLOQUE_SERIE y se vacía con flush() al final, así el puerto solo
+    se abre una vez y el timeout no corta lotes grandes a baja velocidad.
+    """
+
+    def __init__(self, destino, timeout=None):
+        super().__init__(destino, timeout or TIMEOUT_SERIE)
+        self.puerto, self.baudios, self.flujo = separar_opciones_serie(destino[len(PREFIJO_SERIE):])
+        self.ser = None
+
+    def _abrir_puerto(self):
+        """Abre el puerto si todavía no está abierto (8N1 con la velocidad y el control de flujo elegidos)."""
+        if self.ser is not None:
+            return
+        import serial
+
+        try:
+            self.ser = serial.Serial(port=self.puerto, baudrate=self.baudios, bytesize=8, parity='N',
+                                     stopbits=1, timeout=TIMEOUT_ESTADO, write_timeout=self.timeout,
+                                     rtscts=self.flujo == FLUJO_RTSCTS, xonxoff=self.flujo == FLUJO_XONXOFF)
+        except Exception as e:
+            raise Exception(f"Error al abrir el puerto serie {self.puerto}: {e}")
+
+    def enviar(self, datos):
+        try:
+            self._abrir_puerto()
+            vista = memoryview(datos)
+            for inicio in range(0, len(vista), TAMANO_BLOQUE_SERIE):
+                self.ser.write(vista[inicio:inicio + TAMANO_BLOQUE_SERIE])
+            # Esperar a que el lote salga del buffer del sistema antes de darlo por enviado
+            self.ser.flush()
+        except Exception as e:
+            # Cerrar para que el próximo intento vuelva a abrir el puerto
+            self.cerrar()
+            raise Exception(f"Error al enviar por puerto serie {self.puerto}: {e}")
+
+    def consultar_estado(self):
+        """Envía ~HS por el puerto abierto y devuelve el EstadoImpresora."""
+        self._abrir_puerto()
+        try:
+            self.ser.reset_input_buffer()
+            self.ser.write(CONSULTA_ESTADO)
+            self.ser.flush()
+            return interpretar_estado(leer_respuesta_estado(self._leer_disponible))
+        except Exception:
+            # Descartar el puerto para no mezclar una respuesta tardía con la próxima consulta
+            self.cerrar()
+            raise
+
+    def _leer_disponible(self, cantidad):
+        # Leer lo que ya llegó (al menos un byte) en lugar de esperar `cantidad` bytes o el timeout
+        return self.ser.read(max(min(self.ser.in_waiting, cantidad), 1))
+
+    def cerrar(self):
+        """Cierra el puerto ignorando errores."""
+        if self.ser is not None:
+            try:
+                self.ser.close()
+            except Exception:
+                pass
+            self.ser = None
+
+
+def separar_host_puerto(direccion):
+    """Separa "host:puerto" en (host, puerto), usando el puerto 9100 si no se indica."""
+    host, separador, puerto = direccion.rpartition(":")
+    if not separador:
+        return direccion, PUERTO_TCP_DEFECTO
+    return host, int(puerto)
+
+
+class TransporteTCP(Transporte):
+    """Conexión persistente al puerto RAW de una impresora Zebra en red."""
+
+    def __init__(self, destino, timeout=None):
+        super().__init__(destino, timeout or TIMEOUT_TCP)
+        self.host, self.puerto = separar_host_puerto(destino[len(PREFIJO_TCP):])
+        self.sock = None
+
+    def conectar(self):
+        """Abre la conexión si todavía no está abierta."""
+        if self.sock is None:
+            self.sock = socket.create_connection((self.host, self.puerto), timeout=self.timeout)
+            self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+
+    def _escribir(self, datos):
+        """Como sendall, pero si se corta después de enviar algo lanza EnvioIncompleto."""
+        vista = memoryview(datos)
+        enviados = 0
+        try:
+            while enviados < len(vista):
+                enviados += self.sock.send(vista[enviados:])
+        except OSError as e:
+            if not enviados:
+                raise
+            self.cerrar()
+            raise EnvioIncompleto(f"se cortó después de enviar {enviados} de {len(datos)} bytes; "
+                                  f"parte del lote pudo haberse impreso ({e})", enviados)
+
+    def _enviar_crudo(self, datos):
+        """Envía los bytes por la conexión, reconectando una vez si se había cortado antes de enviar nada."""
+        try:
+            self.conectar()
+            self._escribir(datos)
+        except EnvioIncompleto:
+            raise
+        except OSError:
+            # La impresora pudo cerrar la conexión (reinicio, timeout inactivo): reintentar una vez
+            self.cerrar()
+            self.conectar()
+            self._escribir(datos)
+
+    def enviar(self, datos):
+        try:
+            self._enviar_crudo(datos)
+        except EnvioIncompleto as e:
+            raise EnvioIncompleto(f"Error al enviar a la impresora de red {self.destino}: {e}", e.enviados)
+        except Exception as e:
+            raise Exception(f"Error al enviar a la impresora de red {self.destino}: {e}")
+
+    def consultar_estado(self):
+        """Envía ~HS por la conexión y devuelve el EstadoImpresora."""
+        self._enviar_crudo(CONSULTA_ESTADO)
+        self.sock.settimeout(TIMEOUT_ESTADO)
+        try:
+            return interpretar_estado(leer_respuesta_estado(self.sock.recv))
+        except (OSError, ValueError):
+            # Descartar la conexión para no mezclar una respuesta tardía con la próxima consulta
+            self.cerrar()
+            raise
+        finally:
+            if self.sock is not None:
+                self.sock.settimeout(self.timeout)
+
+    def cerrar(self):
+        """Cierra la conexión ignorando errores."""
+        if self.sock is not None:
+            try:
+                self.sock.close()
+            except OSError:
+                pass
+            self.sock = None
+
+
+class TransporteArchivo(Transporte):
+    """Escribe el ZPL en disco en lugar de imprimirlo.
+
+    Si la ruta es una carpeta existente, cada envío se guarda en su propio
+    archivo trabajo_NNNNN.zpl; si no, todos los envíos se agregan a la ruta.
+    """
+
+    def __init__(self, destino, timeout=None):
+        super().__init__(destino, timeout)
+        self.ruta = destino[len(PREFIJO_ARCHIVO):]
+        self.archivo = None
+        self.trabajos = 0
+
+    def abrir(self):
+        if not os.path.isdir(self.ruta):
+            self.archivo = open(self.ruta, 'ab')
+
+    def enviar(self, datos):
+        self.trabajos += 1
+        if self.archivo is not None:
+            self.archivo.write(datos)
+        else:
+            with open(os.path.join(self.ruta, f"trabajo_{self.trabajos:05d}.zpl"), 'wb') as f:
+                f.write(datos)
+
+    def cerrar(self):
+        if self.archivo is not None:
+            self.archivo.close()
+            self.archivo = None
+
+
+class SumideroMemoria:
+    """Trabajos recibidos por un destino "mem://nombre"."""
+
+    def __init__(self, guardar=True):
+        self.guardar = guardar  # Con False solo se cuentan bytes y trabajos (mediciones grandes)
+        self.trabajos = []
+        self.cantidad_trabajos = 0
+        self.bytes_recibidos = 0
+        self.bloqueo = threading.Lock()
+
+    def recibir(self, datos):
+        with self.bloqueo:
+            self.cantidad_trabajos += 1
+            self.bytes_recibidos += len(datos)
+            if self.guardar:
+                self.trabajos.append(bytes(datos))
+
+
+# Sumideros en memoria por nombre, para inspeccionarlos después de enviar
+SUMIDEROS_MEMORIA = {}
+_bloqueo_sumideros = threading.Lock()
+
+
+def obtener_sumidero(nombre, guardar=True):
+    """Devuelve (creándolo si hace falta) el sumidero en memoria de ese nombre."""
+    with _bloqueo_sumideros:
+        if nombre not in SUMIDEROS_MEMORIA:
+            SUMIDEROS_MEMORIA[nombre] = SumideroMemoria(guardar)
+        return SUMIDEROS_MEMORIA[nombre]
+
+
+class TransporteMemoria(Transporte):
+    """Guarda los trabajos en un SumideroMemoria; mide el costo de generar sin hardware."""
+
+    def __init__(self, destino, timeout=None):
+        super().__init__(destino, timeout)
+        self.sumidero = obtener_sumidero(destino[len(PREFIJO_MEMORIA):])
+
+    def enviar(self, datos):
+        self.sumidero.recibir(datos)
+
+
+# Transportes por prefijo de destino; registrar_transporte permite agregar otros
+TRANSPORTES = {
+    PREFIJO_TCP: TransporteTCP,
+    PREFIJO_SERIE: TransporteSerie,
+    PREFIJO_ARCHIVO: TransporteArchivo,
+    PREFIJO_MEMORIA: TransporteMemoria,
+}
+
+
+def registrar_transporte(prefijo, clase):
+    """Asocia un prefijo de destino ("xyz://") con una clase de Transporte.
+
+    La clase se construye como clase(destino, timeout=...).
+    """
+    TRANSPORTES[prefijo] = clase
+
+
+def crear_transporte(destino, timeout=None):
+    """Crea el transporte que corresponde al destino (por defecto la cola de Windows)."""
+    for prefijo, clase in TRANSPORTES.items():
+        if destino.startswith(prefijo):
+            return clase(destino, timeout=timeout)
+    return TransporteSpooler(destino, timeout=timeout)
+
+
+def consultar_estado(transporte):
+    """Consulta el estado de la impresora con ~HS.
+
+    Devuelve None si el transporte no permite leer respuestas (cola de
+    impresión de Windows, archivo) o si la impresora no contestó: en ese
+    caso se envía sin esperar. Después de la primera consulta fallida no se
+    vuelve a consultar en ese transporte, para no esperar TIMEOUT_ESTADO
+    (y reconectar) antes de cada lote.
+    """
+    if not transporte.estado_disponible:
+        return None
+    try:
+        return transporte.consultar_estado()
+    except Exception as e:
+        estado_no_disponible(transporte, e)
+    return None
+
+
+def estado_no_disponible(transporte, error):
+    """Deja de consultar ~HS en el transporte (o despacho.ConexionAsincrona) después de una consulta fallida."""
+    transporte.estado_disponible = False
+    logger.warning("No se pudo consultar el estado de %s (%s: %s); se envía sin controlar el estado",
+                   transporte.destino, type(error).__name__, error)
+
+
+def impresora_lista(estado, max_formatos):
+    """Indica si la impresora puede recibir otro lote según su EstadoImpresora.
+
+    No está lista si le falta papel, tiene el cabezal abierto, está en pausa,
+    tiene el buffer lleno o más de max_formatos formatos sin imprimir.
+    """
+    return not estado.motivo and estado.formatos_en_buffer <= max_formatos
+
+
+def esperar_impresora_lista(transporte, max_formatos, control=None, al_esperar=None):
+    """Espera hasta que la impresora pueda recibir otro lote (ver impresora_lista).
+
+    al_esperar(estado) se llama cada vez que hay que esperar.
+    """
+    while True:
+        estado = consultar_estado(transporte)
+        if estado is None or impresora_lista(estado, max_formatos):
+            return
+        if al_esperar:
+            al_esperar(estado)
+        if control is not None and control.cancelado:
+            return
+        time.sleep(ESPERA_ESTADO)
+
+
+def a_bytes(zpl):
+    """Devuelve el ZPL como bytes (el texto se codifica en UTF-8, como indica ^CI28)."""
+    return zpl if isinstance(zpl, bytes) else zpl.encode('utf-8')
+
+
+def enviar(zpl_data, destino):
+    """Envía un único trabajo ZPL (texto o bytes) al destino, abriendo y cerrando su transporte."""
+    with crear_transporte(destino) as transporte:
+        transporte.enviar(a_bytes(zpl_data))
+
+
+class PoliticaReintentos(namedtuple("PoliticaReintentos", ["intentos", "espera_inicial", "factor", "espera_maxima"],
+                                    defaults=(3, 0.5, 2.0, 8.0))):
+    """Cuántas veces intentar cada lote y cuánto esperar entre intentos.
+
+    La espera crece de forma exponencial: espera_inicial, espera_inicial * factor,
+    ... hasta espera_maxima segundos.
+    """
+    __slots__ = ()
+
+    def espera(self, intento):
+        """Segundos a esperar después del intento número `intento` (desde 1)."""
+        return min(self.espera_inicial * self.factor ** (intento - 1), self.espera_maxima)
+
+
+SIN_REINTENTOS = PoliticaReintentos(intentos=1, espera_inicial=0, factor=1, espera_maxima=0)
+
+
+def proximo_reintento(reintentos, intento, error, control=None):
+    """Segundos a esperar antes de reintentar un envío que falló en el intento número `intento`.
+
+    Devuelve None si no hay que reintentar: se agotaron los intentos, se
+    canceló el trabajo o el error es un EnvioIncompleto (parte del lote ya
+    llegó: reintentarlo entero duplicaría etiquetas).
+    """
+    if isinstance(error, EnvioIncompleto):
+        return None
+    if intento >= reintentos.intentos or (control is not None and control.cancelado):
+        return None
+    return reintentos.espera(intento)
+
+
+def enviar_con_reintentos(transporte, datos, reintentos, control=None, al_reintentar=None):
+    """Envía los datos reintentando según la política; lanza el último error si todos fallan.
+
+    Antes de cada reintento se reabre el transporte (reconexión en red) y se
+    llama a al_reintentar(intento, error, espera). Cuándo reintentar lo decide
+    proximo_reintento. Si control se cancela durante la espera no se sigue
+    intentando.
+    """
+    intento = 1
+    while True:
+        try:
+            transporte.enviar(datos)
+            return
+        except Exception as e:
+            espera = proximo_reintento(reintentos, intento, e, control)
+            if espera is None:
+                raise
+            if al_reintentar:
+                al_reintentar(intento, e, espera)
+            time.sleep(espera)
+            if control is not None and control.cancelado:
+                raise
+            intento += 1
+            try:
+                transporte.cerrar()
+                transporte.abrir()
+            except Exception:
+                pass  # El próximo envío informa el error
+
+
+def agrupar_en_lotes(etiquetas, max_etiquetas, max_bytes):
+    """Divide la lista de (nombre, zpl, cantidad) en lotes limitados por cantidad de etiquetas o bytes."""
+    lote = []
+    bytes_lote = 0
+    for nombre, zpl, cantidad in etiquetas:
+        tamano = len(zpl) if isinstance(zpl, bytes) else len(zpl.encode())
+        # Cerrar el lote actual si la nueva etiqueta supera alguno de los límites
+        if lote and (len(lote) >= max_etiquetas or bytes_lote + tamano > max_bytes):
+            yield lote
+            lote = []
+            bytes_lote = 0
+        lote.append((nombre, zpl, cantidad))
+        bytes_lote += tamano
+    if lote:
+        yield lote
+
+
+def datos_lote(lote, encabezado=b""):
+    """Devuelve los bytes que se envían por un lote: el encabezado y el ZPL de cada etiqueta."""
+    return encabezado + b"".join(a_bytes(zpl) for _, zpl, _ in lote)
+
+
+def avisos_reintento(lote, al_reintentar):
+    """Adapta al_reintentar(lote, intento, error, espera) al aviso de enviar_con_reintentos."""
+    if al_reintentar is None:
+        return None
+    return lambda intento, error, espera: al_reintentar(lote, intento, error, espera)
+
+
+def registrar_lote(lote, datos, error, segundos, enviadas, medicion=None, al_enviar=None, al_fallar=None):
+    """Registra el resultado del envío de un lote y devuelve el total de etiquetas físicas enviadas.
+
+    error es None si el lote se envió y enviadas el total anterior a este
+    lote. Un lote que falló no suma ninguna etiqueta, tampoco si fue un
+    EnvioIncompleto: no se sabe cuántas llegaron a la impresora.
+    """
+    cantidad_lote = sum(cantidad for _, _, cantidad in lote)
+    if error is not None:
+        if medicion is not None:
+            medicion.registrar_fallo(segundos, cantidad_lote)
+        if al_fallar:
+            al_fallar(lote, error)
+        return enviadas
+    if medicion is not None:
+        medicion.registrar_envio(segundos, len(datos), cantidad_lote)
+    enviadas += cantidad_lote
+    if al_enviar:
+        al_enviar(lote, enviadas)
+    return enviadas
+
+
+def enviar_etiquetas(etiquetas, destino, max_etiquetas, max_bytes, al_enviar=None, al_fallar=None,
+                     control=None, encabezado="", controlar_estado=False, al_esperar=None, medicion=None,
+                     reintentos=SIN_REINTENTOS, timeout=None, al_reintentar=None):
+    """Envía las etiquetas (nombre, zpl, cantidad) en lotes y devuelve las etiquetas físicas enviadas.
+
+    El ZPL de cada etiqueta y el encabezado pueden ser texto o bytes.
+
+    al_enviar(lote, enviadas) se llama después de cada lote enviado y
+    al_fallar(lote, error) después de cada lote que no se pudo enviar.
+    control, si se indica, es un objeto con esperar_si_pausado() y la
+    propiedad cancelado que se consultan antes de cada lote.
+    encabezado se antepone a cada lote (por ejemplo el formato ^DF), así
+    cada trabajo es válido aunque la impresora se haya reiniciado entre lotes.
+    Con controlar_estado=True, antes de cada lote se consulta ~HS y se espera
+    (llamando a al_esperar(estado)) mientras la impresora no pueda recibirlo;
+    así no se llena su buffer y el envío sigue solo al reponer papel o cerrar el cabezal.
+    medicion, si se indica, es una medicion.Medicion que registra la latencia
+    y los bytes de cada envío.
+    Cada lote se intenta según reintentos (PoliticaReintentos) antes de darlo
+    por fallido; al_reintentar(lote, intento, error, espera) avisa cada reintento.
+    timeout se pasa al transporte como espera máxima de cada envío.
+    """
+    enviadas = 0
+    encabezado = a_bytes(encabezado)
+    # Un solo transporte para toda la corrida: en red la conexión queda abierta entre lotes
+    transporte = crear_transporte(destino, timeout=timeout)
+    try:
+        try:
+            transporte.abrir()
+        except Exception as e:
+            # No cortar la corrida: cada lote vuelve a intentarlo y, si falla, queda como fallido
+            logger.warning("No se pudo abrir %s: %s", destino, e)
+        for lote in agrupar_en_lotes(etiquetas, max_etiquetas, max_bytes):
+            if control is not None:
+                control.esperar_si_pausado()
+                if control.cancelado:
+                    break
+            if controlar_estado:
+                # Dejar en la impresora como máximo un lote sin imprimir además del que se envía
+                esperar_impresora_lista(transporte, max_etiquetas, control, al_esperar)
+                if control is not None and control.cancelado:
+                    break
+            datos = datos_lote(lote, encabezado)
+            error = None
+            inicio = time.perf_counter()
+            try:
+                enviar_con_reintentos(transporte, datos, reintentos, control, avisos_reintento(lote, al_reintentar))
+            except Exception as e:
+                error = e
+            enviadas = registrar_lote(lote, datos, error, time.perf_counter() - inicio, enviadas,
+                                      medicion, al_enviar, al_fallar)
+    finally:
+        transporte.cerrar()
+    return enviadas
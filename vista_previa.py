@@ -0,0 +1,337 @@
+# =============================================================================
+# VISTA PREVIA DE ETIQUETAS (ZPL -> PNG)
+# =============================================================================
+# Dibuja una etiqueta ZPL en un mapa de bits, sin impresora, para ver cómo
+# queda antes de gastar rollos. Soporta solo los comandos que usa el programa:
+#   ^FO ^FD ^FS ^CF ^FB ^GB ^BY ^BE (EAN-13) ^LH ^PW
+# El texto se dibuja con una fuente de mapa de bits de 5x7 escalada, así que
+# el tipo de letra es una aproximación del de la impresora. No depende de
+# tkinter ni de Pillow: el PNG se arma con zlib, y el dibujo se hace en un
+# hilo de fondo con una caché LRU por ZPL (ver CacheVistaPrevia).
+import re
+import struct
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from renderizado import digito_verificador_ean13
+
+ANCHO_DEFECTO = 400   # Puntos (203 dpi) si el ZPL no trae ^PW
+MARGEN_INFERIOR = 20  # Puntos libres debajo del último elemento
+PROPORCION_ANCHO = 0.4   # Ancho de cada carácter respecto de su alto (la fuente 0 es angosta)
+MAX_VISTAS = 256      # Etiquetas dibujadas que se guardan en la caché
+
+# Fuente de 5x7: por carácter, 7 filas de 5 bits (en hexadecimal), del espacio (0x20) a "~" (0x7E)
+_GLIFOS = (
+    "00000000000000 04040404000004 0a0a0a00000000 0a0a1f0a1f0a0a 040f140e051e04 18190204081303",
+    "0c12140815120d 0c040800000000 02040808080402 08040202020408 0004150e150400 0004041f040400",
+    "000000000c0408 0000001f000000 00000000000c0c 00010204081000 0e11131519110e 040c040404040e",
+    "0e11010204081f 1f02040201110e 02060a121f0202 1f101e0101110e 0608101e11110e 1f010204080808",
+    "0e11110e11110e 0e11110f01020c 000c0c000c0c00 000c0c000c0408 02040810080402 00001f001f0000",
+    "08040201020408 0e110102040004 0e11010d15150e 0e1111111f1111 1e11111e11111e 0e11101010110e",
+    "1c12111111121c 1f10101e10101f 1f10101e101010 0e11101711110f 1111111f111111 0e04040404040e",
+    "0702020202120c 11121418141211 1010101010101f 111b1515111111 11111915131111 0e11111111110e",
+    "1e11111e101010 0e11111115120d 1e11111e141211 0f10100e01011e 1f040404040404 1111111111110e",
+    "11111111110a04 1111111515150a 11110a040a1111 1111110a040404 1f01020408101f 0e08080808080e",
+    "00100804020100 0e02020202020e 040a1100000000 0000000000001f 08040200000000 00000e010f110f",
+    "1010161911111e 00000e1010110e 01010d1311110f 00000e111f100e 0609081c080808 000f11110f010e",
+    "10101619111111 04000c0404040e 0200060202120c 10101214181412 0c04040404040e 00001a15151111",
+    "00001619111111 00000e1111110e 00001e111e1010 00000d130f0101 00001619101010 00000e100e011e",
+    "08081c08080906 0000111111130d 00001111110a04 0000111115150a 0000110a040a11 000011110f010e",
+    "00001f0204081f 02040408040402 04040404040404 08040402040408 00000815020000",
+)
+FUENTE = {chr(0x20 + posicion): bytes.fromhex(glifo)
+          for posicion, glifo in enumerate(" ".join(_GLIFOS).split())}
+
+# Codificación EAN-13: patrones L, G y R de cada dígito y paridad según el primer dígito
+_EAN_L = ["0001101", "0011001", "0010011", "0111101", "0100011",
+          "0110001", "0101111", "0111011", "0110111", "0001011"]
+_EAN_R = ["".join("1" if bit == "0" else "0" for bit in patron) for patron in _EAN_L]
+_EAN_G = [patron[::-1] for patron in _EAN_R]
+_EAN_PARIDAD = ["LLLLLL", "LLGLGG", "LLGGLG", "LLGGGL", "LGLLGG",
+                "LGGLLG", "LGGGLL", "LGLGLG", "LGLGGL", "LGGLGL"]
+
+# Tabla para pasar de 0/1 (blanco/negro) a gris de 8 bits al armar el PNG
+_A_GRIS = bytes([255] + [0] * 255)
+
+
+def modulos_ean13(codigo):
+    """Devuelve los 95 módulos ("1" barra, "0" espacio) y los 13 dígitos del código.
+
+    Como la impresora, usa los 12 primeros dígitos y calcula el verificador.
+    """
+    digitos = "".join(filter(str.isdigit, codigo))[:12].zfill(12)
+    digitos += digito_verificador_ean13(digitos)
+    paridad = _EAN_PARIDAD[int(digitos[0])]
+    izquierda = "".join((_EAN_L if tipo == "L" else _EAN_G)[int(digito)]
+                        for tipo, digito in zip(paridad, digitos[1:7]))
+    derecha = "".join(_EAN_R[int(digito)] for digito in digitos[7:])
+    return "101" + izquierda + "01010" + derecha + "101", digitos
+
+
+def _normalizar(texto):
+    """Quita las tildes y reemplaza por "?" los caracteres que la fuente no tiene."""
+    sin_tildes = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode("ascii")
+    return "".join(caracter if caracter in FUENTE else "?" for caracter in sin_tildes)
+
+
+def _numeros(parametros, cantidad):
+    """Lee hasta `cantidad` parámetros numéricos separados por coma (None si faltan)."""
+    valores = []
+    for valor in parametros.split(",")[:cantidad]:
+        coincidencia = re.match(r"\s*(\d+(?:\.\d+)?)", valor)
+        valores.append(float(coincidencia.group(1)) if coincidencia else None)
+    valores += [None] * (cantidad - len(valores))
+    return [int(valor) if valor is not None and valor.is_integer() else valor for valor in valores]
+
+
+class MapaBits:
+    """Imagen de un byte por punto: 0 blanco, 1 negro."""
+
+    def __init__(self, ancho, alto):
+        self.ancho = ancho
+        self.alto = alto
+        self.pixeles = bytearray(ancho * alto)
+
+    def rectangulo(self, x, y, ancho, alto):
+        """Pinta de negro un rectángulo, recortado a los bordes de la imagen."""
+        x0, x1 = max(int(x), 0), min(int(x + ancho), self.ancho)
+        y0, y1 = max(int(y), 0), min(int(y + alto), self.alto)
+        if x0 >= x1:
+            return
+        negro = b"\x01" * (x1 - x0)
+        for fila in range(y0, y1):
+            inicio = fila * self.ancho
+            self.pixeles[inicio + x0:inicio + x1] = negro
+
+    def texto(self, x, y, texto, alto, ancho_caracter):
+        """Escribe el texto con la fuente de 5x7 escalada a `alto` puntos."""
+        alto_glifo = alto * 7 / 8
+        ancho_glifo = ancho_caracter * 5 / 6
+        for posicion, caracter in enumerate(texto):
+            glifo = FUENTE[caracter]
+            x_caracter = x + posicion * ancho_caracter
+            for fila, bits in enumerate(glifo):
+                if not bits:
+                    continue
+                y0 = y + fila * alto_glifo / 7
+                y1 = y + (fila + 1) * alto_glifo / 7
+                for columna in range(5):
+                    if bits & (0x10 >> columna):
+                        x0 = x_caracter + columna * ancho_glifo / 5
+                        x1 = x_caracter + (columna + 1) * ancho_glifo / 5
+                        self.rectangulo(round(x0), round(y0), round(x1) - round(x0), round(y1) - round(y0))
+
+    def a_png(self):
+        """Devuelve la imagen como PNG en escala de grises."""
+        filas = b"".join(b"\x00" + bytes(self.pixeles[fila * self.ancho:(fila + 1) * self.ancho]).translate(_A_GRIS)
+                         for fila in range(self.alto))
+
+        def bloque(tipo, datos):
+            return (struct.pack(">I", len(datos)) + tipo + datos
+                    + struct.pack(">I", zlib.crc32(tipo + datos) & 0xFFFFFFFF))
+
+        return (b"\x89PNG\r\n\x1a\n"
+                + bloque(b"IHDR", struct.pack(">IIBBBBB", self.ancho, self.alto, 8, 0, 0, 0, 0))
+                + bloque(b"IDAT", zlib.compress(filas, 6))
+                + bloque(b"IEND", b""))
+
+
+def interpretar(zpl):
+    """Convierte el ZPL de una etiqueta en (ancho, elementos) con coordenadas absolutas.
+
+    Cada elemento es una tupla:
+        ("caja", x, y, ancho, alto, grosor)
+        ("texto", x, y, texto, alto, ancho_caracter)
+        ("ean13", x, y, codigo, modulo, alto, con_interpretacion)
+    Los comandos que no se conocen se ignoran. zpl puede ser texto o bytes.
+    """
+    if isinstance(zpl, bytes):
+        zpl = zpl.decode('utf-8', errors='replace')
+    ancho = ANCHO_DEFECTO
+    origen_x = origen_y = 0
+    x = y = 0
+    alto_fuente, ancho_fuente = 30, None
+    bloque = None          # (ancho, justificación) de ^FB para el próximo campo
+    modulo, alto_barras = 2, 10
+    codigo_barras = None   # (alto, con_interpretacion) de ^BE para el próximo campo
+    datos = None
+    elementos = []
+
+    for comando in re.split(r"[\^~]", zpl)[1:]:
+        nombre, parametros = comando[:2].upper(), comando[2:]
+        if nombre == "FD":
+            datos = parametros
+        elif nombre == "FS":
+            if datos is not None:
+                if codigo_barras is not None:
+                    elementos.append(("ean13", x, y, datos, modulo) + codigo_barras)
+                else:
+                    texto = _normalizar(datos)
+                    ancho_caracter = max(round((ancho_fuente or alto_fuente) * PROPORCION_ANCHO), 3)
+                    x_texto = x
+                    if bloque is not None:
+                        sobrante = bloque[0] - len(texto) * ancho_caracter
+                        if bloque[1] == "C":
+                            x_texto += max(sobrante // 2, 0)
+                        elif bloque[1] == "R":
+                            x_texto += max(sobrante, 0)
+                    elementos.append(("texto", x_texto, y, texto, alto_fuente, ancho_caracter))
+            bloque = codigo_barras = datos = None
+        elif nombre == "FO":
+            desplazamiento_x, desplazamiento_y = _numeros(parametros, 2)
+            x, y = origen_x + (desplazamiento_x or 0), origen_y + (desplazamiento_y or 0)
+        elif nombre == "LH":
+            valor_x, valor_y = _numeros(parametros, 2)
+            origen_x, origen_y = valor_x or 0, valor_y or 0
+        elif nombre == "PW":
+            ancho = _numeros(parametros, 1)[0] or ancho
+        elif nombre == "CF":
+            _, alto, ancho_valor = _numeros(parametros, 3)
+            alto_fuente = alto or alto_fuente
+            ancho_fuente = ancho_valor
+        elif nombre == "FB":
+            ancho_bloque = _numeros(parametros, 1)[0] or 0
+            partes = parametros.split(",")
+            justificacion = partes[3].strip()[:1].upper() if len(partes) > 3 else "L"
+            bloque = (ancho_bloque, justificacion)
+        elif nombre == "GB":
+            ancho_caja, alto_caja, grosor = _numeros(parametros, 3)
+            grosor = grosor or 1
+            elementos.append(("caja", x, y, max(ancho_caja or 0, grosor), max(alto_caja or 0, grosor), grosor))
+        elif nombre == "BY":
+            valor_modulo, _, valor_alto = _numeros(parametros, 3)
+            modulo = int(valor_modulo or modulo)
+            alto_barras = valor_alto or alto_barras
+        elif nombre == "BE":
+            partes = parametros.split(",")
+            alto = _numeros(",".join(partes[1:2]), 1)[0] if len(partes) > 1 else None
+            con_interpretacion = len(partes) < 3 or partes[2].strip().upper() != "N"
+            codigo_barras = (alto or alto_barras, con_interpretacion)
+    return ancho, elementos
+
+
+def _alto_interpretacion(modulo):
+    """Alto de los dígitos debajo del código de barras según el ancho de módulo."""
+    return 9 * modulo + 2
+
+
+def _dibujar_caja(mapa, x, y, ancho, alto, grosor):
+    if grosor >= min(ancho, alto):
+        mapa.rectangulo(x, y, ancho, alto)
+        return
+    mapa.rectangulo(x, y, ancho, grosor)
+    mapa.rectangulo(x, y + alto - grosor, ancho, grosor)
+    mapa.rectangulo(x, y, grosor, alto)
+    mapa.rectangulo(x + ancho - grosor, y, grosor, alto)
+
+
+def _dibujar_ean13(mapa, x, y, codigo, modulo, alto, con_interpretacion):
+    modulos, digitos = modulos_ean13(codigo)
+    alto_texto = _alto_interpretacion(modulo)
+    # Las barras de guarda (inicio, centro y fin) bajan hasta la mitad de los dígitos
+    guardas = set(range(0, 3)) | set(range(45, 50)) | set(range(92, 95))
+    extra_guardas = alto_texto // 2 if con_interpretacion else 0
+
+    posicion = 0
+    while posicion < len(modulos):
+        if modulos[posicion] == "1":
+            fin = posicion
+            while fin < len(modulos) and modulos[fin] == "1":
+                fin += 1
+            for modulo_barra in range(posicion, fin):
+                alto_barra = alto + (extra_guardas if modulo_barra in guardas else 0)
+                mapa.rectangulo(x + modulo_barra * modulo, y, modulo, alto_barra)
+            posicion = fin
+        else:
+            posicion += 1
+
+    if con_interpretacion:
+        ancho_caracter = max(round(alto_texto * PROPORCION_ANCHO * 1.3), 3)
+        y_texto = y + alto + 2
+        mapa.texto(x - ancho_caracter - modulo, y_texto, digitos[0], alto_texto, ancho_caracter)
+        for grupo, inicio_modulo in ((digitos[1:7], 3), (digitos[7:], 50)):
+            ancho_grupo = 42 * modulo
+            x_grupo = x + inicio_modulo * modulo + (ancho_grupo - len(grupo) * ancho_caracter) // 2
+            mapa.texto(x_grupo, y_texto, grupo, alto_texto, ancho_caracter)
+
+
+def renderizar(zpl):
+    """Dibuja la etiqueta ZPL y devuelve el MapaBits."""
+    ancho, elementos = interpretar(zpl)
+    alto = 0
+    for elemento in elementos:
+        tipo, x, y = elemento[:3]
+        if tipo == "caja":
+            alto = max(alto, y + elemento[4])
+        elif tipo == "texto":
+            alto = max(alto, y + elemento[4])
+        else:
+            modulo, alto_barras, con_interpretacion = elemento[4:]
+            alto = max(alto, y + alto_barras + (_alto_interpretacion(modulo) + 2 if con_interpretacion else 0))
+
+    mapa = MapaBits(int(ancho), int(alto) + MARGEN_INFERIOR)
+    for elemento in elementos:
+        if elemento[0] == "caja":
+            _dibujar_caja(mapa, *elemento[1:])
+        elif elemento[0] == "texto":
+            mapa.texto(*elemento[1:])
+        else:
+            _dibujar_ean13(mapa, *elemento[1:])
+    return mapa
+
+
+def renderizar_png(zpl):
+    """Dibuja la etiqueta ZPL y devuelve los bytes del PNG."""
+    return renderizar(zpl).a_png()
+
+
+class CacheVistaPrevia:
+    """Dibuja etiquetas en un hilo de fondo y guarda los PNG en una caché LRU por ZPL.
+
+    Las etiquetas idénticas (mismo ZPL) se dibujan una sola vez. solicitar()
+    nunca bloquea: devuelve un Future que la interfaz consulta con root.after.
+    """
+
+    def __init__(self, max_vistas=MAX_VISTAS):
+        self.max_vistas = max_vistas
+        self._vistas = OrderedDict()  # zpl -> bytes del PNG
+        self._en_curso = {}           # zpl -> Future del dibujo pendiente
+        self._bloqueo = threading.Lock()
+        self._ejecutor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="VistaPrevia")
+
+    def solicitar(self, zpl):
+        """Devuelve un Future con el PNG de la etiqueta (ya resuelto si estaba en la caché)."""
+        with self._bloqueo:
+            png = self._vistas.get(zpl)
+            if png is not None:
+                self._vistas.move_to_end(zpl)
+                futuro = Future()
+                futuro.set_result(png)
+                return futuro
+            futuro = self._en_curso.get(zpl)
+            if futuro is None:
+                futuro = self._ejecutor.submit(self._dibujar, zpl)
+                self._en_curso[zpl] = futuro
+            return futuro
+
+    def _dibujar(self, zpl):
+        try:
+            png = renderizar_png(zpl)
+        except Exception:
+            with self._bloqueo:
+                self._en_curso.pop(zpl, None)
+            raise
+        with self._bloqueo:
+            self._en_curso.pop(zpl, None)
+            self._vistas[zpl] = png
+            self._vistas.move_to_end(zpl)
+            while len(self._vistas) > self.max_vistas:
+                self._vistas.popitem(last=False)
+        return png
+
+    def cerrar(self):
+        """Descarta los dibujos pendientes y detiene el hilo de fondo."""
+        self._ejecutor.shutdown(wait=False, cancel_futures=True)